@@ -0,0 +1,86 @@
+"""
+Бенчмарк конкуренции: N потоков одновременно вызывают antispam.check
+и find_in_text для разных чатов.
+
+Сравниваются одна общая блокировка (как было) и блокировки по chat_id
+плюс чтение автомата триггеров без блокировки.
+
+Запуск из корня проекта (нужны token.txt и pyTelegramBotAPI, т.к.
+импортируется bot.py):
+    python benchmarks/bench_contention.py
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import AntiSpamManager, TriggerManager  # noqa: E402
+
+THREADS = [1, 2, 4, 8, 16]
+OPS_PER_THREAD = 20_000
+WORDS = 10_000
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+class LockedTriggers:
+    """Прежнее поведение: поиск под общей блокировкой"""
+
+    def __init__(self, triggers: TriggerManager):
+        self._triggers = triggers
+        self._lock = threading.RLock()
+
+    def find_in_text(self, text: str) -> list:
+        with self._lock:
+            return self._triggers.find_in_text(text)
+
+
+def make_triggers(rnd: random.Random) -> TriggerManager:
+    triggers = TriggerManager(os.devnull)
+    triggers._words = {
+        "".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(4, 10)))
+        for _ in range(WORDS)
+    }
+    triggers._rebuild()
+    return triggers
+
+
+def run(threads: int, antispam, triggers, messages: list) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(n: int):
+        chat_id = -1000 - n
+        barrier.wait()
+        for i in range(OPS_PER_THREAD):
+            antispam.check(chat_id, i % 50, 5, 10)
+            triggers.find_in_text(messages[i % len(messages)])
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    return threads * OPS_PER_THREAD / (time.perf_counter() - start)
+
+
+def main():
+    rnd = random.Random(42)
+    triggers = make_triggers(rnd)
+    messages = [
+        " ".join("".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(2, 8))) for _ in range(15))
+        for _ in range(100)
+    ]
+
+    print(f"{'потоков':>8} | {'общая блокировка, оп/с':>23} | {'по chat_id, оп/с':>17}")
+    for threads in THREADS:
+        single = run(threads, AntiSpamManager(sweep_interval=0, stripes=1), LockedTriggers(triggers), messages)
+        striped = run(threads, AntiSpamManager(sweep_interval=0), triggers, messages)
+        print(f"{threads:>8} | {single:>23,.0f} | {striped:>17,.0f}")
+
+
+if __name__ == "__main__":
+    main()
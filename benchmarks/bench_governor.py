@@ -0,0 +1,131 @@
+"""
+Проверка ApiGovernor на локальном фейковом Bot API.
+
+Поднимает HTTP-сервер, который отвечает как api.telegram.org и время от
+времени возвращает 429 с retry_after. Через governor отправляется «рейд»:
+удаления и уведомления в несколько чатов. Печатается, сколько заняла
+обработка, соблюдён ли приоритет удалений и лимиты по чатам.
+
+Запуск из корня проекта (нужны token.txt и pyTelegramBotAPI, т.к.
+импортируется bot.py):
+    python benchmarks/bench_governor.py
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telebot  # noqa: E402
+from bot import ApiGovernor, bot  # noqa: E402
+
+CHATS = [-1001, -1002, -1003, -1004, -1005]
+DELETES_PER_CHAT = 60
+NOTICES_PER_CHAT = 20
+# Уменьшенные лимиты, чтобы прогон занимал секунды, а не минуты
+GLOBAL_RATE = 30
+CHAT_RATE = 2
+CHAT_BURST = 5
+FLOOD_EVERY = 25  # каждый N-й sendMessage получает 429
+
+
+class FakeBotApi:
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+        self._sent = 0
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _serve(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    body = self.rfile.read(length).decode("utf-8")
+                    params.update({k: v[0] for k, v in parse_qs(body).items()})
+                method = url.path.rsplit("/", 1)[-1]
+                code, payload = api.handle(method, params)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _serve
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+
+    def handle(self, method: str, params: dict):
+        chat_id = int(params.get("chat_id", 0))
+        with self._lock:
+            if method == "sendMessage":
+                self._sent += 1
+                if self._sent % FLOOD_EVERY == 0:
+                    return 429, {"ok": False, "error_code": 429,
+                                 "description": "Too Many Requests: retry after 1",
+                                 "parameters": {"retry_after": 1}}
+            self.calls.append((time.monotonic(), method, chat_id))
+        if method == "sendMessage":
+            return 200, {"ok": True, "result": {
+                "message_id": 1, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup"}, "text": params.get("text", "")}}
+        return 200, {"ok": True, "result": True}
+
+
+def main():
+    api = FakeBotApi()
+    threading.Thread(target=api.httpd.serve_forever, daemon=True).start()
+    host, port = api.httpd.server_address[:2]
+    telebot.apihelper.API_URL = f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    governor = ApiGovernor(global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, chat_burst=CHAT_BURST)
+    futures = []
+    start = time.monotonic()
+    for i in range(max(DELETES_PER_CHAT, NOTICES_PER_CHAT)):
+        for chat_id in CHATS:
+            if i < NOTICES_PER_CHAT:
+                futures.append(governor.submit(ApiGovernor.PRIORITY_NOTICE, chat_id,
+                                               bot.send_message, chat_id, f"уведомление {i}"))
+            if i < DELETES_PER_CHAT:
+                futures.append(governor.submit(ApiGovernor.PRIORITY_ACTION, chat_id,
+                                               bot.delete_message, chat_id, 1000 + i))
+    for future in futures:
+        future.exception()
+    elapsed = time.monotonic() - start
+    api.httpd.shutdown()
+
+    deletes = [t for t, method, _ in api.calls if method == "deleteMessage"]
+    sends = defaultdict(list)
+    for t, method, chat_id in api.calls:
+        if method == "sendMessage":
+            sends[chat_id].append(t)
+
+    # Наибольшее число сообщений в чат за любую секунду
+    worst = 0
+    for times in sends.values():
+        for i, t in enumerate(times):
+            worst = max(worst, sum(1 for u in times[i:] if u - t < 1.0))
+
+    stats = governor.get_stats()
+    print(f"Запросов: {len(futures)}, время: {elapsed:.1f} с, "
+          f"{len(api.calls) / elapsed:.1f} запр/с (лимит {GLOBAL_RATE})")
+    print(f"Последнее удаление: {max(deletes) - start:.1f} с, "
+          f"первое уведомление: {min(min(t) for t in sends.values()) - start:.1f} с")
+    print(f"Макс. сообщений в чат за 1 с: {worst} (лимит {CHAT_RATE}/с, запас {CHAT_BURST})")
+    print(f"Повторов после 429: {stats['retries_429']}, ошибок: {stats['errors']}, "
+          f"отложено: {stats['throttled']}")
+
+
+if __name__ == "__main__":
+    main()
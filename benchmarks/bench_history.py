@@ -0,0 +1,96 @@
+"""
+Выборки из индекса журнала событий (EventIndex) на синтетическом журнале.
+
+Генерирует N событий (по умолчанию 10 млн) за 90 дней: тысячи чатов,
+сотни тысяч пользователей с неравномерной активностью. Затем замеряет
+типичные запросы /history. Время запроса должно зависеть от размера
+результата (редкий и активный пользователь), а не от размера журнала.
+
+Запуск из корня проекта (нужны token.txt и pyTelegramBotAPI, т.к.
+импортируется bot.py):
+    python benchmarks/bench_history.py [N]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import EventIndex  # noqa: E402
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+CHATS = 5_000
+USERS = 500_000
+DAYS = 90
+BATCH = 100_000
+ROUNDS = 200
+ACTIONS = ["delete"] * 70 + ["mute"] * 12 + ["warn"] * 10 + ["ban"] * 4 + ["kick"] * 2 + ["unmute"] * 2
+
+
+def synthetic(count: int, start: float):
+    rnd = random.Random(1)
+    step = DAYS * 86400 / count
+    for i in range(count):
+        # Парето: немногие пользователи дают большую часть событий
+        user_id = min(int(rnd.paretovariate(1.2)), USERS)
+        yield {
+            "ts": start + i * step,
+            "action": rnd.choice(ACTIONS),
+            "chat_id": -1000000000000 - rnd.randrange(CHATS),
+            "user_id": user_id,
+            "username": f"user{user_id}",
+            "reason": "trigger",
+        }
+
+
+def build(index: EventIndex, count: int, start: float) -> None:
+    began = time.perf_counter()
+    batch = []
+    for event in synthetic(count, start):
+        batch.append(event)
+        if len(batch) >= BATCH:
+            index.add_many(batch)
+            batch = []
+    index.add_many(batch)
+    elapsed = time.perf_counter() - began
+    print(f"Заполнение: {count:,} событий за {elapsed:.1f} с ({count / elapsed:,.0f} событий/с)")
+
+
+def measure(title: str, fn) -> None:
+    result = fn()
+    began = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    per_query = (time.perf_counter() - began) / ROUNDS * 1000
+    size = len(result) if isinstance(result, list) else result
+    print(f"  {title:<44} {per_query:8.3f} мс  (результат: {size:,})")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = EventIndex(os.path.join(tmp, "events.db"))
+        now = time.time()
+        start = now - DAYS * 86400
+        build(index, EVENTS, start)
+
+        heavy, rare = 1, 2000
+        chat = -1000000000000
+        day = now - 86400
+        week = now - 7 * 86400
+
+        print(f"\nЗапросы (среднее по {ROUNDS} повторам):")
+        measure("последние 20 событий активного юзера", lambda: index.query(user_id=heavy))
+        measure("последние 20 событий редкого юзера", lambda: index.query(user_id=rare))
+        measure("все события редкого юзера", lambda: index.query(user_id=rare, limit=None))
+        measure("число событий юзера #2 за 7 дней", lambda: index.count(user_id=2, since=week))
+        measure("последние 20 событий чата за 24 ч", lambda: index.query(chat_id=chat, since=day))
+        measure("все события чата за 24 ч", lambda: index.query(chat_id=chat, since=day, limit=None))
+        measure("баны по всем чатам за последний час", lambda: index.query(action="ban", since=now - 3600, limit=None))
+        measure("@username -> user_id", lambda: [index.resolve_username("@user42")])
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Микробенчмарк поиска ссылок: прежние три re.search по строковым шаблонам
+против LinkDetector (скомпилированный шаблон и entities от Telegram).
+
+Запуск из корня проекта (нужны token.txt и pyTelegramBotAPI, т.к.
+импортируется bot.py):
+    python benchmarks/bench_links.py
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import link_detector  # noqa: E402
+
+CHAT_ID = -1
+ROUNDS = 20
+
+PLAIN = [
+    "Всем привет! Кто-нибудь знает, когда будет следующая встреча?",
+    "Да, согласен, вчера обсуждали, но так ничего и не решили",
+    "ок",
+    "Скиньте, пожалуйста, расписание на неделю, я пропустил сообщение",
+    "Ахаха 😂😂😂 это лучшее что я видел сегодня",
+    "Напоминаю: правила чата в закрепе, не флудите",
+]
+LINKS = [
+    "Вот тут подробно расписано https://habr.com/ru/articles/123456/",
+    "Заходите в наш канал t.me/some_channel там всё есть",
+    "Бесплатные крипто-раздачи!!! https://free-crypto.example/?ref=abc",
+    "Документация: https://docs.python.org/3/library/re.html#re.compile",
+]
+
+
+class Entity:
+    def __init__(self, type, offset, length, url=None):
+        self.type = type
+        self.offset = offset
+        self.length = length
+        self.url = url
+
+
+def old_has_links(text: str) -> bool:
+    patterns = [
+        r'https?://\S+',
+        r't\.me/\S+',
+        r'telegram\.me/\S+',
+    ]
+    for pattern in patterns:
+        if re.search(pattern, text, re.IGNORECASE):
+            return True
+    return False
+
+
+def entities_for(text: str):
+    """Entities, как их прислал бы Telegram (offset в UTF-16)"""
+    result = []
+    for match in link_detector.LINK_RE.finditer(text):
+        offset = len(text[:match.start()].encode("utf-16-le")) // 2
+        length = len(match.group(0).encode("utf-16-le")) // 2
+        result.append(Entity("url", offset, length))
+    return result or None
+
+
+def make_corpus(rnd: random.Random) -> list:
+    corpus = []
+    for _ in range(5000):
+        text = rnd.choice(LINKS) if rnd.random() < 0.1 else rnd.choice(PLAIN)
+        corpus.append((text, entities_for(text)))
+    return corpus
+
+
+def bench(func, corpus: list) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for text, entities in corpus:
+            func(text, entities)
+    return (time.perf_counter() - start) / (ROUNDS * len(corpus))
+
+
+def main():
+    corpus = make_corpus(random.Random(42))
+
+    for text, entities in corpus[:200]:
+        assert old_has_links(text) == link_detector.has_links(CHAT_ID, text)
+        assert old_has_links(text) == link_detector.has_links(CHAT_ID, text, entities)
+
+    results = [
+        ("3 x re.search", bench(lambda t, e: old_has_links(t), corpus)),
+        ("LinkDetector (текст)", bench(lambda t, e: link_detector.has_links(CHAT_ID, t), corpus)),
+        ("LinkDetector (entities)", bench(lambda t, e: link_detector.has_links(CHAT_ID, t, e), corpus)),
+    ]
+    base = results[0][1]
+    print(f"Сообщений: {len(corpus)}, ссылок ~10%")
+    for name, per_msg in results:
+        print(f"{name:<24} {per_msg * 1e6:>8.2f} мкс/сообщ.  {base / per_msg:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Бенчмарк поиска триггер-слов: автомат Ахо-Корасик против прежнего
+перебора `w in text` по всем словам, затем полный путь
+TriggerManager.find_in_text (нормализация + кэш токенов) на сообщениях
+по 1 КБ против прежнего lower() + автомат, и режим "words" (поиск основ).
+
+Запуск из корня проекта (нужны token.txt и pyTelegramBotAPI, т.к.
+импортируется bot.py):
+    python benchmarks/bench_triggers.py
+"""
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import AhoCorasick, TriggerManager  # noqa: E402
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+SIZES = [100, 10_000, 100_000]
+MESSAGES = 200
+MESSAGE_BYTES = 1024
+VOCABULARY = 20_000
+OBFUSCATED = ["сп@м", "с п а м", "с.п.а.м", "cпaм", "с\u200bпам", "с\u0336п\u0336а\u0336м\u0336", "ｃпам", "СПАМ"]
+
+
+def make_words(count: int, rnd: random.Random) -> set:
+    words = set()
+    while len(words) < count:
+        words.add("".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(4, 10))))
+    return words
+
+
+def make_messages(words: list, rnd: random.Random) -> list:
+    messages = []
+    for _ in range(MESSAGES):
+        parts = ["".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(2, 8)))
+                 for _ in range(30)]
+        if rnd.random() < 0.2:
+            parts.insert(rnd.randrange(len(parts)), rnd.choice(words))
+        messages.append(" ".join(parts))
+    return messages
+
+
+def naive_scan(words: set, text: str) -> list:
+    return [w for w in words if w in text]
+
+
+def bench(func, messages: list) -> float:
+    start = time.perf_counter()
+    for text in messages:
+        func(text)
+    return (time.perf_counter() - start) / len(messages)
+
+
+def main():
+    rnd = random.Random(42)
+    print(f"{'слов':>8} | {'сборка, с':>10} | {'перебор, мкс':>13} | {'автомат, мкс':>13} | {'ускорение':>9}")
+    for size in SIZES:
+        words = make_words(size, rnd)
+        messages = make_messages(sorted(words), rnd)
+
+        start = time.perf_counter()
+        matcher = AhoCorasick(words)
+        build = time.perf_counter() - start
+
+        # Проверка совпадения результатов
+        for text in messages[:20]:
+            assert set(matcher.find(text)) == set(naive_scan(words, text))
+
+        naive = bench(lambda t: naive_scan(words, t), messages)
+        automaton = bench(matcher.find, messages)
+        print(f"{size:>8} | {build:>10.3f} | {naive * 1e6:>13.1f} | "
+              f"{automaton * 1e6:>13.1f} | {naive / automaton:>8.1f}x")
+
+
+def make_chat(rnd: random.Random, count: int) -> list:
+    """Сообщения по ~1 КБ из словаря с частотами по закону Ципфа"""
+    vocabulary = ["".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(1, 9)))
+                  for _ in range(VOCABULARY)]
+    weights = list(itertools.accumulate(1 / (i + 1) for i in range(VOCABULARY)))
+    messages = []
+    for _ in range(count):
+        parts, size = [], 0
+        while size < MESSAGE_BYTES // 2:  # кириллица — 2 байта на букву
+            word = rnd.choices(vocabulary, cum_weights=weights)[0]
+            parts.append(word)
+            size += len(word) + 1
+        messages.append(" ".join(parts))
+    return messages
+
+
+def main_manager():
+    rnd = random.Random(7)
+    messages = make_chat(rnd, 2000)
+    print(f"\nfind_in_text, сообщения ~{MESSAGE_BYTES} байт")
+    print(f"{'слов':>8} | {'прежний, мкс':>13} | {'новый, мкс':>11} | {'сообщ./с':>9} | {'words, мкс':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in SIZES:
+            manager = TriggerManager(os.path.join(tmp, f"trigger_{size}.txt"))
+            manager.add_many(sorted(make_words(size, rnd)) + ["спам"])
+            for text in OBFUSCATED:
+                assert "спам" in manager.find_in_text(text), text
+
+            matcher = manager._index.matcher
+            old = bench(lambda t: matcher.find(t.lower()), messages)
+            bench(manager.find_in_text, messages)  # прогрев кэша токенов
+            new = bench(manager.find_in_text, messages)
+            words = bench(lambda t: manager.find_in_text(t, None, "words"), messages)
+            print(f"{size:>8} | {old * 1e6:>13.1f} | {new * 1e6:>11.1f} | {1 / new:>9,.0f} | {words * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
+    main_manager()
@@ -0,0 +1,69 @@
+"""
+count_warns для пользователей с длинной историей предупреждений.
+
+Для каждого размера истории (по одному предупреждению в час, большая
+часть старше warn_expire_days) сравнивается прежний подсчёт — длина всего
+списка, включая истёкшие — и count_warns с ленивым отсечением истёкших
+бинарным поиском. В конце замеряется фоновая чистка (compact) всего
+хранилища.
+
+Запуск из корня проекта (нужны token.txt и pyTelegramBotAPI, т.к.
+импортируется bot.py):
+    python benchmarks/bench_warns.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import JsonStorage, WarnsManager, settings  # noqa: E402
+
+CHAT_ID = -1
+HISTORY = [10, 100, 1_000, 10_000, 100_000]
+ROUNDS = 20_000
+
+
+def history(count: int) -> list:
+    now = datetime.now()
+    return [
+        {"reason": "флуд", "by": 1, "date": (now - timedelta(hours=count - i)).isoformat()}
+        for i in range(count)
+    ]
+
+
+def per_call_us(fn) -> float:
+    began = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    return (time.perf_counter() - began) / ROUNDS * 1e6
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JsonStorage(os.path.join(tmp, "warns.json"), {})
+        manager = WarnsManager(storage, settings, compact_interval=0)
+        for user_id, count in enumerate(HISTORY, 1):
+            storage.set(f"{CHAT_ID}:{user_id}", history(count))
+
+        days = settings.get(CHAT_ID, "warn_expire_days")
+        print(f"warn_expire_days = {days}, {ROUNDS} вызовов на замер\n")
+        print(f"{'история':>9} {'активных':>9} {'len(all)':>11} {'count_warns':>12}")
+        for user_id, count in enumerate(HISTORY, 1):
+            key = f"{CHAT_ID}:{user_id}"
+            old = per_call_us(lambda: len(storage.get(key, [])))
+            new = per_call_us(lambda: manager.count_warns(CHAT_ID, user_id))
+            active = manager.count_warns(CHAT_ID, user_id)
+            print(f"{count:>9,} {active:>9,} {old:>8.2f} мкс {new:>9.2f} мкс")
+
+        began = time.perf_counter()
+        removed = manager.compact()
+        elapsed = time.perf_counter() - began
+        print(f"\ncompact: удалено {removed:,} истёкших за {elapsed * 1000:.1f} мс, "
+              f"файл {os.path.getsize(storage.filepath) / 1024:.0f} КБ")
+
+
+if __name__ == "__main__":
+    main()
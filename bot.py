@@ -1,1782 +1,4305 @@
-import telebot
-from telebot import types
-import os
-import json
-import re
-import time
-from datetime import datetime, timedelta
-from collections import defaultdict
-import threading
-from functools import wraps
-from typing import Optional, List, Set, Dict, Any
-
-ANONYMOUS_ADMIN_ID = 
-
-# ================================
-# Конфигурация
-# ================================
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-TOKEN_PATH = os.path.join(BASE_DIR, "token.txt")
-TRIGGER_PATH = os.path.join(BASE_DIR, "trigger.txt")
-LOG_PATH = os.path.join(BASE_DIR, "log.txt")
-WARNS_PATH = os.path.join(BASE_DIR, "warns.json")
-STATS_PATH = os.path.join(BASE_DIR, "stats.json")
-SETTINGS_PATH = os.path.join(BASE_DIR, "settings.json")
-ADMINS_PATH = os.path.join(BASE_DIR, "admins.json")
-
-# Настройки по умолчанию
-DEFAULT_SETTINGS = {
-    "max_warns": 3,
-    "warn_expire_days": 30,
-    "antispam_enabled": True,
-    "antispam_messages": 5,
-    "antispam_seconds": 10,
-    "antilink_enabled": False,
-    "welcome_enabled": False,
-    "welcome_message": "👋 Добро пожаловать, {user}!",
-    "goodbye_enabled": False,
-    "goodbye_message": "👋 {user} покинул(а) чат",
-}
-
-# ================================
-# Загрузка токена
-# ================================
-def load_token() -> str:
-    try:
-        with open(TOKEN_PATH, "r", encoding="utf-8") as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        raise FileNotFoundError(f"❌ Файл токена не найден: {TOKEN_PATH}")
-
-TOKEN = load_token()
-bot = telebot.TeleBot(TOKEN, parse_mode=None)
-
-# ================================
-# JSON Storage Manager
-# ================================
-class JsonStorage:
-    """Потокобезопасное хранилище JSON"""
-    
-    def __init__(self, filepath: str, default: Any = None):
-        self.filepath = filepath
-        self.default = default if default is not None else {}
-        self._lock = threading.RLock()
-        self._data = self._load()
-    
-    def _load(self) -> Any:
-        if not os.path.exists(self.filepath):
-            return self.default.copy() if isinstance(self.default, dict) else self.default
-        try:
-            with open(self.filepath, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"⚠️ Ошибка загрузки {self.filepath}: {e}")
-            return self.default.copy() if isinstance(self.default, dict) else self.default
-    
-    def _save(self) -> None:
-        try:
-            with open(self.filepath, "w", encoding="utf-8") as f:
-                json.dump(self._data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"❌ Ошибка сохранения {self.filepath}: {e}")
-    
-    def get(self, key: str, default: Any = None) -> Any:
-        with self._lock:
-            return self._data.get(str(key), default)
-    
-    def set(self, key: str, value: Any) -> None:
-        with self._lock:
-            self._data[str(key)] = value
-            self._save()
-    
-    def delete(self, key: str) -> bool:
-        with self._lock:
-            if str(key) in self._data:
-                del self._data[str(key)]
-                self._save()
-                return True
-            return False
-    
-    def get_nested(self, *keys, default: Any = None) -> Any:
-        with self._lock:
-            data = self._data
-            for key in keys:
-                if isinstance(data, dict) and str(key) in data:
-                    data = data[str(key)]
-                else:
-                    return default
-            return data
-    
-    def set_nested(self, *keys, value: Any) -> None:
-        with self._lock:
-            if len(keys) < 1:
-                return
-            data = self._data
-            for key in keys[:-1]:
-                key = str(key)
-                if key not in data:
-                    data[key] = {}
-                data = data[key]
-            data[str(keys[-1])] = value
-            self._save()
-    
-    def all(self) -> dict:
-        with self._lock:
-            return self._data.copy()
-
-# ================================
-# Менеджер администраторов бота
-# ================================
-class BotAdminsManager:
-    """Управление администраторами бота (глобальные права)"""
-    
-    def __init__(self, filepath: str):
-        self.filepath = filepath
-        self._lock = threading.RLock()
-        self._admins: Set[int] = self._load()
-    
-    def _load(self) -> Set[int]:
-        if not os.path.exists(self.filepath):
-            return set()
-        try:
-            with open(self.filepath, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                return set(data.get("admins", []))
-        except Exception as e:
-            print(f"⚠️ Ошибка загрузки админов бота: {e}")
-            return set()
-    
-    def _save(self) -> None:
-        try:
-            with open(self.filepath, "w", encoding="utf-8") as f:
-                json.dump({"admins": list(self._admins)}, f, indent=2)
-        except Exception as e:
-            print(f"❌ Ошибка сохранения админов бота: {e}")
-    
-    def add(self, user_id: int) -> bool:
-        with self._lock:
-            if user_id in self._admins:
-                return False
-            self._admins.add(user_id)
-            self._save()
-            return True
-    
-    def remove(self, user_id: int) -> bool:
-        with self._lock:
-            if user_id not in self._admins:
-                return False
-            self._admins.discard(user_id)
-            self._save()
-            return True
-    
-    def is_admin(self, user_id: int) -> bool:
-        with self._lock:
-            return user_id in self._admins
-    
-    def get_all(self) -> List[int]:
-        with self._lock:
-            return list(self._admins)
-    
-    def count(self) -> int:
-        with self._lock:
-            return len(self._admins)
-
-# ================================
-# Менеджер триггер-слов
-# ================================
-class TriggerManager:
-    """Потокобезопасный менеджер триггер-слов"""
-    
-    def __init__(self, filepath: str):
-        self.filepath = filepath
-        self._lock = threading.RLock()
-        self._words: Set[str] = self._load()
-    
-    def _load(self) -> Set[str]:
-        if not os.path.exists(self.filepath):
-            return set()
-        try:
-            with open(self.filepath, "r", encoding="utf-8") as f:
-                return {line.strip().lower() for line in f if line.strip()}
-        except Exception as e:
-            print(f"⚠️ Ошибка загрузки триггеров: {e}")
-            return set()
-    
-    def _save(self) -> None:
-        try:
-            with open(self.filepath, "w", encoding="utf-8") as f:
-                f.write("\n".join(sorted(self._words)))
-        except Exception as e:
-            print(f"❌ Ошибка сохранения триггеров: {e}")
-    
-    def add(self, word: str) -> bool:
-        word = word.lower().strip()
-        if not word:
-            return False
-        with self._lock:
-            if word in self._words:
-                return False
-            self._words.add(word)
-            self._save()
-            return True
-    
-    def add_many(self, words: List[str]) -> int:
-        added = 0
-        with self._lock:
-            for word in words:
-                word = word.lower().strip()
-                if word and word not in self._words:
-                    self._words.add(word)
-                    added += 1
-            if added:
-                self._save()
-        return added
-    
-    def remove(self, word: str) -> bool:
-        word = word.lower().strip()
-        with self._lock:
-            if word not in self._words:
-                return False
-            self._words.discard(word)
-            self._save()
-            return True
-    
-    def clear(self) -> int:
-        with self._lock:
-            count = len(self._words)
-            self._words.clear()
-            self._save()
-            return count
-    
-    def find_in_text(self, text: str) -> List[str]:
-        text_lower = text.lower()
-        with self._lock:
-            return [w for w in self._words if w in text_lower]
-    
-    def get_all(self) -> List[str]:
-        with self._lock:
-            return sorted(self._words)
-    
-    def count(self) -> int:
-        with self._lock:
-            return len(self._words)
-    
-    def is_empty(self) -> bool:
-        with self._lock:
-            return len(self._words) == 0
-
-# ================================
-# Менеджер анти-спама
-# ================================
-class AntiSpamManager:
-    """Защита от спама/флуда"""
-    
-    def __init__(self):
-        self._lock = threading.Lock()
-        self._messages: Dict[str, List[float]] = defaultdict(list)
-    
-    def check(self, chat_id: int, user_id: int, max_messages: int, seconds: int) -> bool:
-        key = f"{chat_id}:{user_id}"
-        now = time.time()
-        
-        with self._lock:
-            self._messages[key] = [t for t in self._messages[key] if now - t < seconds]
-            self._messages[key].append(now)
-            return len(self._messages[key]) > max_messages
-    
-    def reset(self, chat_id: int, user_id: int) -> None:
-        key = f"{chat_id}:{user_id}"
-        with self._lock:
-            self._messages.pop(key, None)
-
-# ================================
-# Менеджер предупреждений
-# ================================
-class WarnsManager:
-    """Управление предупреждениями пользователей"""
-    
-    def __init__(self, storage: JsonStorage):
-        self.storage = storage
-    
-    def add_warn(self, chat_id: int, user_id: int, reason: str, by_user_id: int) -> int:
-        key = f"{chat_id}:{user_id}"
-        warns = self.storage.get(key, [])
-        warns.append({
-            "reason": reason,
-            "by": by_user_id,
-            "date": datetime.now().isoformat()
-        })
-        self.storage.set(key, warns)
-        return len(warns)
-    
-    def remove_warn(self, chat_id: int, user_id: int, index: int = -1) -> bool:
-        key = f"{chat_id}:{user_id}"
-        warns = self.storage.get(key, [])
-        if not warns:
-            return False
-        try:
-            warns.pop(index)
-            self.storage.set(key, warns)
-            return True
-        except IndexError:
-            return False
-    
-    def clear_warns(self, chat_id: int, user_id: int) -> int:
-        key = f"{chat_id}:{user_id}"
-        warns = self.storage.get(key, [])
-        count = len(warns)
-        self.storage.delete(key)
-        return count
-    
-    def get_warns(self, chat_id: int, user_id: int) -> List[dict]:
-        key = f"{chat_id}:{user_id}"
-        return self.storage.get(key, [])
-    
-    def count_warns(self, chat_id: int, user_id: int) -> int:
-        return len(self.get_warns(chat_id, user_id))
-
-# ================================
-# Менеджер статистики
-# ================================
-class StatsManager:
-    """Статистика модерации"""
-    
-    def __init__(self, storage: JsonStorage):
-        self.storage = storage
-    
-    def increment(self, chat_id: int, stat_type: str, count: int = 1) -> None:
-        current = self.storage.get_nested(str(chat_id), stat_type, default=0)
-        self.storage.set_nested(str(chat_id), stat_type, value=current + count)
-    
-    def get_stats(self, chat_id: int) -> dict:
-        return self.storage.get(str(chat_id), {
-            "deleted_messages": 0,
-            "warns_given": 0,
-            "mutes": 0,
-            "bans": 0,
-            "kicks": 0,
-            "spam_blocked": 0,
-            "links_blocked": 0
-        })
-
-# ================================
-# Менеджер настроек чата
-# ================================
-class SettingsManager:
-    """Настройки чатов"""
-    
-    def __init__(self, storage: JsonStorage):
-        self.storage = storage
-    
-    def get(self, chat_id: int, key: str) -> Any:
-        chat_settings = self.storage.get(str(chat_id), {})
-        return chat_settings.get(key, DEFAULT_SETTINGS.get(key))
-    
-    def set(self, chat_id: int, key: str, value: Any) -> None:
-        chat_settings = self.storage.get(str(chat_id), {})
-        chat_settings[key] = value
-        self.storage.set(str(chat_id), chat_settings)
-    
-    def get_all(self, chat_id: int) -> dict:
-        default = DEFAULT_SETTINGS.copy()
-        default.update(self.storage.get(str(chat_id), {}))
-        return default
-    
-    def reset(self, chat_id: int) -> None:
-        self.storage.delete(str(chat_id))
-
-# ================================
-# Менеджер состояний пользователей
-# ================================
-class UserStateManager:
-    def __init__(self):
-        self._lock = threading.Lock()
-        self._states: dict = {}
-    
-    def set_state(self, user_id: int, state: str, data: dict = None) -> None:
-        with self._lock:
-            self._states[user_id] = {"state": state, "data": data or {}}
-    
-    def get_state(self, user_id: int) -> Optional[dict]:
-        with self._lock:
-            return self._states.get(user_id)
-    
-    def clear(self, user_id: int) -> None:
-        with self._lock:
-            self._states.pop(user_id, None)
-    
-    def start_confirmation(self, user_id: int) -> None:
-        self.set_state(user_id, "confirm", {"count": 0})
-    
-    def confirm(self, user_id: int) -> Optional[int]:
-        with self._lock:
-            if user_id not in self._states or self._states[user_id]["state"] != "confirm":
-                return None
-            self._states[user_id]["data"]["count"] += 1
-            return self._states[user_id]["data"]["count"]
-
-# ================================
-# Инициализация менеджеров
-# ================================
-triggers = TriggerManager(TRIGGER_PATH)
-warns_storage = JsonStorage(WARNS_PATH, {})
-stats_storage = JsonStorage(STATS_PATH, {})
-settings_storage = JsonStorage(SETTINGS_PATH, {})
-
-warns = WarnsManager(warns_storage)
-stats = StatsManager(stats_storage)
-settings = SettingsManager(settings_storage)
-antispam = AntiSpamManager()
-user_states = UserStateManager()
-bot_admins = BotAdminsManager(ADMINS_PATH)
-
-# ================================
-# Логирование
-# ================================
-_log_lock = threading.Lock()
-
-def write_log(text: str) -> None:
-    try:
-        with _log_lock:
-            with open(LOG_PATH, "a", encoding="utf-8") as f:
-                f.write(f"{text}\n")
-    except Exception as e:
-        print(f"⚠️ Ошибка записи лога: {e}")
-
-# ================================
-# Утилиты
-# ================================
-def censor_word(word: str) -> str:
-    length = len(word)
-    if length <= 1:
-        return "*"
-    if length == 2:
-        return word[0] + "*"
-    return word[0] + "*" * (length - 2) + word[-1]
-
-def is_chat_admin(chat_id: int, user_id: int) -> bool:
-    """Проверяет, является ли пользователь админом ЧАТА"""
-    try:
-        member = bot.get_chat_member(chat_id, user_id)
-        return member.status in ("creator", "administrator")
-    except Exception:
-        return False
-
-def is_creator(chat_id: int, user_id: int) -> bool:
-    try:
-        member = bot.get_chat_member(chat_id, user_id)
-        return member.status == "creator"
-    except Exception:
-        return False
-
-def is_private(message) -> bool:
-    return message.chat.type == "private"
-
-def is_group(message) -> bool:
-    return message.chat.type in ("group", "supergroup")
-
-def get_user_display(user) -> str:
-    if user.username:
-        return f"@{user.username}"
-    return user.first_name or f"ID:{user.id}"
-
-def get_user_link(user) -> str:
-    name = user.first_name or f"ID:{user.id}"
-    return f'<a href="tg://user?id={user.id}">{name}</a>'
-
-def parse_duration(text: str) -> Optional[int]:
-    match = re.match(r'^(\d+)([mhdw])$', text.lower())
-    if not match:
-        return None
-    value = int(match.group(1))
-    unit = match.group(2)
-    multipliers = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
-    return value * multipliers.get(unit, 60)
-
-def format_duration(seconds: int) -> str:
-    if seconds < 60:
-        return f"{seconds} сек"
-    if seconds < 3600:
-        return f"{seconds // 60} мин"
-    if seconds < 86400:
-        return f"{seconds // 3600} ч"
-    return f"{seconds // 86400} дн"
-
-def extract_user_from_message(message) -> tuple:
-    """Извлекает пользователя из reply или аргументов команды"""
-    # Из reply
-    if message.reply_to_message and message.reply_to_message.from_user:
-        parts = message.text.split(maxsplit=2) if message.text else []
-        reason = parts[1] if len(parts) > 1 else None
-        return message.reply_to_message.from_user, reason
-    
-    parts = message.text.split(maxsplit=2) if message.text else []
-    if len(parts) < 2:
-        return None, None
-    
-    user_arg = parts[1]
-    reason = parts[2] if len(parts) > 2 else None
-    
-    # По ID
-    if user_arg.isdigit():
-        try:
-            member = bot.get_chat_member(message.chat.id, int(user_arg))
-            return member.user, reason
-        except Exception:
-            pass
-    
-    # По @username - убираем @ если есть
-    if user_arg.startswith("@"):
-        user_arg = user_arg[1:]
-    
-    # Пытаемся найти через entities
-    if message.entities:
-        for entity in message.entities:
-            if entity.type == "mention":
-                mention_text = message.text[entity.offset:entity.offset + entity.length]
-                if mention_text.startswith("@"):
-                    mention_text = mention_text[1:]
-                # К сожалению, Telegram API не позволяет получить user_id по username напрямую
-                # Возвращаем None, пользователь должен использовать reply или ID
-                pass
-            elif entity.type == "text_mention" and entity.user:
-                return entity.user, reason
-    
-    return None, reason
-
-def has_links(text: str) -> bool:
-    patterns = [
-        r'https?://\S+',
-        r't\.me/\S+',
-        r'telegram\.me/\S+',
-    ]
-    for pattern in patterns:
-        if re.search(pattern, text, re.IGNORECASE):
-            return True
-    return False
-
-# ================================
-# ИСПРАВЛЕНИЕ: Функция для создания ChatPermissions
-# ================================
-def get_mute_permissions() -> types.ChatPermissions:
-    """Создает объект ChatPermissions для мута (совместимо с разными версиями API)"""
-    try:
-        # Новая версия API (Bot API 6.3+)
-        return types.ChatPermissions(
-            can_send_messages=False,
-            can_send_audios=False,
-            can_send_documents=False,
-            can_send_photos=False,
-            can_send_videos=False,
-            can_send_video_notes=False,
-            can_send_voice_notes=False,
-            can_send_polls=False,
-            can_send_other_messages=False,
-            can_add_web_page_previews=False,
-            can_change_info=False,
-            can_invite_users=False,
-            can_pin_messages=False,
-            can_manage_topics=False
-        )
-    except TypeError:
-        # Старая версия API
-        return types.ChatPermissions(
-            can_send_messages=False,
-            can_send_media_messages=False,
-            can_send_other_messages=False,
-            can_add_web_page_previews=False
-        )
-
-def get_unmute_permissions() -> types.ChatPermissions:
-    """Создает объект ChatPermissions для размута (совместимо с разными версиями API)"""
-    try:
-        # Новая версия API (Bot API 6.3+)
-        return types.ChatPermissions(
-            can_send_messages=True,
-            can_send_audios=True,
-            can_send_documents=True,
-            can_send_photos=True,
-            can_send_videos=True,
-            can_send_video_notes=True,
-            can_send_voice_notes=True,
-            can_send_polls=True,
-            can_send_other_messages=True,
-            can_add_web_page_previews=True,
-            can_change_info=False,
-            can_invite_users=True,
-            can_pin_messages=False,
-            can_manage_topics=False
-        )
-    except TypeError:
-        # Старая версия API
-        return types.ChatPermissions(
-            can_send_messages=True,
-            can_send_media_messages=True,
-            can_send_other_messages=True,
-            can_add_web_page_previews=True
-        )
-
-# ================================
-# Декораторы
-# ================================
-def bot_admin_only(func):
-    """Только для глобальных администраторов бота"""
-    @wraps(func)
-    def wrapper(message, *args, **kwargs):
-        user_id = message.from_user.id
-        
-        if bot_admins.is_admin(user_id):
-            return func(message, *args, **kwargs)
-        
-        # Анонимный админ — проверяем, может он в списке по-другому
-        # Но для bot_admin_only нужен реальный ID, так что отказываем
-        if user_id == ANONYMOUS_ADMIN_ID:
-            bot.reply_to(message, "⛔ Отключите анонимность для использования этой команды")
-            return
-        
-        bot.reply_to(message, "⛔ Только для администраторов бота")
-    return wrapper
-
-def admin_only(func):
-    """Для админов чата ИЛИ глобальных админов бота"""
-    @wraps(func)
-    def wrapper(message, *args, **kwargs):
-        user_id = message.from_user.id
-        
-        # Глобальный админ бота
-        if bot_admins.is_admin(user_id):
-            return func(message, *args, **kwargs)
-        
-        # Анонимный админ группы — он точно админ чата
-        if user_id == ANONYMOUS_ADMIN_ID:
-            return func(message, *args, **kwargs)
-        
-        # В личке разрешаем только глобальным админам
-        if is_private(message):
-            bot.reply_to(message, "⛔ Нет доступа")
-            return
-        
-        # Админ чата
-        if is_chat_admin(message.chat.id, user_id):
-            return func(message, *args, **kwargs)
-        
-        bot.reply_to(message, "⛔ Только для админов")
-    return wrapper
-
-def creator_only(func):
-    """Только для создателя чата или глобального админа бота"""
-    @wraps(func)
-    def wrapper(message, *args, **kwargs):
-        user_id = message.from_user.id
-        
-        if bot_admins.is_admin(user_id):
-            return func(message, *args, **kwargs)
-        
-        # Анонимный — не можем проверить, создатель ли он
-        if user_id == ANONYMOUS_ADMIN_ID:
-            bot.reply_to(message, "⛔ Отключите анонимность для этой команды")
-            return
-        
-        if is_private(message):
-            bot.reply_to(message, "⛔ Только в группах")
-            return
-        
-        if is_creator(message.chat.id, user_id):
-            return func(message, *args, **kwargs)
-        
-        bot.reply_to(message, "⛔ Только для создателя чата")
-    return wrapper
-
-def group_only(func):
-    @wraps(func)
-    def wrapper(message, *args, **kwargs):
-        if is_group(message):
-            return func(message, *args, **kwargs)
-        bot.reply_to(message, "⛔ Эта команда работает только в группах")
-    return wrapper
-
-# ================================
-# Клавиатуры
-# ================================
-def get_main_keyboard() -> types.InlineKeyboardMarkup:
-    keyboard = types.InlineKeyboardMarkup(row_width=2)
-    keyboard.add(
-        types.InlineKeyboardButton("➕ Добавить слово", callback_data="help_add"),
-        types.InlineKeyboardButton("➖ Удалить слово", callback_data="help_del"),
-        types.InlineKeyboardButton("📄 Список слов", callback_data="list_words"),
-        types.InlineKeyboardButton("📊 Статистика", callback_data="show_stats"),
-        types.InlineKeyboardButton("⚙️ Настройки", callback_data="show_settings"),
-        types.InlineKeyboardButton("❓ Все команды", callback_data="all_commands")
-    )
-    return keyboard
-
-def get_settings_keyboard(chat_id: int) -> types.InlineKeyboardMarkup:
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-    
-    antispam_status = "✅" if settings.get(chat_id, "antispam_enabled") else "❌"
-    antilink_status = "✅" if settings.get(chat_id, "antilink_enabled") else "❌"
-    welcome_status = "✅" if settings.get(chat_id, "welcome_enabled") else "❌"
-    
-    keyboard.add(
-        types.InlineKeyboardButton(f"🔄 Анти-спам: {antispam_status}", callback_data="toggle_antispam"),
-        types.InlineKeyboardButton(f"🔗 Анти-ссылки: {antilink_status}", callback_data="toggle_antilink"),
-        types.InlineKeyboardButton(f"👋 Приветствия: {welcome_status}", callback_data="toggle_welcome"),
-        types.InlineKeyboardButton("🔙 Назад", callback_data="back_main")
-    )
-    return keyboard
-
-# ================================
-# Команды администратора бота
-# ================================
-@bot.message_handler(commands=["myid"])
-def cmd_myid(message):
-    """Получить свой Telegram ID"""
-    bot.reply_to(
-        message, 
-        f"🆔 Твой ID: `{message.from_user.id}`\n"
-        f"💬 ID чата: `{message.chat.id}`",
-        parse_mode="Markdown"
-    )
-
-@bot.message_handler(commands=["addowner"])
-def cmd_add_owner(message):
-    """
-    Секретная команда для первичной регистрации владельца.
-    Использование: /addowner <секретный_код>
-    
-    ⚠️ ВАЖНО: Измените SECRET_CODE перед использованием!
-    После добавления первого админа можно удалить эту команду.
-    """
-    SECRET_CODE = "SecretCode"  # ⚠️ ИЗМЕНИТЕ ЭТО!
-    
-    parts = message.text.split() if message.text else []
-    if len(parts) < 2:
-        return  # Молча игнорируем неполную команду
-    
-    if parts[1] != SECRET_CODE:
-        return  # Молча игнорируем неверный код
-    
-    user_id = message.from_user.id
-    
-    if bot_admins.add(user_id):
-        bot.reply_to(
-            message, 
-            f"✅ Вы добавлены как администратор бота!\n"
-            f"🆔 Ваш ID: `{user_id}`\n\n"
-            f"⚠️ Рекомендуется удалить команду /addowner из кода.",
-            parse_mode="Markdown"
-        )
-    else:
-        bot.reply_to(message, "ℹ️ Вы уже являетесь администратором бота")
-
-@bot.message_handler(commands=["addadmin"])
-@bot_admin_only
-def cmd_add_bot_admin(message):
-    """Добавить глобального администратора бота"""
-    parts = message.text.split() if message.text else []
-    if len(parts) < 2:
-        bot.reply_to(
-            message, 
-            "📝 Использование: `/addadmin <user_id>`\n\n"
-            "Узнать ID: пусть пользователь напишет боту /myid",
-            parse_mode="Markdown"
-        )
-        return
-    
-    try:
-        user_id = int(parts[1])
-        if bot_admins.add(user_id):
-            bot.reply_to(message, f"✅ Пользователь `{user_id}` добавлен как администратор бота", parse_mode="Markdown")
-        else:
-            bot.reply_to(message, "⚠️ Этот пользователь уже является администратором")
-    except ValueError:
-        bot.reply_to(message, "⚠️ Укажите числовой ID пользователя")
-
-@bot.message_handler(commands=["removeadmin"])
-@bot_admin_only
-def cmd_remove_bot_admin(message):
-    """Удалить глобального администратора бота"""
-    parts = message.text.split() if message.text else []
-    if len(parts) < 2:
-        bot.reply_to(message, "📝 Использование: `/removeadmin <user_id>`", parse_mode="Markdown")
-        return
-    
-    try:
-        user_id = int(parts[1])
-        
-        if user_id == message.from_user.id:
-            bot.reply_to(message, "⚠️ Нельзя удалить самого себя")
-            return
-        
-        if bot_admins.remove(user_id):
-            bot.reply_to(message, f"✅ Пользователь `{user_id}` удален из администраторов бота", parse_mode="Markdown")
-        else:
-            bot.reply_to(message, "⚠️ Этот пользователь не является администратором")
-    except ValueError:
-        bot.reply_to(message, "⚠️ Укажите числовой ID пользователя")
-
-@bot.message_handler(commands=["listadmins"])
-@bot_admin_only
-def cmd_list_bot_admins(message):
-    """Список глобальных администраторов бота"""
-    admins = bot_admins.get_all()
-    
-    if not admins:
-        bot.reply_to(message, "📭 Список администраторов бота пуст")
-        return
-    
-    text = "👑 *Администраторы бота:*\n\n"
-    for i, admin_id in enumerate(admins, 1):
-        marker = " (вы)" if admin_id == message.from_user.id else ""
-        text += f"{i}. `{admin_id}`{marker}\n"
-    
-    bot.reply_to(message, text, parse_mode="Markdown")
-
-# ================================
-# Команды /start и /help
-# ================================
-@bot.message_handler(commands=["start", "help"])
-def cmd_help(message):
-    is_bot_admin = bot_admins.is_admin(message.from_user.id)
-    
-    text = (
-        "🤖 *Бот модерации*\n\n"
-        "📋 *Основные команды:*\n"
-        "• `/addword <слово>` — добавить триггер\n"
-        "• `/delword <слово>` — удалить триггер\n"
-        "• `/listwords` — список триггеров\n\n"
-        "👮 *Модерация:*\n"
-        "• `/warn` — предупреждение\n"
-        "• `/mute` — мут пользователя\n"
-        "• `/ban` — бан пользователя\n"
-        "• `/kick` — кик пользователя\n\n"
-        "📊 `/stats` — статистика\n"
-        "⚙️ `/settings` — настройки\n"
-        "🆔 `/myid` — узнать свой ID\n"
-        "❓ `/commands` — все команды"
-    )
-    
-    if is_bot_admin:
-        text += (
-            "\n\n👑 *Команды владельца:*\n"
-            "• `/addadmin` — добавить админа бота\n"
-            "• `/removeadmin` — удалить админа бота\n"
-            "• `/listadmins` — список админов бота"
-        )
-    
-    bot.send_message(
-        message.chat.id,
-        text,
-        parse_mode="Markdown",
-        reply_markup=get_main_keyboard()
-    )
-
-# ================================
-# Все команды
-# ================================
-@bot.message_handler(commands=["commands"])
-def cmd_all_commands(message):
-    is_bot_admin = bot_admins.is_admin(message.from_user.id)
-    
-    text = """
-📋 *Полный список команд:*
-
-*Триггер-слова:*
-• `/addword <слово>` — добавить
-• `/addwords <слова>` — добавить несколько
-• `/delword <слово>` — удалить
-• `/listwords` — показать список
-• `/clearwords` — очистить все
-
-*Модерация пользователей:*
-• `/warn [user] [причина]` — предупреждение
-• `/unwarn [user]` — снять предупреждение
-• `/warns [user]` — список предупреждений
-• `/clearwarns [user]` — очистить предупреждения
-• `/mute [user] [время]` — мут (1h, 30m, 1d)
-• `/unmute [user]` — размут
-• `/ban [user] [причина]` — бан
-• `/unban [user_id]` — разбан
-• `/kick [user]` — кик
-
-*Информация:*
-• `/userinfo [user]` — инфо о пользователе
-• `/chatinfo` — инфо о чате
-• `/stats` — статистика модерации
-• `/myid` — ваш Telegram ID
-
-*Утилиты:*
-• `/clear <N>` — удалить N сообщений
-• `/pin` — закрепить сообщение
-• `/unpin` — открепить сообщение
-
-*Настройки:*
-• `/settings` — настройки чата
-• `/setwelcome <текст>` — текст приветствия
-• `/setmaxwarns <N>` — макс. предупреждений
-"""
-    
-    if is_bot_admin:
-        text += """
-*👑 Команды владельца бота:*
-• `/addadmin <user_id>` — добавить админа
-• `/removeadmin <user_id>` — удалить админа
-• `/listadmins` — список админов
-"""
-    
-    text += "\n_Используйте reply или укажите @username/ID_"
-    
-    bot.send_message(message.chat.id, text, parse_mode="Markdown")
-
-# ================================
-# Callback обработчик
-# ================================
-@bot.callback_query_handler(func=lambda call: True)
-def callback_handler(call):
-    chat_id = call.message.chat.id
-    user_id = call.from_user.id
-    
-    # Проверка прав: админ бота ИЛИ админ чата
-    has_access = bot_admins.is_admin(user_id)
-    if not has_access and not is_private(call.message):
-        has_access = is_chat_admin(chat_id, user_id)
-    
-    if not has_access:
-        bot.answer_callback_query(call.id, "⛔ Нет доступа", show_alert=True)
-        return
-    
-    try:
-        if call.data == "help_add":
-            bot.answer_callback_query(call.id)
-            bot.send_message(chat_id, "📝 Используй: `/addword <слово>`", parse_mode="Markdown")
-        
-        elif call.data == "help_del":
-            bot.answer_callback_query(call.id)
-            bot.send_message(chat_id, "📝 Используй: `/delword <слово>`", parse_mode="Markdown")
-        
-        elif call.data == "list_words":
-            bot.answer_callback_query(call.id)
-            user_states.start_confirmation(user_id)
-            bot.send_message(
-                chat_id,
-                f"⚠️ *Подтверждение*\n\nСлов: {triggers.count()}\nПодтвердите 3 раза: /confirm",
-                parse_mode="Markdown"
-            )
-        
-        elif call.data == "show_stats":
-            bot.answer_callback_query(call.id)
-            if is_group(call.message):
-                send_stats(chat_id)
-            else:
-                bot.send_message(chat_id, "📊 Статистика доступна только в группах")
-        
-        elif call.data == "show_settings":
-            bot.answer_callback_query(call.id)
-            if is_group(call.message):
-                bot.send_message(
-                    chat_id,
-                    "⚙️ *Настройки чата:*",
-                    parse_mode="Markdown",
-                    reply_markup=get_settings_keyboard(chat_id)
-                )
-            else:
-                bot.send_message(chat_id, "⚙️ Настройки доступны только в группах")
-        
-        elif call.data == "toggle_antispam":
-            current = settings.get(chat_id, "antispam_enabled")
-            settings.set(chat_id, "antispam_enabled", not current)
-            status = 'включен' if not current else 'выключен'
-            bot.answer_callback_query(call.id, f"Анти-спам {status}")
-            bot.edit_message_reply_markup(
-                chat_id, call.message.message_id,
-                reply_markup=get_settings_keyboard(chat_id)
-            )
-        
-        elif call.data == "toggle_antilink":
-            current = settings.get(chat_id, "antilink_enabled")
-            settings.set(chat_id, "antilink_enabled", not current)
-            status = 'включен' if not current else 'выключен'
-            bot.answer_callback_query(call.id, f"Анти-ссылки {status}")
-            bot.edit_message_reply_markup(
-                chat_id, call.message.message_id,
-                reply_markup=get_settings_keyboard(chat_id)
-            )
-        
-        elif call.data == "toggle_welcome":
-            current = settings.get(chat_id, "welcome_enabled")
-            settings.set(chat_id, "welcome_enabled", not current)
-            status = 'включены' if not current else 'выключены'
-            bot.answer_callback_query(call.id, f"Приветствия {status}")
-            bot.edit_message_reply_markup(
-                chat_id, call.message.message_id,
-                reply_markup=get_settings_keyboard(chat_id)
-            )
-        
-        elif call.data == "back_main":
-            bot.answer_callback_query(call.id)
-            bot.edit_message_text(
-                "🤖 Главное меню",
-                chat_id, call.message.message_id,
-                reply_markup=get_main_keyboard()
-            )
-        
-        elif call.data == "all_commands":
-            bot.answer_callback_query(call.id)
-            cmd_all_commands(call.message)
-            
-    except Exception as e:
-        print(f"❌ Callback error: {e}")
-        bot.answer_callback_query(call.id, "Ошибка обработки")
-
-# ================================
-# /confirm
-# ================================
-@bot.message_handler(commands=["confirm"])
-def cmd_confirm(message):
-    user_id = message.from_user.id
-    chat_id = message.chat.id
-    
-    count = user_states.confirm(user_id)
-    
-    if count is None:
-        bot.reply_to(message, "❓ Сначала запросите список слов")
-        return
-    
-    if count < 3:
-        bot.reply_to(message, f"✅ Подтверждено {count}/3")
-        return
-    
-    words = triggers.get_all()
-    
-    if not words:
-        bot.send_message(chat_id, "📭 Список триггеров пуст")
-        user_states.clear(user_id)
-        return
-    
-    temp_file = os.path.join(BASE_DIR, f"triggers_{user_id}.txt")
-    
-    try:
-        with open(temp_file, "w", encoding="utf-8") as f:
-            f.write("\n".join(words))
-        
-        with open(temp_file, "rb") as f:
-            bot.send_document(chat_id, f, caption=f"📄 Триггер-слова ({len(words)} шт.)")
-    finally:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-        user_states.clear(user_id)
-
-# ================================
-# Команды триггер-слов
-# ================================
-@bot.message_handler(commands=["addword"])
-@admin_only
-def cmd_addword(message):
-    parts = message.text.split(maxsplit=1) if message.text else []
-    if len(parts) < 2:
-        bot.reply_to(message, "📝 Использование: `/addword <слово>`", parse_mode="Markdown")
-        return
-    
-    word = parts[1].strip()
-    if len(word) > 100:
-        bot.reply_to(message, "⚠️ Слово слишком длинное (макс. 100 символов)")
-        return
-    
-    if triggers.add(word):
-        bot.reply_to(message, f"✅ Добавлено: `{word.lower()}`", parse_mode="Markdown")
-    else:
-        bot.reply_to(message, "⚠️ Это слово уже в списке")
-
-@bot.message_handler(commands=["addwords"])
-@admin_only
-def cmd_addwords(message):
-    parts = message.text.split()[1:] if message.text else []
-    if not parts:
-        bot.reply_to(message, "📝 Использование: `/addwords слово1 слово2 слово3`", parse_mode="Markdown")
-        return
-    
-    added = triggers.add_many(parts)
-    bot.reply_to(message, f"✅ Добавлено слов: {added}")
-
-@bot.message_handler(commands=["delword"])
-@admin_only
-def cmd_delword(message):
-    parts = message.text.split(maxsplit=1) if message.text else []
-    if len(parts) < 2:
-        bot.reply_to(message, "📝 Использование: `/delword <слово>`", parse_mode="Markdown")
-        return
-    
-    word = parts[1].strip()
-    if triggers.remove(word):
-        bot.reply_to(message, f"✅ Удалено: `{word.lower()}`", parse_mode="Markdown")
-    else:
-        bot.reply_to(message, "⚠️ Слово не найдено в списке")
-
-@bot.message_handler(commands=["clearwords"])
-@creator_only
-def cmd_clearwords(message):
-    count = triggers.clear()
-    bot.reply_to(message, f"🗑️ Удалено триггер-слов: {count}")
-
-@bot.message_handler(commands=["listwords"])
-@admin_only
-def cmd_listwords(message):
-    user_states.start_confirmation(message.from_user.id)
-    bot.send_message(
-        message.chat.id,
-        f"⚠️ В списке: {triggers.count()} слов\nПодтвердите 3 раза: /confirm"
-    )
-
-# ================================
-# Модерация: /warn, /unwarn, /warns
-# ================================
-# ИСПРАВЛЕНИЕ: Порядок декораторов - @group_only должен быть ближе к функции
-@bot.message_handler(commands=["warn"])
-@group_only
-@admin_only
-def cmd_warn(message):
-    user, reason = extract_user_from_message(message)
-    
-    if not user:
-        bot.reply_to(message, "📝 Ответьте на сообщение или: `/warn @user причина`", parse_mode="Markdown")
-        return
-    
-    if is_chat_admin(message.chat.id, user.id):
-        bot.reply_to(message, "⚠️ Нельзя выдать предупреждение админу чата")
-        return
-    
-    reason = reason or "Не указана"
-    count = warns.add_warn(message.chat.id, user.id, reason, message.from_user.id)
-    max_warns = settings.get(message.chat.id, "max_warns")
-    
-    stats.increment(message.chat.id, "warns_given")
-    
-    text = (
-        f"⚠️ *Предупреждение*\n\n"
-        f"👤 Пользователь: {get_user_display(user)}\n"
-        f"📛 Причина: {reason}\n"
-        f"📊 Предупреждений: {count}/{max_warns}"
-    )
-    
-    bot.send_message(message.chat.id, text, parse_mode="Markdown")
-    
-    if count >= max_warns:
-        try:
-            bot.ban_chat_member(message.chat.id, user.id)
-            bot.send_message(
-                message.chat.id,
-                f"🔨 {get_user_display(user)} забанен (достигнут лимит предупреждений)"
-            )
-            stats.increment(message.chat.id, "bans")
-        except Exception as e:
-            bot.send_message(message.chat.id, f"❌ Ошибка бана: {e}")
-
-@bot.message_handler(commands=["unwarn"])
-@group_only
-@admin_only
-def cmd_unwarn(message):
-    user, _ = extract_user_from_message(message)
-    
-    if not user:
-        bot.reply_to(message, "📝 Ответьте на сообщение или: `/unwarn @user`", parse_mode="Markdown")
-        return
-    
-    if warns.remove_warn(message.chat.id, user.id):
-        count = warns.count_warns(message.chat.id, user.id)
-        bot.reply_to(message, f"✅ Предупреждение снято. Осталось: {count}")
-    else:
-        bot.reply_to(message, "⚠️ У пользователя нет предупреждений")
-
-@bot.message_handler(commands=["warns"])
-@group_only
-@admin_only
-def cmd_warns(message):
-    user, _ = extract_user_from_message(message)
-    
-    if not user:
-        bot.reply_to(message, "📝 Ответьте на сообщение или: `/warns @user`", parse_mode="Markdown")
-        return
-    
-    user_warns = warns.get_warns(message.chat.id, user.id)
-    
-    if not user_warns:
-        bot.reply_to(message, f"✅ У {get_user_display(user)} нет предупреждений")
-        return
-    
-    text = f"📋 *Предупреждения {get_user_display(user)}:*\n\n"
-    for i, w in enumerate(user_warns, 1):
-        date = datetime.fromisoformat(w['date']).strftime("%d.%m.%Y")
-        text += f"{i}. {w['reason']} ({date})\n"
-    
-    bot.send_message(message.chat.id, text, parse_mode="Markdown")
-
-@bot.message_handler(commands=["clearwarns"])
-@group_only
-@admin_only
-def cmd_clearwarns(message):
-    user, _ = extract_user_from_message(message)
-    
-    if not user:
-        bot.reply_to(message, "📝 Ответьте на сообщение или: `/clearwarns @user`", parse_mode="Markdown")
-        return
-    
-    count = warns.clear_warns(message.chat.id, user.id)
-    bot.reply_to(message, f"✅ Снято предупреждений: {count}")
-
-# ================================
-# Модерация: /mute, /unmute
-# ================================
-@bot.message_handler(commands=["mute"])
-@group_only
-@admin_only
-def cmd_mute(message):
-    parts = message.text.split() if message.text else []
-    duration_str = None
-    user = None
-    
-    if message.reply_to_message and message.reply_to_message.from_user:
-        user = message.reply_to_message.from_user
-        if len(parts) > 1:
-            duration_str = parts[1]
-    else:
-        if len(parts) < 2:
-            bot.reply_to(
-                message, 
-                "📝 Ответьте на сообщение или: `/mute @user [время]`\n"
-                "Время: 1m, 1h, 1d, 1w",
-                parse_mode="Markdown"
-            )
-            return
-        user, _ = extract_user_from_message(message)
-        if len(parts) > 2:
-            duration_str = parts[2]
-    
-    if not user:
-        bot.reply_to(message, "❌ Пользователь не найден")
-        return
-    
-    if is_chat_admin(message.chat.id, user.id):
-        bot.reply_to(message, "⚠️ Нельзя замутить админа чата")
-        return
-    
-    if duration_str:
-        duration = parse_duration(duration_str)
-        if not duration:
-            bot.reply_to(message, "⚠️ Неверный формат времени. Примеры: 30m, 1h, 1d")
-            return
-        until_date = datetime.now() + timedelta(seconds=duration)
-        duration_text = format_duration(duration)
-    else:
-        until_date = None
-        duration_text = "навсегда"
-    
-    try:
-        # ИСПРАВЛЕНИЕ: Используем функцию для совместимости с разными версиями API
-        bot.restrict_chat_member(
-            message.chat.id,
-            user.id,
-            until_date=until_date,
-            permissions=get_mute_permissions()
-        )
-        
-        bot.send_message(
-            message.chat.id,
-            f"🔇 {get_user_display(user)} замучен на {duration_text}"
-        )
-        stats.increment(message.chat.id, "mutes")
-        
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка: {e}")
-
-@bot.message_handler(commands=["unmute"])
-@group_only
-@admin_only
-def cmd_unmute(message):
-    user, _ = extract_user_from_message(message)
-    
-    if not user:
-        bot.reply_to(message, "📝 Ответьте на сообщение или: `/unmute @user`", parse_mode="Markdown")
-        return
-    
-    try:
-        # ИСПРАВЛЕНИЕ: Используем функцию для совместимости с разными версиями API
-        bot.restrict_chat_member(
-            message.chat.id,
-            user.id,
-            permissions=get_unmute_permissions()
-        )
-        bot.reply_to(message, f"🔊 {get_user_display(user)} размучен")
-        
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка: {e}")
-
-# ================================
-# Модерация: /ban, /unban, /kick
-# ================================
-@bot.message_handler(commands=["ban"])
-@group_only
-@admin_only
-def cmd_ban(message):
-    user, reason = extract_user_from_message(message)
-    
-    if not user:
-        bot.reply_to(message, "📝 Ответьте на сообщение или: `/ban @user [причина]`", parse_mode="Markdown")
-        return
-    
-    if is_chat_admin(message.chat.id, user.id):
-        bot.reply_to(message, "⚠️ Нельзя забанить админа чата")
-        return
-    
-    try:
-        bot.ban_chat_member(message.chat.id, user.id)
-        
-        text = f"🔨 {get_user_display(user)} забанен"
-        if reason:
-            text += f"\n📛 Причина: {reason}"
-        
-        bot.send_message(message.chat.id, text)
-        stats.increment(message.chat.id, "bans")
-        
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка: {e}")
-
-@bot.message_handler(commands=["unban"])
-@group_only
-@admin_only
-def cmd_unban(message):
-    parts = message.text.split() if message.text else []
-    if len(parts) < 2:
-        bot.reply_to(message, "📝 Использование: `/unban <user_id>`", parse_mode="Markdown")
-        return
-    
-    try:
-        user_id = int(parts[1])
-        bot.unban_chat_member(message.chat.id, user_id, only_if_banned=True)
-        bot.reply_to(message, f"✅ Пользователь `{user_id}` разбанен", parse_mode="Markdown")
-        
-    except ValueError:
-        bot.reply_to(message, "⚠️ Укажите числовой ID пользователя")
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка: {e}")
-
-@bot.message_handler(commands=["kick"])
-@group_only
-@admin_only
-def cmd_kick(message):
-    user, _ = extract_user_from_message(message)
-    
-    if not user:
-        bot.reply_to(message, "📝 Ответьте на сообщение или: `/kick @user`", parse_mode="Markdown")
-        return
-    
-    if is_chat_admin(message.chat.id, user.id):
-        bot.reply_to(message, "⚠️ Нельзя кикнуть админа чата")
-        return
-    
-    try:
-        bot.ban_chat_member(message.chat.id, user.id)
-        bot.unban_chat_member(message.chat.id, user.id)
-        
-        bot.send_message(message.chat.id, f"👢 {get_user_display(user)} кикнут")
-        stats.increment(message.chat.id, "kicks")
-        
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка: {e}")
-
-# ================================
-# Информация
-# ================================
-@bot.message_handler(commands=["userinfo"])
-@group_only
-@admin_only
-def cmd_userinfo(message):
-    user, _ = extract_user_from_message(message)
-    
-    if not user:
-        user = message.from_user
-    
-    try:
-        member = bot.get_chat_member(message.chat.id, user.id)
-        
-        status_map = {
-            "creator": "👑 Создатель",
-            "administrator": "⭐ Админ",
-            "member": "👤 Участник",
-            "restricted": "🔇 Ограничен",
-            "left": "🚪 Покинул",
-            "kicked": "🚫 Забанен"
-        }
-        
-        user_warns_count = warns.count_warns(message.chat.id, user.id)
-        is_bot_admin_status = "✅" if bot_admins.is_admin(user.id) else "❌"
-        
-        text = (
-            f"👤 *Информация о пользователе*\n\n"
-            f"├ ID: `{user.id}`\n"
-            f"├ Имя: {user.first_name or 'N/A'}\n"
-            f"├ Фамилия: {user.last_name or 'N/A'}\n"
-            f"├ Username: @{user.username or 'N/A'}\n"
-            f"├ Статус в чате: {status_map.get(member.status, member.status)}\n"
-            f"├ Админ бота: {is_bot_admin_status}\n"
-            f"├ Бот: {'Да' if user.is_bot else 'Нет'}\n"
-            f"└ Предупреждений: {user_warns_count}"
-        )
-        
-        bot.send_message(message.chat.id, text, parse_mode="Markdown")
-        
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка: {e}")
-
-@bot.message_handler(commands=["chatinfo"])
-@group_only
-def cmd_chatinfo(message):
-    chat = message.chat
-    
-    try:
-        member_count = bot.get_chat_member_count(chat.id)
-        
-        text = (
-            f"💬 *Информация о чате*\n\n"
-            f"├ ID: `{chat.id}`\n"
-            f"├ Название: {chat.title}\n"
-            f"├ Тип: {chat.type}\n"
-            f"├ Username: @{chat.username or 'N/A'}\n"
-            f"└ Участников: {member_count}"
-        )
-        
-        bot.send_message(chat.id, text, parse_mode="Markdown")
-        
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка: {e}")
-
-# ================================
-# Статистика
-# ================================
-def send_stats(chat_id: int):
-    chat_stats = stats.get_stats(chat_id)
-    
-    text = (
-        f"📊 *Статистика модерации*\n\n"
-        f"├ 🗑️ Удалено сообщений: {chat_stats.get('deleted_messages', 0)}\n"
-        f"├ ⚠️ Предупреждений: {chat_stats.get('warns_given', 0)}\n"
-        f"├ 🔇 Мутов: {chat_stats.get('mutes', 0)}\n"
-        f"├ 🔨 Банов: {chat_stats.get('bans', 0)}\n"
-        f"├ 👢 Киков: {chat_stats.get('kicks', 0)}\n"
-        f"├ 🔄 Заблокировано спама: {chat_stats.get('spam_blocked', 0)}\n"
-        f"└ 🔗 Заблокировано ссылок: {chat_stats.get('links_blocked', 0)}"
-    )
-    
-    bot.send_message(chat_id, text, parse_mode="Markdown")
-
-@bot.message_handler(commands=["stats"])
-@admin_only
-def cmd_stats(message):
-    if is_private(message):
-        bot.reply_to(message, "📊 Статистика доступна только в группах")
-        return
-    send_stats(message.chat.id)
-
-# ================================
-# Утилиты: /clear, /pin, /unpin
-# ================================
-@bot.message_handler(commands=["clear"])
-@group_only
-@admin_only
-def cmd_clear(message):
-    parts = message.text.split() if message.text else []
-    if len(parts) < 2:
-        bot.reply_to(message, "📝 Использование: `/clear <количество>`", parse_mode="Markdown")
-        return
-    
-    try:
-        count = int(parts[1])
-        if count < 1 or count > 100:
-            bot.reply_to(message, "⚠️ Укажите число от 1 до 100")
-            return
-        
-        deleted = 0
-        for i in range(count + 1):
-            try:
-                bot.delete_message(message.chat.id, message.message_id - i)
-                deleted += 1
-            except Exception:
-                continue
-        
-        msg = bot.send_message(message.chat.id, f"🗑️ Удалено сообщений: {deleted}")
-        time.sleep(3)
-        try:
-            bot.delete_message(message.chat.id, msg.message_id)
-        except Exception:
-            pass
-        
-    except ValueError:
-        bot.reply_to(message, "⚠️ Укажите число")
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка: {e}")
-
-@bot.message_handler(commands=["pin"])
-@group_only
-@admin_only
-def cmd_pin(message):
-    if not message.reply_to_message:
-        bot.reply_to(message, "📝 Ответьте на сообщение для закрепления")
-        return
-    
-    try:
-        bot.pin_chat_message(message.chat.id, message.reply_to_message.message_id)
-        bot.reply_to(message, "📌 Сообщение закреплено")
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка: {e}")
-
-@bot.message_handler(commands=["unpin"])
-@group_only
-@admin_only
-def cmd_unpin(message):
-    try:
-        bot.unpin_chat_message(message.chat.id)
-        bot.reply_to(message, "📌 Сообщение откреплено")
-    except Exception as e:
-        bot.reply_to(message, f"❌ Ошибка: {e}")
-
-# ================================
-# Настройки
-# ================================
-@bot.message_handler(commands=["settings"])
-@group_only
-@admin_only
-def cmd_settings(message):
-    chat_settings = settings.get_all(message.chat.id)
-    
-    text = (
-        f"⚙️ *Настройки чата*\n\n"
-        f"├ Макс. предупреждений: {chat_settings['max_warns']}\n"
-        f"├ Анти-спам: {'✅' if chat_settings['antispam_enabled'] else '❌'}\n"
-        f"├ Анти-ссылки: {'✅' if chat_settings['antilink_enabled'] else '❌'}\n"
-        f"├ Приветствия: {'✅' if chat_settings['welcome_enabled'] else '❌'}\n"
-        f"└ Прощания: {'✅' if chat_settings['goodbye_enabled'] else '❌'}"
-    )
-    
-    bot.send_message(
-        message.chat.id, 
-        text,
-        parse_mode="Markdown",
-        reply_markup=get_settings_keyboard(message.chat.id)
-    )
-
-@bot.message_handler(commands=["setmaxwarns"])
-@group_only
-@admin_only
-def cmd_setmaxwarns(message):
-    parts = message.text.split() if message.text else []
-    if len(parts) < 2:
-        bot.reply_to(message, "📝 Использование: `/setmaxwarns <число>`", parse_mode="Markdown")
-        return
-    
-    try:
-        value = int(parts[1])
-        if value < 1 or value > 10:
-            bot.reply_to(message, "⚠️ Укажите число от 1 до 10")
-            return
-        
-        settings.set(message.chat.id, "max_warns", value)
-        bot.reply_to(message, f"✅ Максимум предупреждений: {value}")
-        
-    except ValueError:
-        bot.reply_to(message, "⚠️ Укажите число")
-
-@bot.message_handler(commands=["setwelcome"])
-@group_only
-@admin_only
-def cmd_setwelcome(message):
-    parts = message.text.split(maxsplit=1) if message.text else []
-    if len(parts) < 2:
-        bot.reply_to(
-            message,
-            "📝 Использование: `/setwelcome <текст>`\n\n"
-            "Переменные:\n"
-            "• `{user}` — имя пользователя\n"
-            "• `{chat}` — название чата",
-            parse_mode="Markdown"
-        )
-        return
-    
-    settings.set(message.chat.id, "welcome_message", parts[1])
-    settings.set(message.chat.id, "welcome_enabled", True)
-    bot.reply_to(message, "✅ Приветствие обновлено и включено")
-
-# ================================
-# Обработка новых/ушедших участников
-# ================================
-@bot.message_handler(content_types=["new_chat_members"])
-def handle_new_member(message):
-    if not settings.get(message.chat.id, "welcome_enabled"):
-        return
-    
-    for user in message.new_chat_members:
-        if user.is_bot:
-            continue
-        
-        welcome_text = settings.get(message.chat.id, "welcome_message")
-        welcome_text = welcome_text.replace("{user}", get_user_display(user))
-        welcome_text = welcome_text.replace("{chat}", message.chat.title or "чат")
-        
-        bot.send_message(message.chat.id, welcome_text)
-
-@bot.message_handler(content_types=["left_chat_member"])
-def handle_left_member(message):
-    if not settings.get(message.chat.id, "goodbye_enabled"):
-        return
-    
-    user = message.left_chat_member
-    if user.is_bot:
-        return
-    
-    goodbye_text = settings.get(message.chat.id, "goodbye_message")
-    goodbye_text = goodbye_text.replace("{user}", get_user_display(user))
-    goodbye_text = goodbye_text.replace("{chat}", message.chat.title or "чат")
-    
-    bot.send_message(message.chat.id, goodbye_text)
-
-# ================================
-# Обработка сообщений
-# ================================
-@bot.message_handler(func=lambda m: True, content_types=["text"])
-def handle_message(message):
-    # Личные сообщения
-    if is_private(message):
-        is_bot_admin_user = bot_admins.is_admin(message.from_user.id)
-        
-        text = (
-            "👋 Привет! Я бот модерации для групп.\n\n"
-            "📌 Добавьте меня в группу и дайте права администратора.\n\n"
-            "/help — список команд\n"
-            "/myid — узнать свой ID"
-        )
-        
-        if is_bot_admin_user:
-            text += "\n\n👑 Вы — администратор бота"
-        
-        bot.send_message(message.chat.id, text)
-        return
-    
-    if not is_group(message) or not message.text:
-        return
-    
-    chat_id = message.chat.id
-    user_id = message.from_user.id
-    text = message.text.strip()
-    
-    # Тест работоспособности
-    if text.lower() == "бот":
-        bot.send_message(chat_id, "✅ Работаю!")
-        return
-    
-    # Пропуск админов чата и бота
-    if is_chat_admin(chat_id, user_id) or bot_admins.is_admin(user_id):
-        return
-    
-    # Анти-спам
-    if settings.get(chat_id, "antispam_enabled"):
-        max_msg = settings.get(chat_id, "antispam_messages")
-        seconds = settings.get(chat_id, "antispam_seconds")
-        
-        if antispam.check(chat_id, user_id, max_msg, seconds):
-            try:
-                bot.delete_message(chat_id, message.message_id)
-                
-                # ИСПРАВЛЕНИЕ: Используем функцию для совместимости
-                bot.restrict_chat_member(
-                    chat_id, user_id,
-                    until_date=datetime.now() + timedelta(minutes=5),
-                    permissions=get_mute_permissions()
-                )
-                
-                bot.send_message(
-                    chat_id,
-                    f"🔇 {get_user_display(message.from_user)} замучен на 5 мин (спам)"
-                )
-                stats.increment(chat_id, "spam_blocked")
-                stats.increment(chat_id, "mutes")
-                return
-                
-            except Exception as e:
-                print(f"❌ Anti-spam error: {e}")
-    
-    # Анти-ссылки
-    if settings.get(chat_id, "antilink_enabled") and has_links(text):
-        try:
-            bot.delete_message(chat_id, message.message_id)
-            bot.send_message(
-                chat_id,
-                f"🔗 Сообщение {get_user_display(message.from_user)} удалено (ссылки запрещены)"
-            )
-            stats.increment(chat_id, "links_blocked")
-            stats.increment(chat_id, "deleted_messages")
-            return
-        except Exception as e:
-            print(f"❌ Anti-link error: {e}")
-    
-    # Триггер-слова
-    found_words = triggers.find_in_text(text)
-    
-    if not found_words:
-        return
-    
-    try:
-        bot.delete_message(chat_id, message.message_id)
-        
-        censored = ", ".join(censor_word(w) for w in found_words)
-        user_display = get_user_display(message.from_user)
-        
-        bot.send_message(
-            chat_id,
-            f"🚫 Сообщение от {user_display} удалено\n"
-            f"📛 Причина: {censored}"
-        )
-        
-        stats.increment(chat_id, "deleted_messages")
-        
-        log_entry = (
-            f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
-            f"Chat: {message.chat.title} ({chat_id}) | "
-            f"User: {user_display} ({user_id}) | "
-            f"Words: {found_words}"
-        )
-        write_log(log_entry)
-        
-    except telebot.apihelper.ApiTelegramException as e:
-        if "not enough rights" in str(e).lower():
-            bot.send_message(chat_id, "⚠️ Нет прав на удаление сообщений!")
-    except Exception as e:
-        print(f"❌ Error: {e}")
-
-# ================================
-# Запуск
-# ================================
-def main():
-    print("=" * 50)
-    print("🤖 Бот модерации запущен!")
-    print(f"📁 Триггер-слова: {triggers.count()}")
-    print(f"👑 Админов бота: {bot_admins.count()}")
-    print(f"📁 Логи: {LOG_PATH}")
-    print("=" * 50)
-    
-    if bot_admins.count() == 0:
-        print("\n⚠️  ВНИМАНИЕ: Нет администраторов бота!")
-        print("   Используйте команду /addowner <секретный_код>")
-        print("   для добавления первого администратора.\n")
-    
-    while True:
-        try:
-            bot.infinity_polling(
-                timeout=60,
-                long_polling_timeout=60,
-                allowed_updates=["message", "callback_query"]
-            )
-        except Exception as e:
-            print(f"❌ Ошибка: {e}")
-            print("🔄 Перезапуск через 5 секунд...")
-            time.sleep(5)
-
-if __name__ == "__main__":
-    main()
+import telebot
+from telebot import types
+import os
+import sys
+import json
+import sqlite3
+import gzip
+import shutil
+import glob
+import base64
+import re
+import unicodedata
+import time
+from datetime import datetime, timedelta
+from collections import defaultdict, deque, OrderedDict
+from array import array
+import threading
+import queue
+import heapq
+import itertools
+import atexit
+import hmac
+import secrets
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future
+from functools import wraps
+from typing import Optional, List, Set, Dict, Any, Iterable, Tuple
+
+ANONYMOUS_ADMIN_ID = 
+
+# ================================
+# Конфигурация
+# ================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TOKEN_PATH = os.path.join(BASE_DIR, "token.txt")
+TRIGGER_PATH = os.path.join(BASE_DIR, "trigger.txt")
+CHAT_TRIGGERS_PATH = os.path.join(BASE_DIR, "chat_triggers.json")
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+EVENT_LOG_PATH = os.path.join(LOG_DIR, "events.jsonl")
+EVENT_INDEX_PATH = os.path.join(LOG_DIR, "events.db")
+WARNS_PATH = os.path.join(BASE_DIR, "warns.json")
+STATS_PATH = os.path.join(BASE_DIR, "stats.json")
+STATS_SERIES_PATH = os.path.join(BASE_DIR, "stats_series.json")
+SETTINGS_PATH = os.path.join(BASE_DIR, "settings.json")
+ADMINS_PATH = os.path.join(BASE_DIR, "admins.json")
+DB_PATH = os.path.join(BASE_DIR, "bot.db")
+
+# Бэкенд хранилища предупреждений, статистики и настроек: "json" или "sqlite".
+# При переходе на "sqlite" данные из JSON-файлов переносятся один раз при запуске.
+STORAGE_BACKEND = "json"
+
+# Настройки по умолчанию
+DEFAULT_SETTINGS = {
+    "max_warns": 3,
+    "warn_expire_days": 30,
+    "antispam_enabled": True,
+    "antispam_messages": 5,
+    "antispam_seconds": 10,
+    "antilink_enabled": False,
+    "allowed_domains": [],
+    "welcome_enabled": False,
+    "welcome_message": "👋 Добро пожаловать, {user}!",
+    "goodbye_enabled": False,
+    "goodbye_message": "👋 {user} покинул(а) чат",
+    "raid_protection": True,
+    "trigger_mode": "substring",  # "substring" — часть слова, "words" — слово целиком с окончаниями
+}
+
+# Кэш статусов участников чатов
+MEMBER_CACHE_TTL = 300  # секунд
+MEMBER_CACHE_SIZE = 10000  # записей (пользователей и чатов)
+
+# Отложенная запись хранилищ: сброс раз в N секунд или после N изменений
+STORAGE_FLUSH_INTERVAL = 5
+STORAGE_FLUSH_EVERY = 100
+
+# Статистика по времени: сколько минутных, часовых и дневных корзин хранить
+# и как часто сбрасывать счётчики в хранилище
+STATS_MINUTE_SLOTS = 120
+STATS_HOUR_SLOTS = 7 * 24
+STATS_DAY_SLOTS = 90
+STATS_FLUSH_INTERVAL = 30
+
+# Истёкшие предупреждения (warn_expire_days) отбрасываются при чтении,
+# а из хранилища удаляются фоновой чисткой пачками по N ключей
+WARNS_COMPACT_INTERVAL = 3600
+WARNS_COMPACT_BATCH = 500
+
+# Обработка обновлений: число потоков (шардов по chat_id) и глубина очереди шарда
+DISPATCHER_WORKERS = 8
+DISPATCHER_QUEUE_SIZE = 100
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+# Webhook: если WEBHOOK_URL пустой — используется long polling.
+# WEBHOOK_URL — внешний адрес (https://example.com), сервер слушает локально
+# (например, за nginx). Пустой WEBHOOK_SECRET генерируется при запуске.
+WEBHOOK_URL = ""
+WEBHOOK_PATH = "/telegram"
+WEBHOOK_HOST = "127.0.0.1"
+WEBHOOK_PORT = 8443
+WEBHOOK_SECRET = ""
+WEBHOOK_QUEUE_SIZE = 1000
+WEBHOOK_MAX_BODY = 1024 * 1024
+
+# /clear: максимум сообщений, размер пачки deleteMessages, время жизни отчёта
+CLEAR_MAX_COUNT = 1000
+CLEAR_CHUNK_SIZE = 100
+CLEAR_NOTICE_SECONDS = 3
+DELETE_FALLBACK_WORKERS = 8
+
+# Лимиты исходящих запросов к Bot API: глобально ~30/с, сообщения в группу ~20/мин
+API_GLOBAL_RATE = 30
+API_CHAT_RATE = 20 / 60
+API_CHAT_BURST = 20
+API_WORKERS = 8
+API_MAX_RETRIES = 3
+# Адрес Bot API, например локальный фейковый сервер для тестов:
+# "http://127.0.0.1:8081/bot{0}/{1}". Пустой — api.telegram.org
+API_URL = ""
+
+# Сводные уведомления: первое нарушение сообщается сразу, остальные
+# за окно (секунд) собираются в одно сообщение
+NOTICE_WINDOW = 10
+
+# Детектор рейдов: пороги входов и сообщений за окно (секунд), длительность защиты
+RAID_JOIN_LIMIT = 10
+RAID_JOIN_WINDOW = 60
+RAID_MESSAGE_LIMIT = 40
+RAID_MESSAGE_WINDOW = 10
+RAID_LOCKDOWN_MINUTES = 10
+
+# Журнал событий: ротация по размеру или возрасту файла, сжатые сегменты
+EVENT_LOG_MAX_BYTES = 50 * 1024 * 1024
+EVENT_LOG_ROTATE_SECONDS = 86400
+EVENT_LOG_QUEUE_SIZE = 10000
+EVENT_LOG_BATCH = 500
+HISTORY_LIMIT = 20
+
+# Анти-спам: через сколько секунд без сообщений пользователь забывается
+ANTISPAM_IDLE_TTL = 600
+ANTISPAM_SWEEP_INTERVAL = 60
+
+# Число блокировок в наборах, разбитых по chat_id / user_id
+LOCK_STRIPES = 16
+
+# Нормализация перед поиском триггеров: похожие латинские буквы и
+# leetspeak сводятся к кириллице. Применяется и к словам, и к сообщениям.
+CONFUSABLES = {
+    "a": "а", "b": "в", "c": "с", "e": "е", "h": "н", "i": "и", "k": "к", "m": "м",
+    "n": "п", "o": "о", "p": "р", "r": "г", "t": "т", "u": "и", "x": "х", "y": "у",
+    "і": "и", "ё": "е",
+    "α": "а", "β": "в", "ε": "е", "κ": "к", "ο": "о", "ρ": "р", "τ": "т", "υ": "у", "χ": "х",
+}
+LEETSPEAK = {
+    "0": "о", "3": "з", "4": "ч", "6": "б", "7": "т", "8": "в",
+    "1": "и", "5": "s", "@": "а", "$": "s", "€": "е",
+}
+# Сколько токенов сообщений хранить в кэше нормализации и совпадений
+TRIGGER_TOKEN_CACHE = 50000
+
+# ================================
+# Загрузка токена
+# ================================
+def load_token() -> str:
+    try:
+        with open(TOKEN_PATH, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"❌ Файл токена не найден: {TOKEN_PATH}")
+
+TOKEN = load_token()
+if API_URL:
+    telebot.apihelper.API_URL = API_URL
+# Обработчики вызываются синхронно в потоках ShardedDispatcher
+bot = telebot.TeleBot(TOKEN, parse_mode=None, threaded=False)
+
+# ================================
+# Блокировки по ключу
+# ================================
+class StripedLock:
+    """Набор блокировок, выбираемых по ключу (chat_id, user_id).
+
+    Разные ключи почти всегда попадают в разные блокировки и не ждут
+    друг друга. all() захватывает все блокировки по порядку — для
+    операций над всеми данными сразу.
+    """
+    
+    def __init__(self, stripes: int = LOCK_STRIPES, factory=threading.RLock):
+        self._locks = [factory() for _ in range(max(1, stripes))]
+    
+    def __len__(self) -> int:
+        return len(self._locks)
+    
+    def for_key(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+    
+    @contextmanager
+    def all(self):
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+# ================================
+# JSON Storage Manager
+# ================================
+class JsonStorage:
+    """Потокобезопасное хранилище JSON.
+
+    При flush_interval > 0 работает в режиме отложенной записи: изменения
+    только помечают хранилище «грязным», а фоновый поток сохраняет
+    накопленный снимок раз в flush_interval секунд или после flush_every
+    изменений. Последний сброс выполняется при завершении процесса.
+    В этом режиме изменения разных чатов идут под разными блокировками
+    (ключ блокировки — chat_id, первая часть ключа "chat:user").
+    """
+    
+    def __init__(self, filepath: str, default: Any = None,
+                 flush_interval: float = 0, flush_every: int = STORAGE_FLUSH_EVERY):
+        self.filepath = filepath
+        self.default = default if default is not None else {}
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        # При синхронной записи каждое изменение сохраняет весь файл,
+        # поэтому блокировка одна
+        self._locks = StripedLock(LOCK_STRIPES if flush_interval > 0 else 1)
+        self._flush_lock = threading.Lock()
+        self._data = self._load()
+        self._dirty = 0
+        self._closed = False
+        self._wakeup = threading.Event()
+        
+        if flush_interval > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_loop,
+                name=f"flush-{os.path.basename(filepath)}",
+                daemon=True
+            )
+            self._flusher.start()
+            atexit.register(self.close)
+    
+    def _load(self) -> Any:
+        if not os.path.exists(self.filepath):
+            return self.default.copy() if isinstance(self.default, dict) else self.default
+        try:
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки {self.filepath}: {e}")
+            return self.default.copy() if isinstance(self.default, dict) else self.default
+    
+    def _write(self, payload: str) -> None:
+        """Атомарная запись: временный файл + переименование"""
+        tmp_path = self.filepath + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.filepath)
+        except Exception as e:
+            print(f"❌ Ошибка сохранения {self.filepath}: {e}")
+    
+    def _save(self) -> None:
+        self._write(json.dumps(self._data, ensure_ascii=False, indent=2))
+    
+    def _lock(self, key):
+        return self._locks.for_key(str(key).split(":", 1)[0])
+    
+    def _changed(self) -> None:
+        """Вызывается под локом после каждого изменения"""
+        if self.flush_interval <= 0:
+            self._save()
+            return
+        self._dirty += 1
+        if self._dirty >= self.flush_every:
+            self._wakeup.set()
+    
+    def flush(self) -> None:
+        """Сохраняет накопленные изменения, если они есть"""
+        with self._flush_lock:
+            with self._locks.all():
+                if not self._dirty:
+                    return
+                payload = json.dumps(self._data, ensure_ascii=False, indent=2)
+                self._dirty = 0
+            self._write(payload)
+    
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def close(self) -> None:
+        """Останавливает фоновый поток и выполняет финальный сброс"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.flush_interval > 0:
+            self._wakeup.set()
+            self._flusher.join(timeout=10)
+        self.flush()
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock(key):
+            return self._data.get(str(key), default)
+    
+    def set(self, key: str, value: Any) -> None:
+        with self._lock(key):
+            self._data[str(key)] = value
+            self._changed()
+    
+    def delete(self, key: str) -> bool:
+        with self._lock(key):
+            if str(key) in self._data:
+                del self._data[str(key)]
+                self._changed()
+                return True
+            return False
+    
+    def get_nested(self, *keys, default: Any = None) -> Any:
+        if not keys:
+            return default
+        with self._lock(keys[0]):
+            data = self._data
+            for key in keys:
+                if isinstance(data, dict) and str(key) in data:
+                    data = data[str(key)]
+                else:
+                    return default
+            return data
+    
+    def set_nested(self, *keys, value: Any) -> None:
+        if len(keys) < 1:
+            return
+        with self._lock(keys[0]):
+            data = self._data
+            for key in keys[:-1]:
+                key = str(key)
+                if key not in data:
+                    data[key] = {}
+                data = data[key]
+            data[str(keys[-1])] = value
+            self._changed()
+    
+    def all(self) -> dict:
+        with self._locks.all():
+            return self._data.copy()
+    
+    def keys(self) -> List[str]:
+        with self._locks.all():
+            return list(self._data)
+    
+    def update(self, changes: Dict[str, Any]) -> None:
+        """Несколько изменений одной записью; значение None удаляет ключ"""
+        if not changes:
+            return
+        with self._locks.all():
+            for key, value in changes.items():
+                if value is None:
+                    self._data.pop(str(key), None)
+                else:
+                    self._data[str(key)] = value
+            self._changed()
+
+# ================================
+# SQLite Storage
+# ================================
+class SqliteStorage:
+    """Хранилище в SQLite (WAL) с тем же интерфейсом, что и JsonStorage.
+
+    Каждый ключ верхнего уровня хранится построчно: значение-словарь
+    раскладывается на строки (key, field), прочие значения лежат в одной
+    строке с field = ''. Поэтому set_nested для счётчика статистики
+    обновляет одну строку, а не переписывает всё хранилище.
+    """
+    
+    def __init__(self, filepath: str, table: str):
+        if not table.isidentifier():
+            raise ValueError(f"Недопустимое имя таблицы: {table}")
+        self.filepath = filepath
+        self.table = table
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(filepath, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            f"key TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, "
+            f"PRIMARY KEY (key, field)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        atexit.register(self.close)
+    
+    @staticmethod
+    def _rows(key: str, value: Any) -> List[Tuple[str, str, str]]:
+        if isinstance(value, dict) and value:
+            return [(key, str(field), json.dumps(v, ensure_ascii=False)) for field, v in value.items()]
+        return [(key, "", json.dumps(value, ensure_ascii=False))]
+    
+    def _get(self, key: str) -> Any:
+        rows = self._conn.execute(
+            f"SELECT field, value FROM {self.table} WHERE key = ?", (key,)
+        ).fetchall()
+        if not rows:
+            return None
+        if len(rows) == 1 and rows[0][0] == "":
+            return json.loads(rows[0][1])
+        return {field: json.loads(value) for field, value in rows}
+    
+    def _replace(self, key: str, value: Any) -> None:
+        self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        self._conn.executemany(
+            f"INSERT INTO {self.table} (key, field, value) VALUES (?, ?, ?)",
+            self._rows(key, value)
+        )
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._get(str(key))
+            return default if value is None else value
+    
+    def set(self, key: str, value: Any) -> None:
+        with self._lock, self._conn:
+            self._replace(str(key), value)
+    
+    def delete(self, key: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (str(key),))
+            return cursor.rowcount > 0
+    
+    def get_nested(self, *keys, default: Any = None) -> Any:
+        if len(keys) < 2:
+            return self.get(keys[0], default) if keys else default
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value FROM {self.table} WHERE key = ? AND field = ?",
+                (str(keys[0]), str(keys[1]))
+            ).fetchone()
+        if row is None:
+            return default
+        data = json.loads(row[0])
+        for key in keys[2:]:
+            if isinstance(data, dict) and str(key) in data:
+                data = data[str(key)]
+            else:
+                return default
+        return data
+    
+    def set_nested(self, *keys, value: Any) -> None:
+        if len(keys) < 1:
+            return
+        if len(keys) == 1:
+            self.set(keys[0], value)
+            return
+        key, field = str(keys[0]), str(keys[1])
+        with self._lock, self._conn:
+            # Значение ключа верхнего уровня было не словарём — превращаем в словарь
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ? AND field = ''", (key,))
+            if len(keys) > 2:
+                row = self._conn.execute(
+                    f"SELECT value FROM {self.table} WHERE key = ? AND field = ?", (key, field)
+                ).fetchone()
+                root = json.loads(row[0]) if row else {}
+                data = root
+                for k in keys[2:-1]:
+                    data = data.setdefault(str(k), {})
+                data[str(keys[-1])] = value
+                value = root
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, field, value) VALUES (?, ?, ?)",
+                (key, field, json.dumps(value, ensure_ascii=False))
+            )
+    
+    def all(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, field, value FROM {self.table} ORDER BY key"
+            ).fetchall()
+        result: Dict[str, Any] = {}
+        for key, field, value in rows:
+            if field == "":
+                result[key] = json.loads(value)
+            else:
+                result.setdefault(key, {})[field] = json.loads(value)
+        return result
+    
+    def keys(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT DISTINCT key FROM {self.table}").fetchall()
+        return [row[0] for row in rows]
+    
+    def update(self, changes: Dict[str, Any]) -> None:
+        """Несколько изменений одной транзакцией; значение None удаляет ключ"""
+        with self._lock, self._conn:
+            for key, value in changes.items():
+                if value is None:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (str(key),))
+                else:
+                    self._replace(str(key), value)
+    
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute(f"SELECT 1 FROM {self.table} LIMIT 1").fetchone() is None
+    
+    def import_data(self, data: dict) -> int:
+        """Массовая загрузка словаря одной транзакцией"""
+        with self._lock, self._conn:
+            for key, value in data.items():
+                self._replace(str(key), value)
+        return len(data)
+    
+    def flush(self) -> None:
+        pass
+    
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+def migrate_json_to_sqlite(json_path: str, storage: SqliteStorage) -> int:
+    """Однократный перенос JSON-файла в SQLite.
+
+    Выполняется только для пустой таблицы; после переноса файл
+    переименовывается в *.migrated, чтобы не импортировать его повторно.
+    """
+    if not os.path.exists(json_path) or not storage.is_empty():
+        return 0
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"⚠️ Ошибка чтения {json_path} для миграции: {e}")
+        return 0
+    if not isinstance(data, dict):
+        return 0
+    count = storage.import_data(data)
+    os.replace(json_path, json_path + ".migrated")
+    print(f"📦 Перенесено в SQLite: {json_path} ({count} записей)")
+    return count
+
+def open_storage(json_path: str, table: str, flush_interval: float = 0):
+    """Создаёт хранилище выбранного бэкенда (STORAGE_BACKEND)"""
+    if STORAGE_BACKEND == "sqlite":
+        storage = SqliteStorage(DB_PATH, table)
+        migrate_json_to_sqlite(json_path, storage)
+        return storage
+    return JsonStorage(json_path, {}, flush_interval=flush_interval)
+
+# ================================
+# Менеджер администраторов бота
+# ================================
+class BotAdminsManager:
+    """Управление администраторами бота (глобальные права)"""
+    
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._lock = threading.RLock()
+        self._admins: Set[int] = self._load()
+    
+    def _load(self) -> Set[int]:
+        if not os.path.exists(self.filepath):
+            return set()
+        try:
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                return set(data.get("admins", []))
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки админов бота: {e}")
+            return set()
+    
+    def _save(self) -> None:
+        try:
+            with open(self.filepath, "w", encoding="utf-8") as f:
+                json.dump({"admins": list(self._admins)}, f, indent=2)
+        except Exception as e:
+            print(f"❌ Ошибка сохранения админов бота: {e}")
+    
+    def add(self, user_id: int) -> bool:
+        with self._lock:
+            if user_id in self._admins:
+                return False
+            self._admins.add(user_id)
+            self._save()
+            return True
+    
+    def remove(self, user_id: int) -> bool:
+        with self._lock:
+            if user_id not in self._admins:
+                return False
+            self._admins.discard(user_id)
+            self._save()
+            return True
+    
+    def is_admin(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._admins
+    
+    def get_all(self) -> List[int]:
+        with self._lock:
+            return list(self._admins)
+    
+    def count(self) -> int:
+        with self._lock:
+            return len(self._admins)
+
+# ================================
+# Автомат Ахо-Корасик
+# ================================
+class AhoCorasick:
+    """Поиск всех слов из набора за один проход по тексту.
+
+    Время поиска линейно по длине текста и не зависит от размера списка.
+    Автомат неизменяем: при изменении набора слов строится новый.
+    """
+
+    __slots__ = ("_goto", "_fail", "_out")
+
+    def __init__(self, words: Iterable[str]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Tuple[str, ...]] = [()]
+
+        # Бор из всех слов
+        for word in words:
+            if not word:
+                continue
+            state = 0
+            for ch in word:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = (word,)
+
+        # Суффиксные ссылки (BFS), выходы наследуются по ссылкам
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                link = fail[state]
+                while link and ch not in goto[link]:
+                    link = fail[link]
+                link = goto[link].get(ch, 0)
+                fail[nxt] = link
+                if out[link]:
+                    out[nxt] = out[nxt] + out[link] if out[nxt] else out[link]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def find(self, text: str) -> List[str]:
+        """Слова, встречающиеся в тексте, в порядке первого вхождения"""
+        goto, fail, out = self._goto, self._fail, self._out
+        if len(goto) == 1:
+            return []
+
+        found: Dict[str, None] = {}
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for word in out[state]:
+                    found[word] = None
+        return list(found)
+
+# ================================
+# Нормализация текста
+# ================================
+class TextNormalizer:
+    """Приводит текст к форме, устойчивой к обфускации.
+
+    NFKC и casefold, затем одна таблица str.translate (собирается при
+    запуске): невидимые символы и диакритика удаляются, похожие латинские
+    буквы и leetspeak сводятся к кириллице, пунктуация и символы становятся
+    пробелами. В конце буквы, разделённые пробелами по одной, склеиваются:
+    «с.п.а.м», «с п а м» → «спам».
+    """
+    
+    _SINGLES = re.compile(r"(?<!\w)(\w) (?=\w(?!\w))")
+    
+    def __init__(self):
+        table: Dict[int, Optional[str]] = {}
+        planes = itertools.chain(range(0x20000), range(0xE0000, 0xE1000))
+        for code in planes:
+            category = unicodedata.category(chr(code))
+            if category in ("Mn", "Me", "Cf"):
+                table[code] = None
+            elif category[0] in "PSZ" or category == "Cc":
+                table[code] = " "
+        for source, target in itertools.chain(CONFUSABLES.items(), LEETSPEAK.items()):
+            table[ord(source)] = target
+        self._table = table
+    
+    def normalize(self, text: str) -> str:
+        text = unicodedata.normalize("NFKC", text).casefold().translate(self._table)
+        if " " not in text:
+            return text
+        return self._SINGLES.sub(r"\1", " ".join(text.split()))
+
+normalizer = TextNormalizer()
+
+def _stem_endings(endings: str) -> Tuple[str, ...]:
+    """Окончания через пробел -> кортеж от длинных к коротким"""
+    return tuple(sorted(endings.split(), key=len, reverse=True))
+
+class RussianStemmer:
+    """Стеммер Snowball для русского языка: отсекает окончания,
+    чтобы «баны», «бана», «баном» сводились к основе «бан».
+
+    Работает с нормализованным текстом (ё уже заменена на е).
+    """
+    
+    VOWELS = frozenset("аеиоуыэюя")
+    
+    # Первая группа окончаний допустима только после «а» или «я»
+    PERFECTIVE_GERUND = (_stem_endings("в вши вшись"), _stem_endings("ив ивши ившись ыв ывши ывшись"))
+    ADJECTIVE = _stem_endings(
+        "ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их ых ую юю ая яя ою ею"
+    )
+    PARTICIPLE = (_stem_endings("ем нн вш ющ щ"), _stem_endings("ивш ывш ующ"))
+    REFLEXIVE = ("ся", "сь")
+    VERB = (
+        _stem_endings("ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно"),
+        _stem_endings(
+            "ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено ят ует уют ит ыт ены "
+            "ить ыть ишь ую ю"
+        ),
+    )
+    NOUN = _stem_endings(
+        "а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем ам ом о у ах иях ях ы ь ию ью ю ия ья я"
+    )
+    SUPERLATIVE = ("ейше", "ейш")
+    DERIVATIONAL = ("ость", "ост")
+    
+    def _region(self, word: str, start: int) -> int:
+        """Позиция после первой согласной, идущей за гласной (R1/R2)"""
+        for i in range(start + 1, len(word)):
+            if word[i] not in self.VOWELS and word[i - 1] in self.VOWELS:
+                return i + 1
+        return len(word)
+    
+    @staticmethod
+    def _strip(word: str, start: int, endings: Tuple[str, ...], after_a: bool = False) -> Optional[str]:
+        for ending in endings:
+            cut = len(word) - len(ending)
+            if cut >= start and word.endswith(ending):
+                if after_a and not (cut - 1 >= start and word[cut - 1] in "ая"):
+                    continue
+                return word[:cut]
+        return None
+    
+    def _strip_grouped(self, word: str, rv: int, groups) -> Optional[str]:
+        return self._strip(word, rv, groups[0], after_a=True) or self._strip(word, rv, groups[1])
+    
+    def stem(self, word: str) -> str:
+        rv = next((i + 1 for i, ch in enumerate(word) if ch in self.VOWELS), len(word))
+        if rv >= len(word):
+            return word
+        r2 = self._region(word, self._region(word, 0))
+        
+        # Шаг 1: деепричастие, иначе возвратность + прилагательное/глагол/существительное
+        stripped = self._strip_grouped(word, rv, self.PERFECTIVE_GERUND)
+        if stripped is None:
+            word = self._strip(word, rv, self.REFLEXIVE) or word
+            stripped = self._strip(word, rv, self.ADJECTIVE)
+            if stripped is not None:
+                stripped = self._strip_grouped(stripped, rv, self.PARTICIPLE) or stripped
+            else:
+                stripped = self._strip_grouped(word, rv, self.VERB) or self._strip(word, rv, self.NOUN)
+        word = stripped if stripped is not None else word
+        
+        # Шаг 2–4: «и», словообразовательный суффикс, «нн», превосходная степень, «ь»
+        if word.endswith("и") and len(word) - 1 >= rv:
+            word = word[:-1]
+        word = self._strip(word, r2, self.DERIVATIONAL) or word
+        if word.endswith("нн"):
+            return word[:-1]
+        superlative = self._strip(word, rv, self.SUPERLATIVE)
+        if superlative is not None:
+            return superlative[:-1] if superlative.endswith("нн") else superlative
+        if word.endswith("ь") and len(word) - 1 >= rv:
+            return word[:-1]
+        return word
+
+stemmer = RussianStemmer()
+
+# ================================
+# Менеджер триггер-слов
+# ================================
+TRIGGER_MODES = ("substring", "words")
+
+class TriggerIndex:
+    """Снимок индекса триггеров: автомат и основы слов с тегами владельцев
+    плюс кэш токенов. Заменяется целиком при любом изменении списков."""
+    
+    __slots__ = ("matcher", "stems", "phrase_re", "word_phrase_re", "origins", "tags",
+                 "norms", "hits", "word_hits")
+    
+    def __init__(self, origins: Dict[str, Tuple[str, ...]], tags: Dict[str, Optional[frozenset]]):
+        self.origins = origins
+        self.tags = tags
+        self.matcher = AhoCorasick(origins)
+        
+        # Основа слова -> нормализованные формы (режим words)
+        self.stems: Dict[str, Tuple[str, ...]] = {}
+        for form in origins:
+            if " " not in form:
+                stem = stemmer.stem(form)
+                self.stems[stem] = self.stems.get(stem, ()) + (form,)
+        
+        # Фразы могут начинаться в одном токене и заканчиваться в другом
+        phrases = sorted((form for form in origins if " " in form), key=len, reverse=True)
+        alternatives = "|".join(map(re.escape, phrases))
+        self.phrase_re = re.compile(alternatives) if phrases else None
+        self.word_phrase_re = re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)") if phrases else None
+        self.reset_cache()
+    
+    def reset_cache(self) -> None:
+        # токен -> нормальная форма; токен -> найденные формы (только с совпадениями)
+        self.norms: Dict[str, str] = {}
+        self.hits: Dict[str, Tuple[str, ...]] = {}
+        self.word_hits: Dict[str, Tuple[str, ...]] = {}
+    
+    def find_stems(self, norm: str) -> Tuple[str, ...]:
+        stems = self.stems
+        found: Tuple[str, ...] = ()
+        for piece in norm.split():
+            forms = stems.get(stemmer.stem(piece))
+            if forms:
+                found += forms
+        return found
+
+class TriggerManager:
+    """Потокобезопасный менеджер триггер-слов: общий список из trigger.txt
+    и собственные списки чатов поверх него.
+
+    Все слова в нормализованной форме (TextNormalizer) компилируются в
+    один автомат; каждому слову сопоставлен тег владельцев — None для
+    общего списка или frozenset чатов. Одинаковые наборы чатов хранятся
+    одним объектом, поэтому сотни чатов с почти одинаковыми списками не
+    умножают память. Изменения идут под блокировкой и заканчиваются
+    заменой ссылки на новый неизменяемый индекс, поэтому find_in_text
+    работает без блокировки.
+    
+    Сообщение разбирается на токены по пробелам; нормализация и поиск
+    выполняются один раз на каждый новый токен, результат кэшируется
+    в индексе. Известные токены отсеиваются операциями над множествами,
+    без цикла на Python, поэтому повторяющиеся слова (а их в переписке
+    большинство) почти ничего не стоят.
+    
+    Режимы (настройка чата trigger_mode): "substring" — слово ищется
+    и внутри других слов, "words" — только целым словом с точностью до
+    окончания: основа токена ищется в хэш-таблице основ триггеров,
+    поэтому «бан» находит «баны» и «баном», но не «банан».
+    """
+    
+    # Три и больше однобуквенных токена подряд: «с п а м»
+    _LETTERS_HINT = re.compile(r" \S \S \S ")
+    _LETTERS = re.compile(r"(?<!\S)\S(?: +\S(?!\S)){2,}")
+    
+    def __init__(self, filepath: str, storage: Optional[JsonStorage] = None):
+        self.filepath = filepath
+        self.storage = storage
+        self._lock = threading.RLock()
+        self._words: Set[str] = self._load()
+        self._owners: Dict[str, frozenset] = {}
+        self._owner_sets: Dict[frozenset, frozenset] = {}
+        if storage is not None:
+            owners: Dict[str, Set[int]] = defaultdict(set)
+            for key, words in storage.all().items():
+                try:
+                    chat_id = int(key)
+                except ValueError:
+                    continue
+                for word in words:
+                    owners[sys.intern(word)].add(chat_id)
+            for word, chats in owners.items():
+                chats = frozenset(chats)
+                self._owners[word] = self._owner_sets.setdefault(chats, chats)
+        self._rebuild()
+    
+    def _load(self) -> Set[str]:
+        if not os.path.exists(self.filepath):
+            return set()
+        try:
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                return {sys.intern(line.strip().lower()) for line in f if line.strip()}
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки триггеров: {e}")
+            return set()
+    
+    def _save(self, chat_id: Optional[int] = None) -> None:
+        if chat_id is not None:
+            words = self._chat_words(chat_id)
+            if words:
+                self.storage.set(str(chat_id), words)
+            else:
+                self.storage.delete(str(chat_id))
+            return
+        try:
+            with open(self.filepath, "w", encoding="utf-8") as f:
+                f.write("\n".join(sorted(self._words)))
+        except Exception as e:
+            print(f"❌ Ошибка сохранения триггеров: {e}")
+    
+    def _own(self, word: str, chat_id: int, owned: bool) -> bool:
+        """Добавляет или снимает чат из владельцев слова (вызывать под локом)"""
+        owners = self._owners.get(word, frozenset())
+        if (chat_id in owners) == owned:
+            return False
+        owners = owners | {chat_id} if owned else owners - {chat_id}
+        if owners:
+            self._owners[word] = self._owner_sets.setdefault(owners, owners)
+        else:
+            del self._owners[word]
+        return True
+    
+    def _chat_words(self, chat_id: int) -> List[str]:
+        return sorted(word for word, owners in self._owners.items() if chat_id in owners)
+    
+    def _rebuild(self) -> None:
+        """Пересобирает индекс после изменения списков (вызывать под локом)"""
+        tags: Dict[str, Optional[frozenset]] = dict(self._owners)
+        tags.update(dict.fromkeys(self._words))
+        # Наборы владельцев, которые больше никому не нужны
+        self._owner_sets = {owners: owners for owners in self._owners.values()}
+        
+        # Нормализованная форма -> исходные слова
+        origins: Dict[str, Tuple[str, ...]] = {}
+        for word in tags:
+            form = normalizer.normalize(word)
+            if form:
+                origins[form] = origins.get(form, ()) + (word,)
+        # Присваивание атрибута атомарно: читатели видят старый или новый индекс
+        self._index = TriggerIndex(origins, tags)
+    
+    def _check_scope(self, chat_id: Optional[int]) -> None:
+        if chat_id is not None and self.storage is None:
+            raise ValueError("Списки чатов не подключены")
+    
+    def add(self, word: str, chat_id: Optional[int] = None) -> bool:
+        return self.add_many([word], chat_id) == 1
+    
+    def add_many(self, words: List[str], chat_id: Optional[int] = None) -> int:
+        self._check_scope(chat_id)
+        added = 0
+        with self._lock:
+            for word in words:
+                word = sys.intern(word.lower().strip())
+                if not word:
+                    continue
+                if chat_id is None:
+                    if word not in self._words:
+                        self._words.add(word)
+                        added += 1
+                elif self._own(word, chat_id, True):
+                    added += 1
+            if added:
+                self._rebuild()
+                self._save(chat_id)
+        return added
+    
+    def remove(self, word: str, chat_id: Optional[int] = None) -> bool:
+        self._check_scope(chat_id)
+        word = word.lower().strip()
+        with self._lock:
+            if chat_id is None:
+                if word not in self._words:
+                    return False
+                self._words.discard(word)
+            elif not self._own(word, chat_id, False):
+                return False
+            self._rebuild()
+            self._save(chat_id)
+            return True
+    
+    def clear(self, chat_id: Optional[int] = None) -> int:
+        self._check_scope(chat_id)
+        with self._lock:
+            if chat_id is None:
+                count = len(self._words)
+                self._words.clear()
+            else:
+                words = self._chat_words(chat_id)
+                for word in words:
+                    self._own(word, chat_id, False)
+                count = len(words)
+            self._rebuild()
+            self._save(chat_id)
+            return count
+    
+    def find_in_text(self, text: str, chat_id: Optional[int] = None, mode: str = "substring") -> List[str]:
+        """Слова общего списка и списка чата chat_id, найденные в тексте"""
+        index = self._index
+        if not index.origins:
+            return []
+        words_mode = mode == "words"
+        norms = index.norms
+        hits = index.word_hits if words_mode else index.hits
+        
+        # Токены кэшируются как есть: регистр убирает нормализация
+        tokens = text.split()
+        unique = set(tokens)
+        for token in unique.difference(norms):
+            norm = normalizer.normalize(token)
+            found = index.matcher.find(norm)
+            if found:
+                index.hits[token] = tuple(found)
+            found = index.find_stems(norm)
+            if found:
+                index.word_hits[token] = found
+            norms[token] = norm
+        
+        forms: Dict[str, None] = {}
+        if hits:
+            for token in hits.keys() & unique:
+                forms.update(dict.fromkeys(hits[token]))
+        
+        padded = f" {text} "
+        if self._LETTERS_HINT.search(padded):
+            for run in self._LETTERS.finditer(padded):
+                norm = normalizer.normalize(run.group())
+                found = index.find_stems(norm) if words_mode else index.matcher.find(norm)
+                forms.update(dict.fromkeys(found))
+        
+        phrase_re = index.word_phrase_re if words_mode else index.phrase_re
+        if phrase_re is not None:
+            # Фразам нужен нормализованный текст целиком
+            joined = " ".join(map(norms.__getitem__, tokens))
+            forms.update(dict.fromkeys(m.group() for m in phrase_re.finditer(joined)))
+        
+        if len(norms) > TRIGGER_TOKEN_CACHE:
+            with self._lock:
+                index.reset_cache()
+        
+        found = []
+        for form in forms:
+            for word in index.origins[form]:
+                owners = index.tags[word]
+                if owners is None or chat_id in owners:
+                    found.append(word)
+        return found
+    
+    def get_all(self, chat_id: Optional[int] = None) -> List[str]:
+        with self._lock:
+            if chat_id is not None:
+                return self._chat_words(chat_id)
+            return sorted(self._words)
+    
+    def count(self, chat_id: Optional[int] = None) -> int:
+        with self._lock:
+            if chat_id is not None:
+                return sum(1 for owners in self._owners.values() if chat_id in owners)
+            return len(self._words)
+    
+    def is_empty(self) -> bool:
+        with self._lock:
+            return len(self._words) == 0
+
+# ================================
+# Менеджер анти-спама
+# ================================
+class AntiSpamManager:
+    """Защита от спама/флуда (скользящее окно).
+
+    На каждую пару (chat_id, user_id) хранится deque не длиннее
+    max_messages + 1 отметок времени. Пары, от которых давно не было
+    сообщений, удаляет фоновый поток.
+    """
+    
+    def __init__(self, idle_ttl: float = ANTISPAM_IDLE_TTL, sweep_interval: float = ANTISPAM_SWEEP_INTERVAL,
+                 stripes: int = LOCK_STRIPES):
+        self.idle_ttl = idle_ttl
+        self._locks = StripedLock(stripes, threading.Lock)
+        self._messages: Dict[Tuple[int, int], deque] = {}
+        
+        if sweep_interval > 0:
+            self._sweep_interval = sweep_interval
+            threading.Thread(target=self._sweep_loop, name="antispam-sweep", daemon=True).start()
+    
+    def check(self, chat_id: int, user_id: int, max_messages: int, seconds: int) -> bool:
+        key = (chat_id, user_id)
+        now = time.monotonic()
+        
+        with self._locks.for_key(chat_id):
+            times = self._messages.get(key)
+            if times is None or times.maxlen != max_messages + 1:
+                times = deque(times or (), maxlen=max_messages + 1)
+                self._messages[key] = times
+            times.append(now)
+            while now - times[0] >= seconds:
+                times.popleft()
+            return len(times) > max_messages
+    
+    def reset(self, chat_id: int, user_id: int) -> None:
+        with self._locks.for_key(chat_id):
+            self._messages.pop((chat_id, user_id), None)
+    
+    def sweep(self) -> int:
+        """Удаляет неактивные пары, возвращает их количество"""
+        deadline = time.monotonic() - self.idle_ttl
+        with self._locks.all():
+            idle = [key for key, times in self._messages.items() if times[-1] < deadline]
+            for key in idle:
+                del self._messages[key]
+        return len(idle)
+    
+    def _sweep_loop(self) -> None:
+        while True:
+            time.sleep(self._sweep_interval)
+            self.sweep()
+    
+    def count(self) -> int:
+        return len(self._messages)
+    
+    def memory_estimate(self) -> int:
+        """Примерный объём памяти под окна, в байтах"""
+        with self._locks.all():
+            total = sys.getsizeof(self._messages)
+            for key, times in self._messages.items():
+                total += sys.getsizeof(key) + sys.getsizeof(times) + len(times) * sys.getsizeof(0.0)
+            return total
+
+# ================================
+# Менеджер предупреждений
+# ================================
+class WarnsManager:
+    """Управление предупреждениями пользователей.
+
+    Предупреждения пользователя хранятся по времени выдачи, поэтому
+    истёкшие (старше warn_expire_days чата) — всегда начало списка.
+    Чтение находит границу бинарным поиском и просто её пропускает;
+    из хранилища их убирает запись по этому ключу или фоновая чистка.
+    """
+    
+    def __init__(self, storage: JsonStorage, settings: "SettingsManager",
+                 compact_interval: float = WARNS_COMPACT_INTERVAL):
+        self.storage = storage
+        self.settings = settings
+        self.compact_interval = compact_interval
+        self._locks = StripedLock()
+        self._closed = False
+        self._wakeup = threading.Event()
+        
+        if compact_interval > 0:
+            threading.Thread(target=self._compact_loop, name="warns-compact", daemon=True).start()
+            atexit.register(self.close)
+    
+    def _cutoff(self, chat_id) -> Optional[str]:
+        """Дата, раньше которой предупреждения чата истекли (None — не истекают)"""
+        days = self.settings.config(int(chat_id)).warn_expire_days
+        if not days or days <= 0:
+            return None
+        return (datetime.now() - timedelta(days=days)).isoformat()
+    
+    @staticmethod
+    def _first_active(warns: List[dict], cutoff: Optional[str]) -> int:
+        # ISO-даты одного формата сравниваются как строки
+        lo, hi = 0, len(warns) if cutoff else 0
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if warns[mid]["date"] < cutoff:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def _active(self, chat_id: int, user_id: int) -> List[dict]:
+        warns = self.storage.get(f"{chat_id}:{user_id}", [])
+        return warns[self._first_active(warns, self._cutoff(chat_id)):]
+    
+    def add_warn(self, chat_id: int, user_id: int, reason: str, by_user_id: int) -> int:
+        key = f"{chat_id}:{user_id}"
+        with self._locks.for_key(key):
+            warns = self._active(chat_id, user_id)
+            warns.append({
+                "reason": reason,
+                "by": by_user_id,
+                "date": datetime.now().isoformat()
+            })
+            self.storage.set(key, warns)
+            return len(warns)
+    
+    def remove_warn(self, chat_id: int, user_id: int, index: int = -1) -> bool:
+        key = f"{chat_id}:{user_id}"
+        with self._locks.for_key(key):
+            warns = self._active(chat_id, user_id)
+            if not warns:
+                return False
+            try:
+                warns.pop(index)
+            except IndexError:
+                return False
+            if warns:
+                self.storage.set(key, warns)
+            else:
+                self.storage.delete(key)
+            return True
+    
+    def clear_warns(self, chat_id: int, user_id: int) -> int:
+        key = f"{chat_id}:{user_id}"
+        with self._locks.for_key(key):
+            count = len(self._active(chat_id, user_id))
+            self.storage.delete(key)
+            return count
+    
+    def get_warns(self, chat_id: int, user_id: int) -> List[dict]:
+        return self._active(chat_id, user_id)
+    
+    def count_warns(self, chat_id: int, user_id: int) -> int:
+        warns = self.storage.get(f"{chat_id}:{user_id}", [])
+        return len(warns) - self._first_active(warns, self._cutoff(chat_id))
+    
+    def compact(self, batch: int = WARNS_COMPACT_BATCH) -> int:
+        """Удаляет истёкшие предупреждения из хранилища; возвращает их число"""
+        removed = 0
+        keys = self.storage.keys()
+        for start in range(0, len(keys), batch):
+            if self._closed:
+                break
+            changes = {}
+            with self._locks.all():
+                for key in keys[start:start + batch]:
+                    warns = self.storage.get(key)
+                    if not warns:
+                        continue
+                    try:
+                        first = self._first_active(warns, self._cutoff(key.split(":", 1)[0]))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if first:
+                        changes[key] = warns[first:] or None
+                        removed += first
+                # Одна запись на пачку, а не на каждый ключ
+                self.storage.update(changes)
+        return removed
+    
+    def _compact_loop(self) -> None:
+        while not self._closed:
+            try:
+                removed = self.compact()
+                if removed:
+                    print(f"🧹 Удалено истёкших предупреждений: {removed}")
+            except Exception as e:
+                print(f"⚠️ Ошибка чистки предупреждений: {e}")
+            self._wakeup.wait(self.compact_interval)
+    
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+
+# ================================
+# Менеджер статистики
+# ================================
+STAT_TYPES = ("deleted_messages", "warns_given", "mutes", "bans", "kicks", "spam_blocked", "links_blocked")
+
+class StatsSeries:
+    """Счётчики одного чата по времени: кольцевые массивы минутных,
+    часовых и дневных корзин.
+
+    Корзина уровня — строка из len(STAT_TYPES) счётчиков в общем
+    array('I'); ids хранит номер периода, который сейчас лежит в слоте,
+    устаревший слот обнуляется при первой записи. Инкремент сразу
+    попадает во все три уровня, так что свёртка минут в часы и дни
+    не требует отдельного прохода.
+    """
+    
+    LEVELS = ((60, STATS_MINUTE_SLOTS), (3600, STATS_HOUR_SLOTS), (86400, STATS_DAY_SLOTS))
+    WIDTH = len(STAT_TYPES)
+    
+    __slots__ = ("ids", "counts")
+    
+    def __init__(self, data: Optional[dict] = None):
+        self.ids = [array("q", [-1]) * slots for _, slots in self.LEVELS]
+        self.counts = [array("I", [0]) * (slots * self.WIDTH) for _, slots in self.LEVELS]
+        if data:
+            try:
+                for level, (_, slots) in enumerate(self.LEVELS):
+                    ids = array("q", base64.b64decode(data["ids"][level]))
+                    counts = array("I", base64.b64decode(data["counts"][level]))
+                    # Размер хранения поменялся — старые корзины не переносим
+                    if len(ids) == slots and len(counts) == slots * self.WIDTH:
+                        self.ids[level], self.counts[level] = ids, counts
+            except (KeyError, IndexError, ValueError, TypeError):
+                pass
+    
+    def add(self, index: int, count: int, now: float) -> None:
+        for level, (span, slots) in enumerate(self.LEVELS):
+            period = int(now // span)
+            slot = period % slots
+            base = slot * self.WIDTH
+            counts = self.counts[level]
+            if self.ids[level][slot] != period:
+                self.ids[level][slot] = period
+                for i in range(base, base + self.WIDTH):
+                    counts[i] = 0
+            counts[base + index] += count
+    
+    def window(self, seconds: float, now: float) -> List[int]:
+        """Суммы за последние seconds (с точностью до корзины) по самому
+        мелкому уровню, который покрывает это окно"""
+        for level, (span, slots) in enumerate(self.LEVELS):
+            if span * slots >= seconds or level == len(self.LEVELS) - 1:
+                break
+        periods = min(slots, max(1, -(-int(seconds) // span)))
+        current = int(now // span)
+        ids, counts = self.ids[level], self.counts[level]
+        
+        totals = [0] * self.WIDTH
+        for period in range(current - periods + 1, current + 1):
+            slot = period % slots
+            if ids[slot] == period:
+                base = slot * self.WIDTH
+                for i in range(self.WIDTH):
+                    totals[i] += counts[base + i]
+        return totals
+    
+    def dump(self) -> dict:
+        return {
+            "ids": [base64.b64encode(a.tobytes()).decode("ascii") for a in self.ids],
+            "counts": [base64.b64encode(a.tobytes()).decode("ascii") for a in self.counts],
+        }
+
+class StatsManager:
+    """Статистика модерации.
+
+    Итоговые счётчики и ряды по времени живут в памяти: increment() —
+    несколько операций над словарём и массивом. Изменённые чаты
+    сбрасываются в хранилища фоновым потоком раз в flush_interval секунд
+    и при завершении процесса.
+    """
+    
+    def __init__(self, storage: JsonStorage, series_storage: JsonStorage,
+                 flush_interval: float = STATS_FLUSH_INTERVAL):
+        self.storage = storage
+        self.series_storage = series_storage
+        self.flush_interval = flush_interval
+        self._locks = StripedLock()
+        self._totals: Dict[int, Dict[str, int]] = {}
+        self._series: Dict[int, StatsSeries] = {}
+        self._dirty: Set[int] = set()
+        self._dirty_lock = threading.Lock()
+        self._closed = False
+        self._wakeup = threading.Event()
+        
+        self._flusher = threading.Thread(target=self._flush_loop, name="flush-stats", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+    
+    def _load(self, chat_id: int) -> Tuple[Dict[str, int], StatsSeries]:
+        """Вызывается под локом чата"""
+        totals = self._totals.get(chat_id)
+        if totals is None:
+            totals = dict(self.storage.get(str(chat_id)) or {})
+            self._totals[chat_id] = totals
+            self._series[chat_id] = StatsSeries(self.series_storage.get(str(chat_id)))
+        return totals, self._series[chat_id]
+    
+    def increment(self, chat_id: int, stat_type: str, count: int = 1) -> None:
+        now = time.time()
+        with self._locks.for_key(chat_id):
+            totals, series = self._load(chat_id)
+            totals[stat_type] = totals.get(stat_type, 0) + count
+            if stat_type in STAT_TYPES:
+                series.add(STAT_TYPES.index(stat_type), count, now)
+        with self._dirty_lock:
+            self._dirty.add(chat_id)
+    
+    def get_stats(self, chat_id: int) -> dict:
+        with self._locks.for_key(chat_id):
+            totals, _ = self._load(chat_id)
+            return {**dict.fromkeys(STAT_TYPES, 0), **totals}
+    
+    def get_window(self, chat_id: int, seconds: float) -> dict:
+        """Счётчики за последние seconds (не дольше STATS_DAY_SLOTS дней)"""
+        with self._locks.for_key(chat_id):
+            _, series = self._load(chat_id)
+            return dict(zip(STAT_TYPES, series.window(seconds, time.time())))
+    
+    def flush(self) -> None:
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        for chat_id in dirty:
+            with self._locks.for_key(chat_id):
+                totals = dict(self._totals[chat_id])
+                series = self._series[chat_id].dump()
+            self.storage.set(str(chat_id), totals)
+            self.series_storage.set(str(chat_id), series)
+    
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self.flush()
+    
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._flusher.join(timeout=10)
+        self.flush()
+
+# ================================
+# Менеджер настроек чата
+# ================================
+class ChatConfig:
+    """Неизменяемый снимок настроек чата с подставленными значениями по умолчанию"""
+    
+    __slots__ = tuple(DEFAULT_SETTINGS)
+    
+    def __init__(self, values: dict):
+        for key, default in DEFAULT_SETTINGS.items():
+            value = values.get(key, default)
+            if key == "allowed_domains":
+                value = frozenset(value or ())
+            object.__setattr__(self, key, value)
+    
+    def __setattr__(self, key, value):
+        raise AttributeError("ChatConfig неизменяем")
+
+class SettingsManager:
+    """Настройки чатов.
+
+    Для горячего пути config() возвращает закэшированный ChatConfig;
+    кэш чата пересобирается при set/reset.
+    """
+    
+    def __init__(self, storage: JsonStorage):
+        self.storage = storage
+        self._lock = threading.Lock()
+        self._configs: Dict[int, ChatConfig] = {}
+    
+    def config(self, chat_id: int) -> ChatConfig:
+        cfg = self._configs.get(chat_id)
+        if cfg is None:
+            with self._lock:
+                cfg = self._configs.get(chat_id)
+                if cfg is None:
+                    cfg = ChatConfig(self.storage.get(str(chat_id), {}))
+                    self._configs[chat_id] = cfg
+        return cfg
+    
+    def get(self, chat_id: int, key: str) -> Any:
+        if key in DEFAULT_SETTINGS:
+            return getattr(self.config(chat_id), key)
+        return self.storage.get(str(chat_id), {}).get(key)
+    
+    def set(self, chat_id: int, key: str, value: Any) -> None:
+        with self._lock:
+            chat_settings = self.storage.get(str(chat_id), {})
+            chat_settings[key] = value
+            self.storage.set(str(chat_id), chat_settings)
+            self._configs[chat_id] = ChatConfig(chat_settings)
+    
+    def get_all(self, chat_id: int) -> dict:
+        default = DEFAULT_SETTINGS.copy()
+        default.update(self.storage.get(str(chat_id), {}))
+        return default
+    
+    def reset(self, chat_id: int) -> None:
+        with self._lock:
+            self.storage.delete(str(chat_id))
+            self._configs.pop(chat_id, None)
+
+# ================================
+# Детектор ссылок
+# ================================
+class LinkDetector:
+    """Поиск ссылок с белым списком доменов для каждого чата.
+
+    Если Telegram прислал entities, ссылки берутся из них (url/text_link)
+    и текст не сканируется. Белый список читается из настроек только
+    для сообщений, в которых ссылка действительно найдена.
+    """
+    
+    LINK_RE = re.compile(r'https?://(?P<host>[^\s/?#]+)\S*|(?P<tg>t|telegram)\.me/\S+', re.IGNORECASE)
+    HOST_END_RE = re.compile(r'[/?#]')
+    
+    def __init__(self, settings: SettingsManager):
+        self.settings = settings
+    
+    @classmethod
+    def extract_domain(cls, url: str) -> str:
+        url = url.strip().lower()
+        if "://" in url:
+            url = url.split("://", 1)[1]
+        host = cls.HOST_END_RE.split(url, 1)[0]
+        host = host.rsplit("@", 1)[-1].split(":", 1)[0].rstrip(".")
+        if host.startswith("www."):
+            host = host[4:]
+        return host
+    
+    @staticmethod
+    def _is_allowed(domain: str, allowed: frozenset) -> bool:
+        # Поддомены разрешённого домена тоже разрешены
+        while domain:
+            if domain in allowed:
+                return True
+            dot = domain.find(".")
+            if dot < 0:
+                return False
+            domain = domain[dot + 1:]
+        return False
+    
+    @staticmethod
+    def _entity_text(text: str, entity) -> str:
+        # offset и length в entities считаются в UTF-16
+        raw = text.encode("utf-16-le")
+        return raw[entity.offset * 2:(entity.offset + entity.length) * 2].decode("utf-16-le", "ignore")
+    
+    def _iter_urls(self, text: str, entities):
+        if entities is not None:
+            for entity in entities:
+                if entity.type == "url":
+                    yield self._entity_text(text, entity)
+                elif entity.type == "text_link" and entity.url:
+                    yield entity.url
+            return
+        for match in self.LINK_RE.finditer(text):
+            yield match.group(0) if match.group("host") else f"{match.group('tg')}.me"
+    
+    def get_allowed(self, chat_id: int) -> frozenset:
+        return self.settings.config(chat_id).allowed_domains
+    
+    def has_links(self, chat_id: int, text: str, entities=None) -> bool:
+        """Есть ли в сообщении ссылка на домен вне белого списка"""
+        allowed = None
+        for url in self._iter_urls(text, entities):
+            if allowed is None:
+                allowed = self.get_allowed(chat_id)
+            if not allowed or not self._is_allowed(self.extract_domain(url), allowed):
+                return True
+        return False
+    
+    def allow(self, chat_id: int, domain: str) -> bool:
+        domain = self.extract_domain(domain)
+        allowed = self.get_allowed(chat_id)
+        if not domain or domain in allowed:
+            return False
+        self.settings.set(chat_id, "allowed_domains", sorted(allowed | {domain}))
+        return True
+    
+    def disallow(self, chat_id: int, domain: str) -> bool:
+        domain = self.extract_domain(domain)
+        allowed = self.get_allowed(chat_id)
+        if domain not in allowed:
+            return False
+        self.settings.set(chat_id, "allowed_domains", sorted(allowed - {domain}))
+        return True
+
+# ================================
+# Менеджер состояний пользователей
+# ================================
+class UserStateManager:
+    def __init__(self, stripes: int = LOCK_STRIPES):
+        self._locks = StripedLock(stripes, threading.Lock)
+        self._states: dict = {}
+    
+    def set_state(self, user_id: int, state: str, data: dict = None) -> None:
+        with self._locks.for_key(user_id):
+            self._states[user_id] = {"state": state, "data": data or {}}
+    
+    def get_state(self, user_id: int) -> Optional[dict]:
+        with self._locks.for_key(user_id):
+            return self._states.get(user_id)
+    
+    def clear(self, user_id: int) -> None:
+        with self._locks.for_key(user_id):
+            self._states.pop(user_id, None)
+    
+    def start_confirmation(self, user_id: int) -> None:
+        self.set_state(user_id, "confirm", {"count": 0})
+    
+    def confirm(self, user_id: int) -> Optional[int]:
+        with self._locks.for_key(user_id):
+            if user_id not in self._states or self._states[user_id]["state"] != "confirm":
+                return None
+            self._states[user_id]["data"]["count"] += 1
+            return self._states[user_id]["data"]["count"]
+
+# ================================
+# Диспетчер обновлений
+# ================================
+class ShardedDispatcher:
+    """Пул потоков-обработчиков, шардированный по chat_id.
+
+    Все обновления одного чата попадают в один шард и обрабатываются
+    по порядку, разные чаты обрабатываются параллельно. Очереди шардов
+    ограничены: при переполнении поток опроса ждёт (backpressure).
+    """
+    
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._stats_lock = threading.Lock()
+        self._stats = [
+            {"processed": 0, "errors": 0, "blocked": 0, "max_depth": 0, "wait_total": 0.0}
+            for _ in range(workers)
+        ]
+        self._threads: List[threading.Thread] = []
+    
+    @staticmethod
+    def shard_key(update) -> int:
+        message = update.message or update.edited_message
+        if message:
+            return message.chat.id
+        call = update.callback_query
+        if call:
+            return call.message.chat.id if call.message else call.from_user.id
+        return 0
+    
+    def start(self) -> None:
+        if self._threads:
+            return
+        for shard in range(self.workers):
+            thread = threading.Thread(target=self._worker, args=(shard,), name=f"shard-{shard}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def submit(self, update) -> None:
+        shard = self.shard_key(update) % self.workers
+        q = self._queues[shard]
+        stat = self._stats[shard]
+        if q.full():
+            with self._stats_lock:
+                stat["blocked"] += 1
+        q.put((time.monotonic(), update))
+        with self._stats_lock:
+            stat["max_depth"] = max(stat["max_depth"], q.qsize())
+    
+    def _worker(self, shard: int) -> None:
+        q = self._queues[shard]
+        stat = self._stats[shard]
+        while True:
+            enqueued, update = q.get()
+            if update is None:
+                break
+            waited = time.monotonic() - enqueued
+            try:
+                bot.process_new_updates([update])
+            except Exception as e:
+                print(f"❌ Ошибка обработки обновления {update.update_id}: {e}")
+                with self._stats_lock:
+                    stat["errors"] += 1
+            with self._stats_lock:
+                stat["processed"] += 1
+                stat["wait_total"] += waited
+    
+    def stop(self, timeout: float = 10) -> None:
+        for q in self._queues:
+            q.put((time.monotonic(), None))
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+    
+    def get_stats(self) -> List[dict]:
+        """Метрики по шардам: глубина очереди, обработано, блокировки"""
+        with self._stats_lock:
+            result = []
+            for shard, stat in enumerate(self._stats):
+                processed = stat["processed"]
+                result.append({
+                    "shard": shard,
+                    "depth": self._queues[shard].qsize(),
+                    "max_depth": stat["max_depth"],
+                    "processed": processed,
+                    "errors": stat["errors"],
+                    "blocked": stat["blocked"],
+                    "avg_wait": stat["wait_total"] / processed if processed else 0.0,
+                })
+            return result
+
+# ================================
+# Webhook-сервер
+# ================================
+class WebhookServer:
+    """Локальный HTTP-сервер для приёма обновлений от Telegram.
+
+    Запрос проверяется по заголовку X-Telegram-Bot-Api-Secret-Token,
+    тело кладётся в ограниченную очередь и сразу возвращается 200.
+    Отдельный поток разбирает обновления и передаёт их диспетчеру.
+    При переполнении очереди отвечаем 503 — Telegram повторит доставку.
+    """
+    
+    SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+    
+    def __init__(self, host: str, port: int, path: str, secret: str, queue_size: int):
+        self.path = path
+        self.secret = secret
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stats_lock = threading.Lock()
+        self._stats = {"accepted": 0, "rejected": 0, "overflow": 0, "errors": 0}
+        self._consumer: Optional[threading.Thread] = None
+        
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                server._handle(self)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+    
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._httpd.server_address[:2]
+    
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+    
+    @staticmethod
+    def _reply(request, code: int) -> None:
+        request.send_response(code)
+        request.send_header("Content-Length", "0")
+        request.end_headers()
+    
+    def _handle(self, request) -> None:
+        if request.path != self.path:
+            self._count("rejected")
+            return self._reply(request, 404)
+        
+        token = request.headers.get(self.SECRET_HEADER, "")
+        if not hmac.compare_digest(token.encode(), self.secret.encode()):
+            self._count("rejected")
+            return self._reply(request, 403)
+        
+        try:
+            length = int(request.headers.get("Content-Length", 0))
+        except ValueError:
+            length = 0
+        if length <= 0 or length > WEBHOOK_MAX_BODY:
+            self._count("rejected")
+            return self._reply(request, 400)
+        
+        body = request.rfile.read(length)
+        try:
+            self._queue.put_nowait(body)
+        except queue.Full:
+            self._count("overflow")
+            return self._reply(request, 503)
+        
+        self._count("accepted")
+        self._reply(request, 200)
+    
+    def _consume(self) -> None:
+        while True:
+            body = self._queue.get()
+            if body is None:
+                break
+            try:
+                update = types.Update.de_json(body.decode("utf-8"))
+                dispatcher.submit(update)
+            except Exception as e:
+                print(f"❌ Ошибка разбора обновления: {e}")
+                self._count("errors")
+    
+    def serve_forever(self) -> None:
+        self._consumer = threading.Thread(target=self._consume, name="webhook-consumer", daemon=True)
+        self._consumer.start()
+        self._httpd.serve_forever()
+    
+    def shutdown(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._queue.put(None)
+        if self._consumer:
+            self._consumer.join(timeout=10)
+    
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats, queued=self._queue.qsize())
+
+# ================================
+# Кэш статусов участников
+# ================================
+class ChatMemberCache:
+    """Кэш статусов участников чатов (TTL + LRU).
+
+    При промахе список админов чата загружается целиком через
+    get_chat_administrators, поэтому обычные участники определяются
+    без отдельного запроса к API.
+    """
+    
+    ADMIN_STATUSES = ("creator", "administrator")
+    
+    def __init__(self, ttl: int, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._admins: "OrderedDict[int, Tuple[Dict[int, str], float]]" = OrderedDict()
+        self._members: "OrderedDict[Tuple[int, int], Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+    
+    def _put(self, cache: OrderedDict, key, value) -> None:
+        cache[key] = (value, time.monotonic() + self.ttl)
+        cache.move_to_end(key)
+        while len(cache) > self.max_size:
+            cache.popitem(last=False)
+    
+    def _lookup(self, chat_id: int, user_id: int) -> Optional[str]:
+        now = time.monotonic()
+        entry = self._admins.get(chat_id)
+        if entry and entry[1] > now:
+            self._admins.move_to_end(chat_id)
+            return entry[0].get(user_id, "member")
+        entry = self._members.get((chat_id, user_id))
+        if entry and entry[1] > now:
+            self._members.move_to_end((chat_id, user_id))
+            return entry[0]
+        return None
+    
+    def peek(self, chat_id: int, user_id: int) -> Optional[str]:
+        """Статус из кэша без обращения к API (None — промах)"""
+        with self._lock:
+            status = self._lookup(chat_id, user_id)
+            if status is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return status
+    
+    def store_admins(self, chat_id: int, admins: list) -> Dict[int, str]:
+        """Сохраняет ответ get_chat_administrators"""
+        statuses = {m.user.id: m.status for m in admins}
+        with self._lock:
+            self.api_calls += 1
+            self._put(self._admins, chat_id, statuses)
+        return statuses
+    
+    def store_member(self, chat_id: int, user_id: int, status: str) -> None:
+        """Сохраняет ответ get_chat_member"""
+        with self._lock:
+            self.api_calls += 1
+            self._put(self._members, (chat_id, user_id), status)
+    
+    def get_status(self, chat_id: int, user_id: int) -> Optional[str]:
+        """Статус пользователя в чате или None, если API недоступен"""
+        status = self.peek(chat_id, user_id)
+        if status is not None:
+            return status
+        
+        try:
+            statuses = self.store_admins(chat_id, bot.get_chat_administrators(chat_id))
+            return statuses.get(user_id, "member")
+        except Exception:
+            pass
+        
+        # Список админов недоступен — спрашиваем конкретного участника
+        try:
+            status = bot.get_chat_member(chat_id, user_id).status
+        except Exception:
+            return None
+        self.store_member(chat_id, user_id, status)
+        return status
+    
+    def invalidate(self, chat_id: int) -> None:
+        with self._lock:
+            self._admins.pop(chat_id, None)
+            for key in [k for k in self._members if k[0] == chat_id]:
+                del self._members[key]
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "api_calls": self.api_calls,
+                "chats": len(self._admins),
+                "members": len(self._members),
+            }
+
+# ================================
+# Ограничение исходящих запросов
+# ================================
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+    
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+    
+    def wait_time(self, now: float) -> float:
+        """Сколько ждать до следующего токена (0 — можно сейчас)"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.paused_until > now:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+    
+    def consume(self) -> None:
+        self.tokens -= 1
+    
+    def is_idle(self, now: float) -> bool:
+        return self.paused_until <= now and self.tokens >= self.capacity
+
+class ApiGovernor:
+    """Планировщик исходящих запросов к Bot API.
+
+    Все запросы проходят через глобальную корзину токенов, уведомления —
+    ещё и через корзину своего чата. Действия модерации (удаление, мут)
+    имеют приоритет над уведомлениями. На 429 запрос возвращается в
+    очередь, а чат ставится на паузу на retry_after секунд.
+    """
+    
+    PRIORITY_ACTION = 0
+    PRIORITY_NOTICE = 1
+    
+    def __init__(self, global_rate: float = API_GLOBAL_RATE, chat_rate: float = API_CHAT_RATE,
+                 chat_burst: float = API_CHAT_BURST, workers: int = API_WORKERS):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self._stats = {"executed": 0, "errors": 0, "throttled": 0, "retries_429": 0}
+        threading.Thread(target=self._run, name="api-governor", daemon=True).start()
+    
+    def submit(self, priority: int, chat_id: Optional[int], func, *args, **kwargs) -> Future:
+        """Ставит вызов func(*args, **kwargs) в очередь"""
+        future: Future = Future()
+        job = [priority, next(self._seq), chat_id, func, args, kwargs, future, 0]
+        with self._cond:
+            heapq.heappush(self._heap, job)
+            self._cond.notify()
+        return future
+    
+    def call(self, priority: int, chat_id: Optional[int], func, *args, **kwargs):
+        """Синхронный вызов через очередь: ждёт результат или исключение"""
+        return self.submit(priority, chat_id, func, *args, **kwargs).result()
+    
+    def notify(self, chat_id: int, text: str, **kwargs) -> Future:
+        """Уведомление в чат без ожидания результата"""
+        future = self.submit(self.PRIORITY_NOTICE, chat_id, bot.send_message, chat_id, text, **kwargs)
+        future.add_done_callback(self.log_failure)
+        return future
+    
+    @staticmethod
+    def log_failure(future: Future) -> None:
+        if future.exception():
+            print(f"❌ Ошибка отправки уведомления: {future.exception()}")
+    
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+    
+    def _next_ready(self) -> Tuple[Optional[list], Optional[float]]:
+        """Следующий готовый запрос или время ожидания (вызывать под _cond)"""
+        if not self._heap:
+            return None, None
+        now = time.monotonic()
+        wait = self._global.wait_time(now)
+        if wait > 0:
+            return None, wait
+        
+        deferred = []
+        job, wait = None, None
+        while self._heap:
+            candidate = heapq.heappop(self._heap)
+            priority, chat_id = candidate[0], candidate[2]
+            bucket = self._chat_bucket(chat_id) if chat_id is not None else None
+            
+            # Действия ограничены только паузой после 429, уведомления — ещё и лимитом чата
+            chat_wait = 0.0
+            if bucket and priority == self.PRIORITY_NOTICE:
+                chat_wait = bucket.wait_time(now)
+            elif bucket:
+                chat_wait = max(0.0, bucket.paused_until - now)
+            
+            if chat_wait > 0:
+                self._stats["throttled"] += 1
+                deferred.append(candidate)
+                wait = chat_wait if wait is None else min(wait, chat_wait)
+                continue
+            if bucket and priority == self.PRIORITY_NOTICE:
+                bucket.consume()
+            job = candidate
+            break
+        
+        for candidate in deferred:
+            heapq.heappush(self._heap, candidate)
+        if job:
+            self._global.consume()
+        return job, wait
+    
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                job, wait = self._next_ready()
+                if job is None:
+                    self._cond.wait(timeout=wait)
+                    continue
+            self._pool.submit(self._execute, job)
+    
+    def _execute(self, job: list) -> None:
+        chat_id, func, args, kwargs, future = job[2:7]
+        try:
+            result = func(*args, **kwargs)
+        except telebot.apihelper.ApiTelegramException as e:
+            retry_after = (e.result_json or {}).get("parameters", {}).get("retry_after")
+            if e.error_code == 429 and retry_after and job[7] < API_MAX_RETRIES:
+                self._retry(job, retry_after)
+                return
+            self._finish(future, error=e)
+            return
+        except Exception as e:
+            self._finish(future, error=e)
+            return
+        self._finish(future, result=result)
+    
+    def _retry(self, job: list, retry_after: float) -> None:
+        with self._cond:
+            self._stats["retries_429"] += 1
+            until = time.monotonic() + retry_after
+            if job[2] is None:
+                self._global.paused_until = max(self._global.paused_until, until)
+            else:
+                bucket = self._chat_bucket(job[2])
+                bucket.paused_until = max(bucket.paused_until, until)
+            job[7] += 1
+            heapq.heappush(self._heap, job)
+            self._cond.notify()
+    
+    def _finish(self, future: Future, result=None, error: Exception = None) -> None:
+        with self._cond:
+            self._stats["errors" if error else "executed"] += 1
+            if len(self._chats) > 1000:
+                now = time.monotonic()
+                for chat_id in [c for c, b in self._chats.items() if b.is_idle(now)]:
+                    del self._chats[chat_id]
+        if error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    def get_stats(self) -> dict:
+        with self._cond:
+            queued = len(self._heap)
+            actions = sum(1 for job in self._heap if job[0] == self.PRIORITY_ACTION)
+            now = time.monotonic()
+            return dict(
+                self._stats,
+                queued=queued,
+                queued_actions=actions,
+                queued_notices=queued - actions,
+                paused_chats=sum(1 for b in self._chats.values() if b.paused_until > now),
+            )
+
+# ================================
+# Сводные уведомления
+# ================================
+class NoticeAggregator:
+    """Объединение уведомлений о модерации во время рейдов.
+
+    Первое событие в чате отправляется сразу и открывает окно. События,
+    пришедшие за окно, копятся и уходят одной сводкой в конце окна; если
+    рейд продолжается, открывается следующее окно.
+    """
+    
+    KIND_LABELS = {
+        "trigger": "🚫 триггер-слова",
+        "link": "🔗 ссылки",
+        "spam": "🔇 спам (мут)",
+        "join": "🚪 ограничено новых участников",
+    }
+    
+    def __init__(self, window: float = NOTICE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        # chat_id -> None (окно открыто, событий нет) или накопленные события
+        self._windows: Dict[int, Optional[dict]] = {}
+        self.sent = 0
+        self.suppressed = 0
+    
+    def add(self, chat_id: int, kind: str, user, text: str) -> None:
+        with self._lock:
+            if chat_id not in self._windows:
+                self._windows[chat_id] = None
+                self._start_timer(chat_id)
+                self.sent += 1
+                send_now = True
+            else:
+                pending = self._windows[chat_id]
+                if pending is None:
+                    pending = self._windows[chat_id] = {"kinds": defaultdict(int), "users": set()}
+                pending["kinds"][kind] += 1
+                pending["users"].add(user.id)
+                self.suppressed += 1
+                send_now = False
+        if send_now:
+            governor.notify(chat_id, text)
+    
+    def _start_timer(self, chat_id: int) -> None:
+        timer = threading.Timer(self.window, self._flush, args=(chat_id,))
+        timer.daemon = True
+        timer.start()
+    
+    def _flush(self, chat_id: int) -> None:
+        with self._lock:
+            pending = self._windows.get(chat_id)
+            if pending is None:
+                self._windows.pop(chat_id, None)
+                return
+            self._windows[chat_id] = None
+            self._start_timer(chat_id)
+            self.sent += 1
+        governor.notify(chat_id, self.format_summary(pending, self.window))
+    
+    @classmethod
+    def format_summary(cls, pending: dict, window: float) -> str:
+        total = sum(pending["kinds"].values())
+        lines = [f"🧹 За {int(window)} сек: нарушений {total} от {len(pending['users'])} пользователей"]
+        for kind, count in sorted(pending["kinds"].items(), key=lambda item: -item[1]):
+            lines.append(f"├ {cls.KIND_LABELS.get(kind, kind)}: {count}")
+        lines[-1] = "└" + lines[-1][1:]
+        return "\n".join(lines)
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"sent": self.sent, "suppressed": self.suppressed, "open_windows": len(self._windows)}
+
+# ================================
+# Детектор рейдов
+# ================================
+class RateWindow:
+    """Число событий за последние size секунд: кольцо посекундных счётчиков"""
+    
+    __slots__ = ("counts", "last", "total")
+    
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.last = int(time.monotonic())
+        self.total = 0
+    
+    def add(self, now: float, n: int = 1) -> int:
+        second = int(now)
+        size = len(self.counts)
+        if second - self.last >= size:
+            self.counts = [0] * size
+            self.total = 0
+        else:
+            for s in range(self.last + 1, second + 1):
+                self.total -= self.counts[s % size]
+                self.counts[s % size] = 0
+        self.last = max(self.last, second)
+        self.counts[second % size] += n
+        self.total += n
+        return self.total
+
+class RaidDetector:
+    """Обнаружение рейдов по частоте входов и сообщений в чате.
+
+    Каждое событие — O(1): счётчик в кольцевом окне и сравнение с порогом.
+    При превышении чат переходит в режим защиты на RAID_LOCKDOWN_MINUTES;
+    пока рейд продолжается, режим продлевается.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._joins: Dict[int, RateWindow] = {}
+        self._messages: Dict[int, RateWindow] = {}
+        self._lockdowns: Dict[int, float] = {}
+    
+    def _window(self, windows: Dict[int, RateWindow], chat_id: int, size: int) -> RateWindow:
+        window = windows.get(chat_id)
+        if window is None:
+            window = windows[chat_id] = RateWindow(size)
+        return window
+    
+    def _check(self, chat_id: int, now: float, count: int, limit: int) -> bool:
+        """Включает/продлевает защиту; True — защита только что включена"""
+        if count < limit:
+            return False
+        started = chat_id not in self._lockdowns
+        self._lockdowns[chat_id] = now + RAID_LOCKDOWN_MINUTES * 60
+        return started
+    
+    def record_joins(self, chat_id: int, count: int = 1) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            total = self._window(self._joins, chat_id, RAID_JOIN_WINDOW).add(now, count)
+            return self._check(chat_id, now, total, RAID_JOIN_LIMIT)
+    
+    def record_message(self, chat_id: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            total = self._window(self._messages, chat_id, RAID_MESSAGE_WINDOW).add(now)
+            return self._check(chat_id, now, total, RAID_MESSAGE_LIMIT)
+    
+    def is_active(self, chat_id: int) -> bool:
+        until = self._lockdowns.get(chat_id)
+        return until is not None and until > time.monotonic()
+    
+    def remaining(self, chat_id: int) -> int:
+        """Секунд до конца защиты (0 — не активна)"""
+        until = self._lockdowns.get(chat_id)
+        return max(0, int(until - time.monotonic())) if until else 0
+    
+    def start(self, chat_id: int) -> bool:
+        with self._lock:
+            started = chat_id not in self._lockdowns
+            self._lockdowns[chat_id] = time.monotonic() + RAID_LOCKDOWN_MINUTES * 60
+            return started
+    
+    def stop(self, chat_id: int) -> bool:
+        with self._lock:
+            return self._lockdowns.pop(chat_id, None) is not None
+    
+    def expire(self, chat_id: int) -> Optional[float]:
+        """Снимает истёкшую защиту. Возвращает остаток в секундах, если она продлена"""
+        with self._lock:
+            until = self._lockdowns.get(chat_id)
+            if until is None:
+                return None
+            left = until - time.monotonic()
+            if left > 0:
+                return left
+            del self._lockdowns[chat_id]
+            return None
+    
+    def active_count(self) -> int:
+        now = time.monotonic()
+        return sum(1 for until in list(self._lockdowns.values()) if until > now)
+
+# ================================
+# Инициализация менеджеров
+# ================================
+warns_storage = open_storage(WARNS_PATH, "warns")
+chat_triggers_storage = open_storage(CHAT_TRIGGERS_PATH, "chat_triggers")
+stats_storage = open_storage(STATS_PATH, "stats", flush_interval=STORAGE_FLUSH_INTERVAL)
+stats_series_storage = open_storage(STATS_SERIES_PATH, "stats_series", flush_interval=STORAGE_FLUSH_INTERVAL)
+settings_storage = open_storage(SETTINGS_PATH, "settings")
+
+triggers = TriggerManager(TRIGGER_PATH, chat_triggers_storage)
+settings = SettingsManager(settings_storage)
+warns = WarnsManager(warns_storage, settings)
+stats = StatsManager(stats_storage, stats_series_storage)
+link_detector = LinkDetector(settings)
+antispam = AntiSpamManager()
+user_states = UserStateManager()
+bot_admins = BotAdminsManager(ADMINS_PATH)
+member_cache = ChatMemberCache(MEMBER_CACHE_TTL, MEMBER_CACHE_SIZE)
+dispatcher = ShardedDispatcher(DISPATCHER_WORKERS, DISPATCHER_QUEUE_SIZE)
+webhook_server: Optional[WebhookServer] = None
+governor = ApiGovernor()
+notices = NoticeAggregator()
+raids = RaidDetector()
+
+# ================================
+# Логирование
+# ================================
+class EventIndex:
+    """Индекс журнала событий в SQLite для выборок /history.
+
+    Журнал JSONL остаётся первоисточником, индекс из него производный
+    и при потере пересобирается. B-деревья по (user_id, ts), (chat_id, ts)
+    и (action, ts) дают выборку за время, пропорциональное размеру
+    результата, а не журнала.
+    """
+    
+    COLUMNS = ("ts", "action", "chat_id", "user_id", "by", "username")
+    
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filepath, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY, ts REAL NOT NULL, action TEXT NOT NULL, "
+            "chat_id INTEGER NOT NULL, user_id INTEGER, by INTEGER, username TEXT, data TEXT);"
+            "CREATE INDEX IF NOT EXISTS events_user ON events (user_id, ts);"
+            "CREATE INDEX IF NOT EXISTS events_chat ON events (chat_id, ts);"
+            "CREATE INDEX IF NOT EXISTS events_action ON events (action, ts);"
+            "CREATE INDEX IF NOT EXISTS events_ts ON events (ts);"
+            "CREATE INDEX IF NOT EXISTS events_username ON events (username) WHERE username IS NOT NULL;"
+        )
+        self._conn.commit()
+        atexit.register(self.close)
+    
+    @classmethod
+    def _row(cls, event: Dict[str, Any]) -> tuple:
+        extra = {k: v for k, v in event.items() if k not in cls.COLUMNS and v is not None}
+        username = event.get("username")
+        return (
+            event["ts"], event["action"], event["chat_id"], event.get("user_id"), event.get("by"),
+            username.lower() if username else None,
+            json.dumps(extra, ensure_ascii=False) if extra else None
+        )
+    
+    def add_many(self, events: Iterable[Dict[str, Any]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO events (ts, action, chat_id, user_id, by, username, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._row(e) for e in events)
+            )
+    
+    def last_ts(self) -> float:
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(ts) FROM events").fetchone()
+        return row[0] or 0.0
+    
+    def catch_up(self, sources: Iterable[str]) -> int:
+        """Дописывает в индекс события из файлов журнала новее последнего проиндексированного"""
+        since = self.last_ts()
+        added = 0
+        for path in sources:
+            if not os.path.exists(path):
+                continue
+            opener = gzip.open if path.endswith(".gz") else open
+            batch = []
+            try:
+                with opener(path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            event = json.loads(line)
+                        except ValueError:
+                            continue  # недописанная строка после сбоя
+                        if event.get("ts", 0) > since:
+                            batch.append(event)
+                        if len(batch) >= 10000:
+                            self.add_many(batch)
+                            added += len(batch)
+                            batch = []
+            except (OSError, EOFError) as e:
+                print(f"⚠️ Ошибка чтения {path}: {e}")
+            self.add_many(batch)
+            added += len(batch)
+        return added
+    
+    def _where(self, chat_id: Optional[int], user_id: Optional[int], action: Optional[str],
+               since: Optional[float], until: Optional[float]) -> Tuple[str, list]:
+        clauses, params = [], []
+        for column, value in (("chat_id", chat_id), ("user_id", user_id), ("action", action)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    def query(self, chat_id: Optional[int] = None, user_id: Optional[int] = None, action: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              limit: Optional[int] = HISTORY_LIMIT) -> List[Dict[str, Any]]:
+        """События по фильтрам, от новых к старым"""
+        where, params = self._where(chat_id, user_id, action, since, until)
+        sql = f"SELECT ts, action, chat_id, user_id, by, username, data FROM events{where} ORDER BY ts DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        
+        result = []
+        for row in rows:
+            event = dict(zip(self.COLUMNS, row[:6]))
+            if row[6]:
+                event.update(json.loads(row[6]))
+            result.append(event)
+        return result
+    
+    def count(self, chat_id: Optional[int] = None, user_id: Optional[int] = None, action: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None) -> int:
+        where, params = self._where(chat_id, user_id, action, since, until)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM events{where}", params).fetchone()[0]
+    
+    def resolve_username(self, username: str) -> Optional[int]:
+        """user_id по последнему событию с этим @username"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT user_id FROM events WHERE username = ? ORDER BY id DESC LIMIT 1",
+                (username.lstrip("@").lower(),)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+
+class EventLog:
+    """Журнал действий модерации в формате JSONL.
+
+    log() только кладёт событие в очередь; фоновый поток пишет строки
+    в открытый буферизованный файл пачками и передаёт те же пачки в
+    индекс. Файл ротируется по размеру или возрасту, старые сегменты
+    сжимаются gzip в отдельном потоке.
+    """
+    
+    def __init__(self, path: str, index: Optional[EventIndex] = None, max_bytes: int = EVENT_LOG_MAX_BYTES,
+                 rotate_seconds: float = EVENT_LOG_ROTATE_SECONDS, queue_size: int = EVENT_LOG_QUEUE_SIZE):
+        self.path = path
+        self.index = index
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._size = 0
+        self._opened_at = 0.0
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def log(self, action: str, chat_id: int, user_id: Optional[int] = None, by: Optional[int] = None, **fields) -> None:
+        event = {"ts": round(time.time(), 3), "action": action, "chat_id": chat_id, "user_id": user_id}
+        if by is not None:
+            event["by"] = by
+        event.update(fields)
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+    
+    def segments(self, compressed: bool = True) -> List[str]:
+        """Архивные сегменты от старых к новым"""
+        base = os.path.splitext(self.path)[0]
+        pattern = f"{base}-*.jsonl.gz" if compressed else f"{base}-*.jsonl"
+        return sorted(glob.glob(pattern), key=os.path.getmtime)
+    
+    def _open(self) -> None:
+        self._file = open(self.path, "a", encoding="utf-8", buffering=64 * 1024)
+        self._size = self._file.tell()
+        self._opened_at = time.time()
+    
+    def _run(self) -> None:
+        if self.index:
+            # Догоняем индекс до журнала (после сбоя или удаления events.db),
+            # пока сжатие не начало переименовывать сегменты
+            stale = self.segments(compressed=False)
+            added = self.index.catch_up(self.segments() + stale + [self.path])
+            if added:
+                print(f"📇 В индекс журнала добавлено событий: {added}")
+        # Сегменты, не сжатые до прошлого завершения
+        for segment in self.segments(compressed=False):
+            self._compress_async(segment)
+        
+        self._open()
+        running = True
+        while running:
+            try:
+                event = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                if self._size and time.time() - self._opened_at >= self.rotate_seconds:
+                    self._rotate()
+                continue
+            
+            batch = []
+            while event is not None:
+                batch.append(event)
+                if len(batch) >= EVENT_LOG_BATCH:
+                    break
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            running = event is not None
+            
+            try:
+                data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in batch)
+                self._file.write(data)
+                self._file.flush()
+                self._size += len(data.encode("utf-8"))
+                if self.index and batch:
+                    self.index.add_many(batch)
+                if self._size >= self.max_bytes or time.time() - self._opened_at >= self.rotate_seconds:
+                    self._rotate()
+            except Exception as e:
+                print(f"⚠️ Ошибка записи журнала: {e}")
+        self._file.close()
+    
+    def _rotate(self) -> None:
+        self._file.close()
+        base = os.path.splitext(self.path)[0]
+        segment = f"{base}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl"
+        n = 1
+        while os.path.exists(segment) or os.path.exists(segment + ".gz"):
+            segment = f"{base}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{n}.jsonl"
+            n += 1
+        os.replace(self.path, segment)
+        self._open()
+        self._compress_async(segment)
+    
+    @staticmethod
+    def _compress(segment: str) -> None:
+        try:
+            with open(segment, "rb") as src, gzip.open(segment + ".gz.tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(segment + ".gz.tmp", segment + ".gz")
+            os.remove(segment)
+        except Exception as e:
+            print(f"⚠️ Ошибка сжатия {segment}: {e}")
+    
+    def _compress_async(self, segment: str) -> None:
+        threading.Thread(target=self._compress, args=(segment,), name="event-log-gzip", daemon=True).start()
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "segments": len(self.segments()),
+        }
+    
+    def close(self) -> None:
+        """Дописывает очередь и закрывает файл"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+
+os.makedirs(LOG_DIR, exist_ok=True)
+event_index = EventIndex(EVENT_INDEX_PATH)
+events = EventLog(EVENT_LOG_PATH, event_index)
+
+# ================================
+# Утилиты
+# ================================
+_delete_pool = ThreadPoolExecutor(max_workers=DELETE_FALLBACK_WORKERS, thread_name_prefix="delete")
+
+def try_delete_message(chat_id: int, message_id: int) -> bool:
+    try:
+        bot.delete_message(chat_id, message_id)
+        return True
+    except Exception:
+        return False
+
+def delete_later(chat_id: int, message_id: int, delay: float) -> None:
+    """Удаляет сообщение по таймеру, не блокируя обработчик"""
+    timer = threading.Timer(delay, try_delete_message, args=(chat_id, message_id))
+    timer.daemon = True
+    timer.start()
+
+def iter_id_chunks(last_id: int, count: int, size: int = CLEAR_CHUNK_SIZE) -> Iterable[List[int]]:
+    """id от last_id вниз (count + 1 штук), пачками по size"""
+    first = max(1, last_id - count)
+    for end in range(last_id, first - 1, -size):
+        yield list(range(max(first, end - size + 1), end + 1))
+
+def delete_messages_bulk(chat_id: int, message_ids: List[int]) -> int:
+    """
+    Удаляет до 100 сообщений одним вызовом deleteMessages.
+    Если метод недоступен или вернул ошибку — параллельные одиночные удаления.
+    """
+    try:
+        bot.delete_messages(chat_id, message_ids)
+        return len(message_ids)
+    except Exception:
+        pass
+    return sum(_delete_pool.map(lambda message_id: try_delete_message(chat_id, message_id), message_ids))
+
+def censor_word(word: str) -> str:
+    length = len(word)
+    if length <= 1:
+        return "*"
+    if length == 2:
+        return word[0] + "*"
+    return word[0] + "*" * (length - 2) + word[-1]
+
+def is_chat_admin(chat_id: int, user_id: int) -> bool:
+    """Проверяет, является ли пользователь админом ЧАТА"""
+    return member_cache.get_status(chat_id, user_id) in ChatMemberCache.ADMIN_STATUSES
+
+def is_creator(chat_id: int, user_id: int) -> bool:
+    return member_cache.get_status(chat_id, user_id) == "creator"
+
+def is_private(message) -> bool:
+    return message.chat.type == "private"
+
+def is_group(message) -> bool:
+    return message.chat.type in ("group", "supergroup")
+
+def get_user_display(user) -> str:
+    if user.username:
+        return f"@{user.username}"
+    return user.first_name or f"ID:{user.id}"
+
+def get_user_link(user) -> str:
+    name = user.first_name or f"ID:{user.id}"
+    return f'<a href="tg://user?id={user.id}">{name}</a>'
+
+def parse_duration(text: str) -> Optional[int]:
+    match = re.match(r'^(\d+)([mhdw])$', text.lower())
+    if not match:
+        return None
+    value = int(match.group(1))
+    unit = match.group(2)
+    multipliers = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    return value * multipliers.get(unit, 60)
+
+def format_duration(seconds: int) -> str:
+    if seconds < 60:
+        return f"{seconds} сек"
+    if seconds < 3600:
+        return f"{seconds // 60} мин"
+    if seconds < 86400:
+        return f"{seconds // 3600} ч"
+    return f"{seconds // 86400} дн"
+
+def extract_user_from_message(message) -> tuple:
+    """Извлекает пользователя из reply или аргументов команды"""
+    # Из reply
+    if message.reply_to_message and message.reply_to_message.from_user:
+        parts = message.text.split(maxsplit=2) if message.text else []
+        reason = parts[1] if len(parts) > 1 else None
+        return message.reply_to_message.from_user, reason
+    
+    parts = message.text.split(maxsplit=2) if message.text else []
+    if len(parts) < 2:
+        return None, None
+    
+    user_arg = parts[1]
+    reason = parts[2] if len(parts) > 2 else None
+    
+    # По ID
+    if user_arg.isdigit():
+        try:
+            member = bot.get_chat_member(message.chat.id, int(user_arg))
+            return member.user, reason
+        except Exception:
+            pass
+    
+    # По @username - убираем @ если есть
+    if user_arg.startswith("@"):
+        user_arg = user_arg[1:]
+    
+    # Пытаемся найти через entities
+    if message.entities:
+        for entity in message.entities:
+            if entity.type == "mention":
+                mention_text = message.text[entity.offset:entity.offset + entity.length]
+                if mention_text.startswith("@"):
+                    mention_text = mention_text[1:]
+                # К сожалению, Telegram API не позволяет получить user_id по username напрямую
+                # Возвращаем None, пользователь должен использовать reply или ID
+                pass
+            elif entity.type == "text_mention" and entity.user:
+                return entity.user, reason
+    
+    return None, reason
+
+# ================================
+# ИСПРАВЛЕНИЕ: Функция для создания ChatPermissions
+# ================================
+def get_mute_permissions() -> types.ChatPermissions:
+    """Создает объект ChatPermissions для мута (совместимо с разными версиями API)"""
+    try:
+        # Новая версия API (Bot API 6.3+)
+        return types.ChatPermissions(
+            can_send_messages=False,
+            can_send_audios=False,
+            can_send_documents=False,
+            can_send_photos=False,
+            can_send_videos=False,
+            can_send_video_notes=False,
+            can_send_voice_notes=False,
+            can_send_polls=False,
+            can_send_other_messages=False,
+            can_add_web_page_previews=False,
+            can_change_info=False,
+            can_invite_users=False,
+            can_pin_messages=False,
+            can_manage_topics=False
+        )
+    except TypeError:
+        # Старая версия API
+        return types.ChatPermissions(
+            can_send_messages=False,
+            can_send_media_messages=False,
+            can_send_other_messages=False,
+            can_add_web_page_previews=False
+        )
+
+def get_unmute_permissions() -> types.ChatPermissions:
+    """Создает объект ChatPermissions для размута (совместимо с разными версиями API)"""
+    try:
+        # Новая версия API (Bot API 6.3+)
+        return types.ChatPermissions(
+            can_send_messages=True,
+            can_send_audios=True,
+            can_send_documents=True,
+            can_send_photos=True,
+            can_send_videos=True,
+            can_send_video_notes=True,
+            can_send_voice_notes=True,
+            can_send_polls=True,
+            can_send_other_messages=True,
+            can_add_web_page_previews=True,
+            can_change_info=False,
+            can_invite_users=True,
+            can_pin_messages=False,
+            can_manage_topics=False
+        )
+    except TypeError:
+        # Старая версия API
+        return types.ChatPermissions(
+            can_send_messages=True,
+            can_send_media_messages=True,
+            can_send_other_messages=True,
+            can_add_web_page_previews=True
+        )
+
+# ================================
+# Декораторы
+# ================================
+def bot_admin_only(func):
+    """Только для глобальных администраторов бота"""
+    @wraps(func)
+    def wrapper(message, *args, **kwargs):
+        user_id = message.from_user.id
+        
+        if bot_admins.is_admin(user_id):
+            return func(message, *args, **kwargs)
+        
+        # Анонимный админ — проверяем, может он в списке по-другому
+        # Но для bot_admin_only нужен реальный ID, так что отказываем
+        if user_id == ANONYMOUS_ADMIN_ID:
+            bot.reply_to(message, "⛔ Отключите анонимность для использования этой команды")
+            return
+        
+        bot.reply_to(message, "⛔ Только для администраторов бота")
+    return wrapper
+
+def admin_only(func):
+    """Для админов чата ИЛИ глобальных админов бота"""
+    @wraps(func)
+    def wrapper(message, *args, **kwargs):
+        user_id = message.from_user.id
+        
+        # Глобальный админ бота
+        if bot_admins.is_admin(user_id):
+            return func(message, *args, **kwargs)
+        
+        # Анонимный админ группы — он точно админ чата
+        if user_id == ANONYMOUS_ADMIN_ID:
+            return func(message, *args, **kwargs)
+        
+        # В личке разрешаем только глобальным админам
+        if is_private(message):
+            bot.reply_to(message, "⛔ Нет доступа")
+            return
+        
+        # Админ чата
+        if is_chat_admin(message.chat.id, user_id):
+            return func(message, *args, **kwargs)
+        
+        bot.reply_to(message, "⛔ Только для админов")
+    return wrapper
+
+def creator_only(func):
+    """Только для создателя чата или глобального админа бота"""
+    @wraps(func)
+    def wrapper(message, *args, **kwargs):
+        user_id = message.from_user.id
+        
+        if bot_admins.is_admin(user_id):
+            return func(message, *args, **kwargs)
+        
+        # Анонимный — не можем проверить, создатель ли он
+        if user_id == ANONYMOUS_ADMIN_ID:
+            bot.reply_to(message, "⛔ Отключите анонимность для этой команды")
+            return
+        
+        if is_private(message):
+            bot.reply_to(message, "⛔ Только в группах")
+            return
+        
+        if is_creator(message.chat.id, user_id):
+            return func(message, *args, **kwargs)
+        
+        bot.reply_to(message, "⛔ Только для создателя чата")
+    return wrapper
+
+def group_only(func):
+    @wraps(func)
+    def wrapper(message, *args, **kwargs):
+        if is_group(message):
+            return func(message, *args, **kwargs)
+        bot.reply_to(message, "⛔ Эта команда работает только в группах")
+    return wrapper
+
+# ================================
+# Клавиатуры
+# ================================
+def get_main_keyboard() -> types.InlineKeyboardMarkup:
+    keyboard = types.InlineKeyboardMarkup(row_width=2)
+    keyboard.add(
+        types.InlineKeyboardButton("➕ Добавить слово", callback_data="help_add"),
+        types.InlineKeyboardButton("➖ Удалить слово", callback_data="help_del"),
+        types.InlineKeyboardButton("📄 Список слов", callback_data="list_words"),
+        types.InlineKeyboardButton("📊 Статистика", callback_data="show_stats"),
+        types.InlineKeyboardButton("⚙️ Настройки", callback_data="show_settings"),
+        types.InlineKeyboardButton("❓ Все команды", callback_data="all_commands")
+    )
+    return keyboard
+
+TRIGGER_MODE_LABELS = {"substring": "часть слова", "words": "слово целиком"}
+
+def get_settings_keyboard(chat_id: int) -> types.InlineKeyboardMarkup:
+    keyboard = types.InlineKeyboardMarkup(row_width=1)
+    
+    antispam_status = "✅" if settings.get(chat_id, "antispam_enabled") else "❌"
+    antilink_status = "✅" if settings.get(chat_id, "antilink_enabled") else "❌"
+    welcome_status = "✅" if settings.get(chat_id, "welcome_enabled") else "❌"
+    trigger_mode = TRIGGER_MODE_LABELS.get(settings.get(chat_id, "trigger_mode"), "?")
+    
+    keyboard.add(
+        types.InlineKeyboardButton(f"🔄 Анти-спам: {antispam_status}", callback_data="toggle_antispam"),
+        types.InlineKeyboardButton(f"🔗 Анти-ссылки: {antilink_status}", callback_data="toggle_antilink"),
+        types.InlineKeyboardButton(f"👋 Приветствия: {welcome_status}", callback_data="toggle_welcome"),
+        types.InlineKeyboardButton(f"🔤 Триггеры: {trigger_mode}", callback_data="toggle_trigger_mode"),
+        types.InlineKeyboardButton("🔙 Назад", callback_data="back_main")
+    )
+    return keyboard
+
+# ================================
+# Команды администратора бота
+# ================================
+@bot.message_handler(commands=["myid"])
+def cmd_myid(message):
+    """Получить свой Telegram ID"""
+    bot.reply_to(
+        message, 
+        f"🆔 Твой ID: `{message.from_user.id}`\n"
+        f"💬 ID чата: `{message.chat.id}`",
+        parse_mode="Markdown"
+    )
+
+@bot.message_handler(commands=["addowner"])
+def cmd_add_owner(message):
+    """
+    Секретная команда для первичной регистрации владельца.
+    Использование: /addowner <секретный_код>
+    
+    ⚠️ ВАЖНО: Измените SECRET_CODE перед использованием!
+    После добавления первого админа можно удалить эту команду.
+    """
+    SECRET_CODE = "SecretCode"  # ⚠️ ИЗМЕНИТЕ ЭТО!
+    
+    parts = message.text.split() if message.text else []
+    if len(parts) < 2:
+        return  # Молча игнорируем неполную команду
+    
+    if parts[1] != SECRET_CODE:
+        return  # Молча игнорируем неверный код
+    
+    user_id = message.from_user.id
+    
+    if bot_admins.add(user_id):
+        bot.reply_to(
+            message, 
+            f"✅ Вы добавлены как администратор бота!\n"
+            f"🆔 Ваш ID: `{user_id}`\n\n"
+            f"⚠️ Рекомендуется удалить команду /addowner из кода.",
+            parse_mode="Markdown"
+        )
+    else:
+        bot.reply_to(message, "ℹ️ Вы уже являетесь администратором бота")
+
+@bot.message_handler(commands=["addadmin"])
+@bot_admin_only
+def cmd_add_bot_admin(message):
+    """Добавить глобального администратора бота"""
+    parts = message.text.split() if message.text else []
+    if len(parts) < 2:
+        bot.reply_to(
+            message, 
+            "📝 Использование: `/addadmin <user_id>`\n\n"
+            "Узнать ID: пусть пользователь напишет боту /myid",
+            parse_mode="Markdown"
+        )
+        return
+    
+    try:
+        user_id = int(parts[1])
+        if bot_admins.add(user_id):
+            bot.reply_to(message, f"✅ Пользователь `{user_id}` добавлен как администратор бота", parse_mode="Markdown")
+        else:
+            bot.reply_to(message, "⚠️ Этот пользователь уже является администратором")
+    except ValueError:
+        bot.reply_to(message, "⚠️ Укажите числовой ID пользователя")
+
+@bot.message_handler(commands=["removeadmin"])
+@bot_admin_only
+def cmd_remove_bot_admin(message):
+    """Удалить глобального администратора бота"""
+    parts = message.text.split() if message.text else []
+    if len(parts) < 2:
+        bot.reply_to(message, "📝 Использование: `/removeadmin <user_id>`", parse_mode="Markdown")
+        return
+    
+    try:
+        user_id = int(parts[1])
+        
+        if user_id == message.from_user.id:
+            bot.reply_to(message, "⚠️ Нельзя удалить самого себя")
+            return
+        
+        if bot_admins.remove(user_id):
+            bot.reply_to(message, f"✅ Пользователь `{user_id}` удален из администраторов бота", parse_mode="Markdown")
+        else:
+            bot.reply_to(message, "⚠️ Этот пользователь не является администратором")
+    except ValueError:
+        bot.reply_to(message, "⚠️ Укажите числовой ID пользователя")
+
+@bot.message_handler(commands=["listadmins"])
+@bot_admin_only
+def cmd_list_bot_admins(message):
+    """Список глобальных администраторов бота"""
+    admins = bot_admins.get_all()
+    
+    if not admins:
+        bot.reply_to(message, "📭 Список администраторов бота пуст")
+        return
+    
+    text = "👑 *Администраторы бота:*\n\n"
+    for i, admin_id in enumerate(admins, 1):
+        marker = " (вы)" if admin_id == message.from_user.id else ""
+        text += f"{i}. `{admin_id}`{marker}\n"
+    
+    bot.reply_to(message, text, parse_mode="Markdown")
+
+@bot.message_handler(commands=["botstats"])
+@bot_admin_only
+def cmd_botstats(message):
+    """Внутренние метрики бота"""
+    cache = member_cache.get_stats()
+    
+    text = (
+        f"🛠 *Метрики бота*\n\n"
+        f"*Кэш участников:*\n"
+        f"├ Попаданий: {cache['hits']}\n"
+        f"├ Промахов: {cache['misses']}\n"
+        f"├ Запросов к API: {cache['api_calls']}\n"
+        f"├ Чатов в кэше: {cache['chats']}\n"
+        f"└ Участников в кэше: {cache['members']}\n\n"
+        f"*Анти-спам:*\n"
+        f"├ Отслеживаемых пользователей: {antispam.count()}\n"
+        f"└ Память: ~{antispam.memory_estimate() // 1024} КБ\n\n"
+        f"*Шарды обработки* (очередь / макс. / обработано / блокировок / ожидание):\n"
+    )
+    for shard in dispatcher.get_stats():
+        text += (
+            f"`{shard['shard']}`: {shard['depth']} / {shard['max_depth']} / "
+            f"{shard['processed']} / {shard['blocked']} / {shard['avg_wait'] * 1000:.0f} мс\n"
+        )
+    
+    api = governor.get_stats()
+    text += (
+        f"\n*Исходящие запросы:*\n"
+        f"├ В очереди: {api['queued']} (действий {api['queued_actions']}, уведомлений {api['queued_notices']})\n"
+        f"├ Выполнено: {api['executed']}, ошибок: {api['errors']}\n"
+        f"├ Отложено лимитами: {api['throttled']}\n"
+        f"├ Повторов после 429: {api['retries_429']}\n"
+        f"└ Чатов на паузе: {api['paused_chats']}\n"
+    )
+    
+    summary = notices.get_stats()
+    text += (
+        f"\n*Уведомления:*\n"
+        f"├ Отправлено: {summary['sent']}\n"
+        f"├ Свёрнуто в сводки: {summary['suppressed']}\n"
+        f"└ Открытых окон: {summary['open_windows']}\n\n"
+        f"🚨 Чатов в режиме защиты от рейда: {raids.active_count()}\n"
+    )
+    
+    journal = events.get_stats()
+    text += (
+        f"\n*Журнал событий:*\n"
+        f"├ В очереди: {journal['queued']}\n"
+        f"├ Потеряно: {journal['dropped']}\n"
+        f"└ Архивных сегментов: {journal['segments']}\n"
+    )
+    
+    if webhook_server:
+        hook = webhook_server.get_stats()
+        text += (
+            f"\n*Webhook:*\n"
+            f"├ Принято: {hook['accepted']}\n"
+            f"├ В очереди: {hook['queued']}\n"
+            f"├ Отклонено: {hook['rejected']}\n"
+            f"├ Переполнений: {hook['overflow']}\n"
+            f"└ Ошибок разбора: {hook['errors']}"
+        )
+    
+    bot.reply_to(message, text, parse_mode="Markdown")
+
+# ================================
+# Команды /start и /help
+# ================================
+@bot.message_handler(commands=["start", "help"])
+def cmd_help(message):
+    is_bot_admin = bot_admins.is_admin(message.from_user.id)
+    
+    text = (
+        "🤖 *Бот модерации*\n\n"
+        "📋 *Основные команды:*\n"
+        "• `/addword <слово>` — добавить триггер\n"
+        "• `/delword <слово>` — удалить триггер\n"
+        "• `/listwords` — список триггеров\n\n"
+        "👮 *Модерация:*\n"
+        "• `/warn` — предупреждение\n"
+        "• `/mute` — мут пользователя\n"
+        "• `/ban` — бан пользователя\n"
+        "• `/kick` — кик пользователя\n\n"
+        "📊 `/stats` — статистика\n"
+        "⚙️ `/settings` — настройки\n"
+        "🆔 `/myid` — узнать свой ID\n"
+        "❓ `/commands` — все команды"
+    )
+    
+    if is_bot_admin:
+        text += (
+            "\n\n👑 *Команды владельца:*\n"
+            "• `/addadmin` — добавить админа бота\n"
+            "• `/removeadmin` — удалить админа бота\n"
+            "• `/listadmins` — список админов бота\n"
+            "• `/botstats` — метрики бота"
+        )
+    
+    bot.send_message(
+        message.chat.id,
+        text,
+        parse_mode="Markdown",
+        reply_markup=get_main_keyboard()
+    )
+
+# ================================
+# Все команды
+# ================================
+@bot.message_handler(commands=["commands"])
+def cmd_all_commands(message):
+    is_bot_admin = bot_admins.is_admin(message.from_user.id)
+    
+    text = """
+📋 *Полный список команд:*
+
+*Триггер-слова:*
+• `/addword [chat] <слово>` — добавить
+• `/addwords [chat] <слова>` — добавить несколько
+• `/delword [chat] <слово>` — удалить
+• `/listwords` — показать список
+• `/clearwords [chat]` — очистить все
+_chat — список только этого чата, без него — общий_
+
+*Модерация пользователей:*
+• `/warn [user] [причина]` — предупреждение
+• `/unwarn [user]` — снять предупреждение
+• `/warns [user]` — список предупреждений
+• `/clearwarns [user]` — очистить предупреждения
+• `/mute [user] [время]` — мут (1h, 30m, 1d)
+• `/unmute [user]` — размут
+• `/ban [user] [причина]` — бан
+• `/unban [user_id]` — разбан
+• `/kick [user]` — кик
+
+*Информация:*
+• `/userinfo [user]` — инфо о пользователе
+• `/chatinfo` — инфо о чате
+• `/stats [24h|7d]` — статистика модерации
+• `/history [user] [24h]` — журнал действий модерации
+• `/myid` — ваш Telegram ID
+
+*Утилиты:*
+• `/clear <N>` — удалить N сообщений
+• `/pin` — закрепить сообщение
+• `/unpin` — открепить сообщение
+
+*Настройки:*
+• `/settings` — настройки чата
+• `/setwelcome <текст>` — текст приветствия
+• `/setmaxwarns <N>` — макс. предупреждений
+• `/allowdomain <домен>` — разрешить ссылки на домен
+• `/deldomain <домен>` — убрать домен из разрешённых
+• `/domains` — разрешённые домены
+• `/raid [on|off|auto]` — защита от рейдов
+"""
+    
+    if is_bot_admin:
+        text += """
+*👑 Команды владельца бота:*
+• `/addadmin <user_id>` — добавить админа
+• `/removeadmin <user_id>` — удалить админа
+• `/listadmins` — список админов
+• `/botstats` — метрики бота
+"""
+    
+    text += "\n_Используйте reply или укажите @username/ID_"
+    
+    bot.send_message(message.chat.id, text, parse_mode="Markdown")
+
+# ================================
+# Callback обработчик
+# ================================
+@bot.callback_query_handler(func=lambda call: True)
+def callback_handler(call):
+    chat_id = call.message.chat.id
+    user_id = call.from_user.id
+    
+    # Проверка прав: админ бота ИЛИ админ чата
+    has_access = bot_admins.is_admin(user_id)
+    if not has_access and not is_private(call.message):
+        has_access = is_chat_admin(chat_id, user_id)
+    
+    if not has_access:
+        bot.answer_callback_query(call.id, "⛔ Нет доступа", show_alert=True)
+        return
+    
+    try:
+        if call.data == "help_add":
+            bot.answer_callback_query(call.id)
+            bot.send_message(chat_id, "📝 Используй: `/addword <слово>`", parse_mode="Markdown")
+        
+        elif call.data == "help_del":
+            bot.answer_callback_query(call.id)
+            bot.send_message(chat_id, "📝 Используй: `/delword <слово>`", parse_mode="Markdown")
+        
+        elif call.data == "list_words":
+            bot.answer_callback_query(call.id)
+            user_states.start_confirmation(user_id)
+            bot.send_message(
+                chat_id,
+                f"⚠️ *Подтверждение*\n\nСлов: {triggers.count()}\nПодтвердите 3 раза: /confirm",
+                parse_mode="Markdown"
+            )
+        
+        elif call.data == "show_stats":
+            bot.answer_callback_query(call.id)
+            if is_group(call.message):
+                send_stats(chat_id)
+            else:
+                bot.send_message(chat_id, "📊 Статистика доступна только в группах")
+        
+        elif call.data == "show_settings":
+            bot.answer_callback_query(call.id)
+            if is_group(call.message):
+                bot.send_message(
+                    chat_id,
+                    "⚙️ *Настройки чата:*",
+                    parse_mode="Markdown",
+                    reply_markup=get_settings_keyboard(chat_id)
+                )
+            else:
+                bot.send_message(chat_id, "⚙️ Настройки доступны только в группах")
+        
+        elif call.data == "toggle_antispam":
+            current = settings.get(chat_id, "antispam_enabled")
+            settings.set(chat_id, "antispam_enabled", not current)
+            status = 'включен' if not current else 'выключен'
+            bot.answer_callback_query(call.id, f"Анти-спам {status}")
+            bot.edit_message_reply_markup(
+                chat_id, call.message.message_id,
+                reply_markup=get_settings_keyboard(chat_id)
+            )
+        
+        elif call.data == "toggle_antilink":
+            current = settings.get(chat_id, "antilink_enabled")
+            settings.set(chat_id, "antilink_enabled", not current)
+            status = 'включен' if not current else 'выключен'
+            bot.answer_callback_query(call.id, f"Анти-ссылки {status}")
+            bot.edit_message_reply_markup(
+                chat_id, call.message.message_id,
+                reply_markup=get_settings_keyboard(chat_id)
+            )
+        
+        elif call.data == "toggle_welcome":
+            current = settings.get(chat_id, "welcome_enabled")
+            settings.set(chat_id, "welcome_enabled", not current)
+            status = 'включены' if not current else 'выключены'
+            bot.answer_callback_query(call.id, f"Приветствия {status}")
+            bot.edit_message_reply_markup(
+                chat_id, call.message.message_id,
+                reply_markup=get_settings_keyboard(chat_id)
+            )
+        
+        elif call.data == "toggle_trigger_mode":
+            mode = "substring" if settings.get(chat_id, "trigger_mode") == "words" else "words"
+            settings.set(chat_id, "trigger_mode", mode)
+            bot.answer_callback_query(call.id, f"Триггеры: {TRIGGER_MODE_LABELS[mode]}")
+            bot.edit_message_reply_markup(
+                chat_id, call.message.message_id,
+                reply_markup=get_settings_keyboard(chat_id)
+            )
+        
+        elif call.data == "back_main":
+            bot.answer_callback_query(call.id)
+            bot.edit_message_text(
+                "🤖 Главное меню",
+                chat_id, call.message.message_id,
+                reply_markup=get_main_keyboard()
+            )
+        
+        elif call.data == "all_commands":
+            bot.answer_callback_query(call.id)
+            cmd_all_commands(call.message)
+            
+    except Exception as e:
+        print(f"❌ Callback error: {e}")
+        bot.answer_callback_query(call.id, "Ошибка обработки")
+
+# ================================
+# /confirm
+# ================================
+@bot.message_handler(commands=["confirm"])
+def cmd_confirm(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    
+    count = user_states.confirm(user_id)
+    
+    if count is None:
+        bot.reply_to(message, "❓ Сначала запросите список слов")
+        return
+    
+    if count < 3:
+        bot.reply_to(message, f"✅ Подтверждено {count}/3")
+        return
+    
+    words = triggers.get_all()
+    chat_words = triggers.get_all(chat_id) if is_group(message) else []
+    
+    if not words and not chat_words:
+        bot.send_message(chat_id, "📭 Список триггеров пуст")
+        user_states.clear(user_id)
+        return
+    
+    temp_file = os.path.join(BASE_DIR, f"triggers_{user_id}.txt")
+    
+    try:
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(words))
+            if chat_words:
+                f.write("\n\n# Список чата\n" + "\n".join(chat_words))
+        words = words + chat_words
+        
+        with open(temp_file, "rb") as f:
+            bot.send_document(chat_id, f, caption=f"📄 Триггер-слова ({len(words)} шт.)")
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        user_states.clear(user_id)
+
+# ================================
+# Команды триггер-слов
+# ================================
+def split_word_scope(message, rest: str) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Аргументы команды со словами: «chat ...» — список текущего чата,
+    иначе общий список. None вместо аргументов — ошибка уже отправлена.
+    """
+    head, _, tail = rest.strip().partition(" ")
+    if head.lower() != "chat":
+        return None, rest.strip()
+    if not is_group(message):
+        bot.reply_to(message, "⚠️ Список чата настраивается в группе")
+        return None, None
+    return message.chat.id, tail.strip()
+
+def scope_label(chat_id: Optional[int]) -> str:
+    return "списке чата" if chat_id is not None else "общем списке"
+
+@bot.message_handler(commands=["addword"])
+@admin_only
+def cmd_addword(message):
+    parts = message.text.split(maxsplit=1) if message.text else []
+    chat_id, word = split_word_scope(message, parts[1] if len(parts) > 1 else "")
+    if word is None:
+        return
+    if not word:
+        bot.reply_to(message, "📝 Использование: `/addword [chat] <слово>`", parse_mode="Markdown")
+        return
+    
+    if len(word) > 100:
+        bot.reply_to(message, "⚠️ Слово слишком длинное (макс. 100 символов)")
+        return
+    
+    if triggers.add(word, chat_id):
+        bot.reply_to(message, f"✅ Добавлено в {scope_label(chat_id)}: `{word.lower()}`", parse_mode="Markdown")
+    else:
+        bot.reply_to(message, f"⚠️ Это слово уже в {scope_label(chat_id)}")
+
+@bot.message_handler(commands=["addwords"])
+@admin_only
+def cmd_addwords(message):
+    parts = message.text.split(maxsplit=1) if message.text else []
+    chat_id, rest = split_word_scope(message, parts[1] if len(parts) > 1 else "")
+    if rest is None:
+        return
+    if not rest:
+        bot.reply_to(message, "📝 Использование: `/addwords [chat] слово1 слово2 слово3`", parse_mode="Markdown")
+        return
+    
+    added = triggers.add_many(rest.split(), chat_id)
+    bot.reply_to(message, f"✅ Добавлено слов в {scope_label(chat_id)}: {added}")
+
+@bot.message_handler(commands=["delword"])
+@admin_only
+def cmd_delword(message):
+    parts = message.text.split(maxsplit=1) if message.text else []
+    chat_id, word = split_word_scope(message, parts[1] if len(parts) > 1 else "")
+    if word is None:
+        return
+    if not word:
+        bot.reply_to(message, "📝 Использование: `/delword [chat] <слово>`", parse_mode="Markdown")
+        return
+    
+    if triggers.remove(word, chat_id):
+        bot.reply_to(message, f"✅ Удалено из {scope_label(chat_id)}: `{word.lower()}`", parse_mode="Markdown")
+    else:
+        bot.reply_to(message, f"⚠️ Слово не найдено в {scope_label(chat_id)}")
+
+@bot.message_handler(commands=["clearwords"])
+@creator_only
+def cmd_clearwords(message):
+    parts = message.text.split(maxsplit=1) if message.text else []
+    chat_id, rest = split_word_scope(message, parts[1] if len(parts) > 1 else "")
+    if rest is None:
+        return
+    count = triggers.clear(chat_id)
+    bot.reply_to(message, f"🗑️ Удалено триггер-слов из {scope_label(chat_id)}: {count}")
+
+@bot.message_handler(commands=["listwords"])
+@admin_only
+def cmd_listwords(message):
+    text = f"⚠️ В списке: {triggers.count()} слов"
+    if is_group(message):
+        text += f" (и {triggers.count(message.chat.id)} в списке чата)"
+    user_states.start_confirmation(message.from_user.id)
+    bot.send_message(message.chat.id, text + "\nПодтвердите 3 раза: /confirm")
+
+# ================================
+# Модерация: /warn, /unwarn, /warns
+# ================================
+# ИСПРАВЛЕНИЕ: Порядок декораторов - @group_only должен быть ближе к функции
+@bot.message_handler(commands=["warn"])
+@group_only
+@admin_only
+def cmd_warn(message):
+    user, reason = extract_user_from_message(message)
+    
+    if not user:
+        bot.reply_to(message, "📝 Ответьте на сообщение или: `/warn @user причина`", parse_mode="Markdown")
+        return
+    
+    if is_chat_admin(message.chat.id, user.id):
+        bot.reply_to(message, "⚠️ Нельзя выдать предупреждение админу чата")
+        return
+    
+    reason = reason or "Не указана"
+    count = warns.add_warn(message.chat.id, user.id, reason, message.from_user.id)
+    max_warns = settings.get(message.chat.id, "max_warns")
+    
+    stats.increment(message.chat.id, "warns_given")
+    events.log("warn", message.chat.id, user.id, by=message.from_user.id,
+               reason=reason, count=count, username=user.username)
+    
+    text = (
+        f"⚠️ *Предупреждение*\n\n"
+        f"👤 Пользователь: {get_user_display(user)}\n"
+        f"📛 Причина: {reason}\n"
+        f"📊 Предупреждений: {count}/{max_warns}"
+    )
+    
+    bot.send_message(message.chat.id, text, parse_mode="Markdown")
+    
+    if count >= max_warns:
+        try:
+            bot.ban_chat_member(message.chat.id, user.id)
+            bot.send_message(
+                message.chat.id,
+                f"🔨 {get_user_display(user)} забанен (достигнут лимит предупреждений)"
+            )
+            stats.increment(message.chat.id, "bans")
+            events.log("ban", message.chat.id, user.id, by=message.from_user.id,
+                       reason="max_warns", username=user.username)
+        except Exception as e:
+            bot.send_message(message.chat.id, f"❌ Ошибка бана: {e}")
+
+@bot.message_handler(commands=["unwarn"])
+@group_only
+@admin_only
+def cmd_unwarn(message):
+    user, _ = extract_user_from_message(message)
+    
+    if not user:
+        bot.reply_to(message, "📝 Ответьте на сообщение или: `/unwarn @user`", parse_mode="Markdown")
+        return
+    
+    if warns.remove_warn(message.chat.id, user.id):
+        count = warns.count_warns(message.chat.id, user.id)
+        events.log("unwarn", message.chat.id, user.id, by=message.from_user.id, count=count, username=user.username)
+        bot.reply_to(message, f"✅ Предупреждение снято. Осталось: {count}")
+    else:
+        bot.reply_to(message, "⚠️ У пользователя нет предупреждений")
+
+@bot.message_handler(commands=["warns"])
+@group_only
+@admin_only
+def cmd_warns(message):
+    user, _ = extract_user_from_message(message)
+    
+    if not user:
+        bot.reply_to(message, "📝 Ответьте на сообщение или: `/warns @user`", parse_mode="Markdown")
+        return
+    
+    user_warns = warns.get_warns(message.chat.id, user.id)
+    
+    if not user_warns:
+        bot.reply_to(message, f"✅ У {get_user_display(user)} нет предупреждений")
+        return
+    
+    text = f"📋 *Предупреждения {get_user_display(user)}:*\n\n"
+    for i, w in enumerate(user_warns, 1):
+        date = datetime.fromisoformat(w['date']).strftime("%d.%m.%Y")
+        text += f"{i}. {w['reason']} ({date})\n"
+    
+    bot.send_message(message.chat.id, text, parse_mode="Markdown")
+
+@bot.message_handler(commands=["clearwarns"])
+@group_only
+@admin_only
+def cmd_clearwarns(message):
+    user, _ = extract_user_from_message(message)
+    
+    if not user:
+        bot.reply_to(message, "📝 Ответьте на сообщение или: `/clearwarns @user`", parse_mode="Markdown")
+        return
+    
+    count = warns.clear_warns(message.chat.id, user.id)
+    if count:
+        events.log("clearwarns", message.chat.id, user.id, by=message.from_user.id, count=count, username=user.username)
+    bot.reply_to(message, f"✅ Снято предупреждений: {count}")
+
+# ================================
+# Модерация: /mute, /unmute
+# ================================
+@bot.message_handler(commands=["mute"])
+@group_only
+@admin_only
+def cmd_mute(message):
+    parts = message.text.split() if message.text else []
+    duration_str = None
+    user = None
+    
+    if message.reply_to_message and message.reply_to_message.from_user:
+        user = message.reply_to_message.from_user
+        if len(parts) > 1:
+            duration_str = parts[1]
+    else:
+        if len(parts) < 2:
+            bot.reply_to(
+                message, 
+                "📝 Ответьте на сообщение или: `/mute @user [время]`\n"
+                "Время: 1m, 1h, 1d, 1w",
+                parse_mode="Markdown"
+            )
+            return
+        user, _ = extract_user_from_message(message)
+        if len(parts) > 2:
+            duration_str = parts[2]
+    
+    if not user:
+        bot.reply_to(message, "❌ Пользователь не найден")
+        return
+    
+    if is_chat_admin(message.chat.id, user.id):
+        bot.reply_to(message, "⚠️ Нельзя замутить админа чата")
+        return
+    
+    if duration_str:
+        duration = parse_duration(duration_str)
+        if not duration:
+            bot.reply_to(message, "⚠️ Неверный формат времени. Примеры: 30m, 1h, 1d")
+            return
+        until_date = datetime.now() + timedelta(seconds=duration)
+        duration_text = format_duration(duration)
+    else:
+        duration = None
+        until_date = None
+        duration_text = "навсегда"
+    
+    try:
+        # ИСПРАВЛЕНИЕ: Используем функцию для совместимости с разными версиями API
+        bot.restrict_chat_member(
+            message.chat.id,
+            user.id,
+            until_date=until_date,
+            permissions=get_mute_permissions()
+        )
+        
+        bot.send_message(
+            message.chat.id,
+            f"🔇 {get_user_display(user)} замучен на {duration_text}"
+        )
+        stats.increment(message.chat.id, "mutes")
+        events.log("mute", message.chat.id, user.id, by=message.from_user.id,
+                   duration=duration, username=user.username)
+        
+    except Exception as e:
+        bot.reply_to(message, f"❌ Ошибка: {e}")
+
+@bot.message_handler(commands=["unmute"])
+@group_only
+@admin_only
+def cmd_unmute(message):
+    user, _ = extract_user_from_message(message)
+    
+    if not user:
+        bot.reply_to(message, "📝 Ответьте на сообщение или: `/unmute @user`", parse_mode="Markdown")
+        return
+    
+    try:
+        # ИСПРАВЛЕНИЕ: Используем функцию для совместимости с разными версиями API
+        bot.restrict_chat_member(
+            message.chat.id,
+            user.id,
+            permissions=get_unmute_permissions()
+        )
+        bot.reply_to(message, f"🔊 {get_user_display(user)} размучен")
+        events.log("unmute", message.chat.id, user.id, by=message.from_user.id, username=user.username)
+        
+    except Exception as e:
+        bot.reply_to(message, f"❌ Ошибка: {e}")
+
+# ================================
+# Модерация: /ban, /unban, /kick
+# ================================
+@bot.message_handler(commands=["ban"])
+@group_only
+@admin_only
+def cmd_ban(message):
+    user, reason = extract_user_from_message(message)
+    
+    if not user:
+        bot.reply_to(message, "📝 Ответьте на сообщение или: `/ban @user [причина]`", parse_mode="Markdown")
+        return
+    
+    if is_chat_admin(message.chat.id, user.id):
+        bot.reply_to(message, "⚠️ Нельзя забанить админа чата")
+        return
+    
+    try:
+        bot.ban_chat_member(message.chat.id, user.id)
+        
+        text = f"🔨 {get_user_display(user)} забанен"
+        if reason:
+            text += f"\n📛 Причина: {reason}"
+        
+        bot.send_message(message.chat.id, text)
+        stats.increment(message.chat.id, "bans")
+        events.log("ban", message.chat.id, user.id, by=message.from_user.id,
+                   reason=reason or None, username=user.username)
+        
+    except Exception as e:
+        bot.reply_to(message, f"❌ Ошибка: {e}")
+
+@bot.message_handler(commands=["unban"])
+@group_only
+@admin_only
+def cmd_unban(message):
+    parts = message.text.split() if message.text else []
+    if len(parts) < 2:
+        bot.reply_to(message, "📝 Использование: `/unban <user_id>`", parse_mode="Markdown")
+        return
+    
+    try:
+        user_id = int(parts[1])
+        bot.unban_chat_member(message.chat.id, user_id, only_if_banned=True)
+        bot.reply_to(message, f"✅ Пользователь `{user_id}` разбанен", parse_mode="Markdown")
+        events.log("unban", message.chat.id, user_id, by=message.from_user.id)
+        
+    except ValueError:
+        bot.reply_to(message, "⚠️ Укажите числовой ID пользователя")
+    except Exception as e:
+        bot.reply_to(message, f"❌ Ошибка: {e}")
+
+@bot.message_handler(commands=["kick"])
+@group_only
+@admin_only
+def cmd_kick(message):
+    user, _ = extract_user_from_message(message)
+    
+    if not user:
+        bot.reply_to(message, "📝 Ответьте на сообщение или: `/kick @user`", parse_mode="Markdown")
+        return
+    
+    if is_chat_admin(message.chat.id, user.id):
+        bot.reply_to(message, "⚠️ Нельзя кикнуть админа чата")
+        return
+    
+    try:
+        bot.ban_chat_member(message.chat.id, user.id)
+        bot.unban_chat_member(message.chat.id, user.id)
+        
+        bot.send_message(message.chat.id, f"👢 {get_user_display(user)} кикнут")
+        events.log("kick", message.chat.id, user.id, by=message.from_user.id, username=user.username)
+        stats.increment(message.chat.id, "kicks")
+        
+    except Exception as e:
+        bot.reply_to(message, f"❌ Ошибка: {e}")
+
+# ================================
+# Журнал: /history
+# ================================
+HISTORY_ICONS = {
+    "delete": "🗑", "warn": "⚠️", "unwarn": "↩️", "clearwarns": "🧹", "mute": "🔇", "unmute": "🔊",
+    "ban": "🔨", "unban": "✅", "kick": "👢", "raid": "🚨", "unraid": "🛡",
+}
+
+def format_event(event: Dict[str, Any], show_chat: bool) -> str:
+    line = f"{datetime.fromtimestamp(event['ts']).strftime('%d.%m %H:%M')} {HISTORY_ICONS.get(event['action'], '•')} {event['action']}"
+    if event.get("user_id") is not None:
+        line += f" {event['user_id']}"
+        if event.get("username"):
+            line += f" (@{event['username']})"
+    details = event.get("reason") or ""
+    if event.get("words"):
+        details = f"{details}: {', '.join(event['words'])}"
+    if event.get("duration"):
+        details = f"{details} {format_duration(event['duration'])}".strip()
+    if details:
+        line += f" — {details}"
+    if event.get("by"):
+        line += f" [от {event['by']}]"
+    if show_chat:
+        line += f" в {event['chat_id']}"
+    return line
+
+@bot.message_handler(commands=["history"])
+@admin_only
+def cmd_history(message):
+    """
+    /history [@user|ID|reply] [24h|7d|...] — действия модерации из журнала.
+    В группе — по текущему чату, в личке (админам бота) — по всем чатам.
+    """
+    parts = message.text.split()[1:] if message.text else []
+    chat_id = None if is_private(message) else message.chat.id
+    user_id = None
+    since = None
+    
+    if message.reply_to_message and message.reply_to_message.from_user:
+        user_id = message.reply_to_message.from_user.id
+    
+    for arg in parts:
+        duration = parse_duration(arg)
+        if duration:
+            since = time.time() - duration
+        elif arg.lstrip("-").isdigit():
+            user_id = int(arg)
+        elif arg.startswith("@"):
+            user_id = event_index.resolve_username(arg)
+            if user_id is None:
+                bot.reply_to(message, f"⚠️ {arg} не встречается в журнале")
+                return
+        else:
+            bot.reply_to(message, "📝 Использование: `/history [@user|ID] [24h|7d]`", parse_mode="Markdown")
+            return
+    
+    found = event_index.query(chat_id=chat_id, user_id=user_id, since=since, limit=HISTORY_LIMIT)
+    if not found:
+        bot.reply_to(message, "📭 В журнале ничего не найдено")
+        return
+    
+    total = event_index.count(chat_id=chat_id, user_id=user_id, since=since)
+    lines = [format_event(event, show_chat=chat_id is None) for event in found]
+    text = f"📜 Журнал ({len(found)} из {total}):\n\n" + "\n".join(lines)
+    bot.send_message(message.chat.id, text)
+
+# ================================
+# Информация
+# ================================
+@bot.message_handler(commands=["userinfo"])
+@group_only
+@admin_only
+def cmd_userinfo(message):
+    user, _ = extract_user_from_message(message)
+    
+    if not user:
+        user = message.from_user
+    
+    try:
+        member = bot.get_chat_member(message.chat.id, user.id)
+        
+        status_map = {
+            "creator": "👑 Создатель",
+            "administrator": "⭐ Админ",
+            "member": "👤 Участник",
+            "restricted": "🔇 Ограничен",
+            "left": "🚪 Покинул",
+            "kicked": "🚫 Забанен"
+        }
+        
+        user_warns_count = warns.count_warns(message.chat.id, user.id)
+        is_bot_admin_status = "✅" if bot_admins.is_admin(user.id) else "❌"
+        
+        text = (
+            f"👤 *Информация о пользователе*\n\n"
+            f"├ ID: `{user.id}`\n"
+            f"├ Имя: {user.first_name or 'N/A'}\n"
+            f"├ Фамилия: {user.last_name or 'N/A'}\n"
+            f"├ Username: @{user.username or 'N/A'}\n"
+            f"├ Статус в чате: {status_map.get(member.status, member.status)}\n"
+            f"├ Админ бота: {is_bot_admin_status}\n"
+            f"├ Бот: {'Да' if user.is_bot else 'Нет'}\n"
+            f"└ Предупреждений: {user_warns_count}"
+        )
+        
+        bot.send_message(message.chat.id, text, parse_mode="Markdown")
+        
+    except Exception as e:
+        bot.reply_to(message, f"❌ Ошибка: {e}")
+
+@bot.message_handler(commands=["chatinfo"])
+@group_only
+def cmd_chatinfo(message):
+    chat = message.chat
+    
+    try:
+        member_count = bot.get_chat_member_count(chat.id)
+        
+        text = (
+            f"💬 *Информация о чате*\n\n"
+            f"├ ID: `{chat.id}`\n"
+            f"├ Название: {chat.title}\n"
+            f"├ Тип: {chat.type}\n"
+            f"├ Username: @{chat.username or 'N/A'}\n"
+            f"└ Участников: {member_count}"
+        )
+        
+        bot.send_message(chat.id, text, parse_mode="Markdown")
+        
+    except Exception as e:
+        bot.reply_to(message, f"❌ Ошибка: {e}")
+
+# ================================
+# Статистика
+# ================================
+def send_stats(chat_id: int, window: Optional[int] = None):
+    if window:
+        chat_stats = stats.get_window(chat_id, window)
+        title = f"📊 *Статистика модерации за {format_duration(window)}*"
+    else:
+        chat_stats = stats.get_stats(chat_id)
+        title = "📊 *Статистика модерации*"
+    
+    text = (
+        f"{title}\n\n"
+        f"├ 🗑️ Удалено сообщений: {chat_stats.get('deleted_messages', 0)}\n"
+        f"├ ⚠️ Предупреждений: {chat_stats.get('warns_given', 0)}\n"
+        f"├ 🔇 Мутов: {chat_stats.get('mutes', 0)}\n"
+        f"├ 🔨 Банов: {chat_stats.get('bans', 0)}\n"
+        f"├ 👢 Киков: {chat_stats.get('kicks', 0)}\n"
+        f"├ 🔄 Заблокировано спама: {chat_stats.get('spam_blocked', 0)}\n"
+        f"└ 🔗 Заблокировано ссылок: {chat_stats.get('links_blocked', 0)}"
+    )
+    
+    bot.send_message(chat_id, text, parse_mode="Markdown")
+
+@bot.message_handler(commands=["stats"])
+@admin_only
+def cmd_stats(message):
+    if is_private(message):
+        bot.reply_to(message, "📊 Статистика доступна только в группах")
+        return
+    
+    parts = message.text.split() if message.text else []
+    window = None
+    if len(parts) > 1:
+        window = parse_duration(parts[1])
+        if not window or window > STATS_DAY_SLOTS * 86400:
+            bot.reply_to(
+                message,
+                f"📝 Использование: `/stats [24h|7d|30d]` (не больше {STATS_DAY_SLOTS}d)",
+                parse_mode="Markdown"
+            )
+            return
+    send_stats(message.chat.id, window)
+
+# ================================
+# Утилиты: /clear, /pin, /unpin
+# ================================
+@bot.message_handler(commands=["clear"])
+@group_only
+@admin_only
+def cmd_clear(message):
+    parts = message.text.split() if message.text else []
+    if len(parts) < 2:
+        bot.reply_to(message, "📝 Использование: `/clear <количество>`", parse_mode="Markdown")
+        return
+    
+    try:
+        count = int(parts[1])
+        if count < 1 or count > CLEAR_MAX_COUNT:
+            bot.reply_to(message, f"⚠️ Укажите число от 1 до {CLEAR_MAX_COUNT}")
+            return
+        
+        deleted = 0
+        for chunk in iter_id_chunks(message.message_id, count):
+            deleted += delete_messages_bulk(message.chat.id, chunk)
+        
+        msg = bot.send_message(message.chat.id, f"🗑️ Удалено сообщений: {deleted}")
+        delete_later(message.chat.id, msg.message_id, CLEAR_NOTICE_SECONDS)
+        
+    except ValueError:
+        bot.reply_to(message, "⚠️ Укажите число")
+    except Exception as e:
+        bot.reply_to(message, f"❌ Ошибка: {e}")
+
+@bot.message_handler(commands=["pin"])
+@group_only
+@admin_only
+def cmd_pin(message):
+    if not message.reply_to_message:
+        bot.reply_to(message, "📝 Ответьте на сообщение для закрепления")
+        return
+    
+    try:
+        bot.pin_chat_message(message.chat.id, message.reply_to_message.message_id)
+        bot.reply_to(message, "📌 Сообщение закреплено")
+    except Exception as e:
+        bot.reply_to(message, f"❌ Ошибка: {e}")
+
+@bot.message_handler(commands=["unpin"])
+@group_only
+@admin_only
+def cmd_unpin(message):
+    try:
+        bot.unpin_chat_message(message.chat.id)
+        bot.reply_to(message, "📌 Сообщение откреплено")
+    except Exception as e:
+        bot.reply_to(message, f"❌ Ошибка: {e}")
+
+# ================================
+# Настройки
+# ================================
+@bot.message_handler(commands=["settings"])
+@group_only
+@admin_only
+def cmd_settings(message):
+    chat_settings = settings.get_all(message.chat.id)
+    
+    text = (
+        f"⚙️ *Настройки чата*\n\n"
+        f"├ Макс. предупреждений: {chat_settings['max_warns']}\n"
+        f"├ Анти-спам: {'✅' if chat_settings['antispam_enabled'] else '❌'}\n"
+        f"├ Анти-ссылки: {'✅' if chat_settings['antilink_enabled'] else '❌'}\n"
+        f"├ Приветствия: {'✅' if chat_settings['welcome_enabled'] else '❌'}\n"
+        f"├ Прощания: {'✅' if chat_settings['goodbye_enabled'] else '❌'}\n"
+        f"└ Триггеры: {TRIGGER_MODE_LABELS.get(chat_settings['trigger_mode'], '?')}"
+    )
+    
+    bot.send_message(
+        message.chat.id, 
+        text,
+        parse_mode="Markdown",
+        reply_markup=get_settings_keyboard(message.chat.id)
+    )
+
+@bot.message_handler(commands=["setmaxwarns"])
+@group_only
+@admin_only
+def cmd_setmaxwarns(message):
+    parts = message.text.split() if message.text else []
+    if len(parts) < 2:
+        bot.reply_to(message, "📝 Использование: `/setmaxwarns <число>`", parse_mode="Markdown")
+        return
+    
+    try:
+        value = int(parts[1])
+        if value < 1 or value > 10:
+            bot.reply_to(message, "⚠️ Укажите число от 1 до 10")
+            return
+        
+        settings.set(message.chat.id, "max_warns", value)
+        bot.reply_to(message, f"✅ Максимум предупреждений: {value}")
+        
+    except ValueError:
+        bot.reply_to(message, "⚠️ Укажите число")
+
+@bot.message_handler(commands=["setwelcome"])
+@group_only
+@admin_only
+def cmd_setwelcome(message):
+    parts = message.text.split(maxsplit=1) if message.text else []
+    if len(parts) < 2:
+        bot.reply_to(
+            message,
+            "📝 Использование: `/setwelcome <текст>`\n\n"
+            "Переменные:\n"
+            "• `{user}` — имя пользователя\n"
+            "• `{chat}` — название чата",
+            parse_mode="Markdown"
+        )
+        return
+    
+    settings.set(message.chat.id, "welcome_message", parts[1])
+    settings.set(message.chat.id, "welcome_enabled", True)
+    bot.reply_to(message, "✅ Приветствие обновлено и включено")
+
+@bot.message_handler(commands=["raid"])
+@group_only
+@admin_only
+def cmd_raid(message):
+    chat_id = message.chat.id
+    parts = message.text.split() if message.text else []
+    arg = parts[1].lower() if len(parts) > 1 else ""
+    
+    if arg == "on":
+        if raids.start(chat_id):
+            start_raid_mode(chat_id)
+        else:
+            bot.reply_to(message, "ℹ️ Режим защиты уже включён")
+        return
+    
+    if arg == "off":
+        if raids.stop(chat_id):
+            events.log("unraid", chat_id, by=message.from_user.id)
+            bot.reply_to(message, "✅ Режим защиты от рейда снят")
+        else:
+            bot.reply_to(message, "ℹ️ Режим защиты не включён")
+        return
+    
+    if arg == "auto":
+        enabled = not settings.get(chat_id, "raid_protection")
+        settings.set(chat_id, "raid_protection", enabled)
+        bot.reply_to(message, f"🛡 Автоопределение рейдов {'включено' if enabled else 'выключено'}")
+        return
+    
+    left = raids.remaining(chat_id)
+    status = f"🚨 активен, осталось {format_duration(left)}" if left else "не активен"
+    bot.reply_to(
+        message,
+        f"🛡 Режим защиты: {status}\n"
+        f"Автоопределение: {'✅' if settings.get(chat_id, 'raid_protection') else '❌'}\n"
+        f"Пороги: {RAID_JOIN_LIMIT} входов за {RAID_JOIN_WINDOW} сек "
+        f"или {RAID_MESSAGE_LIMIT} сообщений за {RAID_MESSAGE_WINDOW} сек\n\n"
+        f"/raid on | off | auto"
+    )
+
+@bot.message_handler(commands=["allowdomain"])
+@group_only
+@admin_only
+def cmd_allowdomain(message):
+    parts = message.text.split(maxsplit=1) if message.text else []
+    if len(parts) < 2:
+        bot.reply_to(message, "📝 Использование: `/allowdomain <домен>`", parse_mode="Markdown")
+        return
+    
+    if link_detector.allow(message.chat.id, parts[1]):
+        bot.reply_to(message, f"✅ Домен разрешён: {LinkDetector.extract_domain(parts[1])}")
+    else:
+        bot.reply_to(message, "⚠️ Домен уже в списке или указан неверно")
+
+@bot.message_handler(commands=["deldomain"])
+@group_only
+@admin_only
+def cmd_deldomain(message):
+    parts = message.text.split(maxsplit=1) if message.text else []
+    if len(parts) < 2:
+        bot.reply_to(message, "📝 Использование: `/deldomain <домен>`", parse_mode="Markdown")
+        return
+    
+    if link_detector.disallow(message.chat.id, parts[1]):
+        bot.reply_to(message, f"✅ Домен удалён: {LinkDetector.extract_domain(parts[1])}")
+    else:
+        bot.reply_to(message, "⚠️ Домен не найден в списке")
+
+@bot.message_handler(commands=["domains"])
+@group_only
+@admin_only
+def cmd_domains(message):
+    domains = sorted(link_detector.get_allowed(message.chat.id))
+    if not domains:
+        bot.reply_to(message, "📭 Разрешённых доменов нет")
+        return
+    bot.reply_to(message, "🔗 Разрешённые домены:\n" + "\n".join(f"• {d}" for d in domains))
+
+# ================================
+# Обработка новых/ушедших участников
+# ================================
+def render_member_text(template: str, user, chat) -> str:
+    text = template.replace("{user}", get_user_display(user))
+    return text.replace("{chat}", chat.title or "чат")
+
+def start_raid_mode(chat_id: int) -> None:
+    """Уведомление о включении защиты и таймер её снятия"""
+    events.log("raid", chat_id, reason="lockdown", duration=RAID_LOCKDOWN_MINUTES * 60)
+    governor.notify(
+        chat_id,
+        f"🚨 Похоже на рейд! Включён режим защиты на {RAID_LOCKDOWN_MINUTES} мин:\n"
+        f"новые участники ограничиваются, ссылки запрещены, анти-спам строже."
+    )
+    _schedule_raid_end(chat_id, RAID_LOCKDOWN_MINUTES * 60)
+
+def _schedule_raid_end(chat_id: int, delay: float) -> None:
+    timer = threading.Timer(delay, _end_raid_mode, args=(chat_id,))
+    timer.daemon = True
+    timer.start()
+
+def _end_raid_mode(chat_id: int) -> None:
+    left = raids.expire(chat_id)
+    if left is not None:
+        # Рейд продолжался — защита продлена
+        _schedule_raid_end(chat_id, left)
+    elif not raids.is_active(chat_id):
+        governor.notify(chat_id, "✅ Режим защиты от рейда снят")
+
+def process_raid_joins(message) -> bool:
+    """
+    Учитывает входы в детекторе рейдов. В режиме защиты новые участники
+    ограничиваются (через очередь governor, без ожидания) и попадают в
+    сводное уведомление. True — вход обработан как часть рейда.
+    """
+    chat_id = message.chat.id
+    if not settings.config(chat_id).raid_protection:
+        return False
+    
+    if raids.record_joins(chat_id, len(message.new_chat_members)):
+        start_raid_mode(chat_id)
+    if not raids.is_active(chat_id):
+        return False
+    
+    for user in message.new_chat_members:
+        if user.is_bot:
+            continue
+        governor.submit(
+            ApiGovernor.PRIORITY_ACTION, chat_id, bot.restrict_chat_member,
+            chat_id, user.id, permissions=get_mute_permissions()
+        ).add_done_callback(ApiGovernor.log_failure)
+        notices.add(chat_id, "join", user, f"🚪 {get_user_display(user)} ограничен (режим защиты от рейда)")
+        stats.increment(chat_id, "mutes")
+        events.log("mute", chat_id, user.id, reason="raid", username=user.username)
+    return True
+
+@bot.message_handler(content_types=["new_chat_members"])
+def handle_new_member(message):
+    if process_raid_joins(message):
+        return
+    
+    if not settings.get(message.chat.id, "welcome_enabled"):
+        return
+    
+    for user in message.new_chat_members:
+        if user.is_bot:
+            continue
+        
+        welcome_text = settings.get(message.chat.id, "welcome_message")
+        governor.notify(message.chat.id, render_member_text(welcome_text, user, message.chat))
+
+@bot.message_handler(content_types=["left_chat_member"])
+def handle_left_member(message):
+    if not settings.get(message.chat.id, "goodbye_enabled"):
+        return
+    
+    user = message.left_chat_member
+    if user.is_bot:
+        return
+    
+    goodbye_text = settings.get(message.chat.id, "goodbye_message")
+    governor.notify(message.chat.id, render_member_text(goodbye_text, user, message.chat))
+
+# ================================
+# Обработка сообщений
+# ================================
+SPAM_MUTE_MINUTES = 5
+
+def private_greeting(user_id: int) -> str:
+    text = (
+        "👋 Привет! Я бот модерации для групп.\n\n"
+        "📌 Добавьте меня в группу и дайте права администратора.\n\n"
+        "/help — список команд\n"
+        "/myid — узнать свой ID"
+    )
+    
+    if bot_admins.is_admin(user_id):
+        text += "\n\n👑 Вы — администратор бота"
+    return text
+
+def detect_violation(chat_id: int, user_id: int, text: str, entities=None) -> Optional[Tuple[str, List[str]]]:
+    """
+    Проверяет сообщение без обращения к API.
+    Возвращает (вид нарушения, найденные слова): "spam", "link" или "trigger".
+    В режиме защиты от рейда ссылки запрещены, а порог анти-спама вдвое ниже.
+    """
+    cfg = settings.config(chat_id)
+    strict = False
+    if cfg.raid_protection:
+        if raids.record_message(chat_id):
+            start_raid_mode(chat_id)
+        strict = raids.is_active(chat_id)
+    
+    # Анти-спам
+    if cfg.antispam_enabled or strict:
+        max_messages = max(1, cfg.antispam_messages // 2) if strict else cfg.antispam_messages
+        if antispam.check(chat_id, user_id, max_messages, cfg.antispam_seconds):
+            return "spam", []
+    
+    # Анти-ссылки
+    if (cfg.antilink_enabled or strict) and link_detector.has_links(chat_id, text, entities):
+        return "link", []
+    
+    # Триггер-слова
+    found_words = triggers.find_in_text(text, chat_id, cfg.trigger_mode)
+    if found_words:
+        return "trigger", found_words
+    return None
+
+def violation_notice(kind: str, user, found_words: List[str]) -> str:
+    user_display = get_user_display(user)
+    if kind == "spam":
+        return f"🔇 {user_display} замучен на {SPAM_MUTE_MINUTES} мин (спам)"
+    if kind == "link":
+        return f"🔗 Сообщение {user_display} удалено (ссылки запрещены)"
+    censored = ", ".join(censor_word(w) for w in found_words)
+    return (
+        f"🚫 Сообщение от {user_display} удалено\n"
+        f"📛 Причина: {censored}"
+    )
+
+def record_violation(message, kind: str, found_words: List[str]) -> None:
+    """Статистика и лог после успешного применения мер"""
+    chat_id = message.chat.id
+    user = message.from_user
+    events.log("delete", chat_id, user.id, reason=kind, words=found_words or None,
+               username=user.username, message_id=message.message_id)
+    if kind == "spam":
+        stats.increment(chat_id, "spam_blocked")
+        stats.increment(chat_id, "mutes")
+        events.log("mute", chat_id, user.id, reason="spam", duration=SPAM_MUTE_MINUTES * 60, username=user.username)
+        return
+    
+    if kind == "link":
+        stats.increment(chat_id, "links_blocked")
+    stats.increment(chat_id, "deleted_messages")
+
+@bot.message_handler(func=lambda m: True, content_types=["text"])
+def handle_message(message):
+    # Личные сообщения
+    if is_private(message):
+        bot.send_message(message.chat.id, private_greeting(message.from_user.id))
+        return
+    
+    if not is_group(message) or not message.text:
+        return
+    
+    chat_id = message.chat.id
+    user_id = message.from_user.id
+    text = message.text.strip()
+    
+    # Тест работоспособности
+    if text.lower() == "бот":
+        bot.send_message(chat_id, "✅ Работаю!")
+        return
+    
+    # Пропуск админов чата и бота
+    if is_chat_admin(chat_id, user_id) or bot_admins.is_admin(user_id):
+        return
+    
+    violation = detect_violation(chat_id, user_id, message.text, message.entities)
+    if not violation:
+        return
+    kind, found_words = violation
+    
+    # Запросы идут через governor: удаление и мут раньше уведомлений
+    action = ApiGovernor.PRIORITY_ACTION
+    try:
+        governor.call(action, chat_id, bot.delete_message, chat_id, message.message_id)
+        
+        if kind == "spam":
+            # ИСПРАВЛЕНИЕ: Используем функцию для совместимости
+            governor.call(
+                action, chat_id, bot.restrict_chat_member,
+                chat_id, user_id,
+                until_date=datetime.now() + timedelta(minutes=SPAM_MUTE_MINUTES),
+                permissions=get_mute_permissions()
+            )
+        
+        notices.add(chat_id, kind, message.from_user, violation_notice(kind, message.from_user, found_words))
+        record_violation(message, kind, found_words)
+        
+    except telebot.apihelper.ApiTelegramException as e:
+        if "not enough rights" in str(e).lower():
+            governor.notify(chat_id, "⚠️ Нет прав на удаление сообщений!")
+        else:
+            print(f"❌ Moderation error ({kind}): {e}")
+    except Exception as e:
+        print(f"❌ Moderation error ({kind}): {e}")
+
+# ================================
+# Запуск
+# ================================
+def main():
+    print("=" * 50)
+    print("🤖 Бот модерации запущен!")
+    print(f"📁 Триггер-слова: {triggers.count()}")
+    print(f"👑 Админов бота: {bot_admins.count()}")
+    print(f"📁 Журнал событий: {EVENT_LOG_PATH}")
+    print("=" * 50)
+    
+    if bot_admins.count() == 0:
+        print("\n⚠️  ВНИМАНИЕ: Нет администраторов бота!")
+        print("   Используйте команду /addowner <секретный_код>")
+        print("   для добавления первого администратора.\n")
+    
+    dispatcher.start()
+    try:
+        if WEBHOOK_URL:
+            run_webhook()
+        else:
+            run_polling()
+    finally:
+        dispatcher.stop()
+
+def run_polling():
+    """Long polling через getUpdates"""
+    bot.remove_webhook()
+    offset = None
+    
+    while True:
+        try:
+            updates = bot.get_updates(
+                offset=offset,
+                timeout=70,
+                long_polling_timeout=60,
+                allowed_updates=ALLOWED_UPDATES
+            )
+            for update in updates:
+                offset = update.update_id + 1
+                dispatcher.submit(update)
+        except KeyboardInterrupt:
+            break
+        except Exception as e:
+            print(f"❌ Ошибка: {e}")
+            print("🔄 Перезапуск через 5 секунд...")
+            time.sleep(5)
+
+def run_webhook(register: bool = True):
+    """Приём обновлений через webhook. register=False — без setWebhook (локальные тесты)"""
+    global webhook_server
+    
+    secret = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    webhook_server = WebhookServer(WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, secret, WEBHOOK_QUEUE_SIZE)
+    
+    if register:
+        bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=secret,
+            allowed_updates=ALLOWED_UPDATES
+        )
+    
+    host, port = webhook_server.address
+    print(f"🌐 Webhook: http://{host}:{port}{WEBHOOK_PATH}")
+    try:
+        webhook_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        webhook_server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Асинхронный режим работы на telebot.async_telebot.AsyncTeleBot.
+
+Использует те же менеджеры, что и bot.py (триггеры, предупреждения,
+настройки, анти-спам). Горячий путь модерации выполняется в event loop:
+удаление, ограничение и уведомление отправляются параллельно. Редкие
+команды и нажатия кнопок передаются синхронным обработчикам bot.py
+в пуле потоков.
+
+Запуск:
+    python bot_async.py
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_helper import ApiTelegramException
+
+from bot import (
+    TOKEN, ALLOWED_UPDATES, SPAM_MUTE_MINUTES, ChatMemberCache,
+    bot as sync_bot, triggers, bot_admins, settings, member_cache,
+    is_private, is_group, private_greeting, detect_violation,
+    violation_notice, record_violation, render_member_text, get_mute_permissions,
+    process_raid_joins,
+)
+
+abot = AsyncTeleBot(TOKEN, parse_mode=None)
+
+# ================================
+# Утилиты
+# ================================
+async def is_chat_admin(chat_id: int, user_id: int) -> bool:
+    """Асинхронная проверка через общий кэш статусов"""
+    status = member_cache.peek(chat_id, user_id)
+    if status is None:
+        try:
+            admins = await abot.get_chat_administrators(chat_id)
+        except Exception:
+            return False
+        status = member_cache.store_admins(chat_id, admins).get(user_id, "member")
+    return status in ChatMemberCache.ADMIN_STATUSES
+
+def is_command(message) -> bool:
+    return bool(message.text) and message.text.startswith("/")
+
+# ================================
+# Команды и кнопки — синхронные обработчики bot.py
+# ================================
+@abot.message_handler(func=is_command, content_types=["text"])
+async def handle_command(message):
+    await asyncio.to_thread(sync_bot.process_new_messages, [message])
+
+@abot.callback_query_handler(func=lambda call: True)
+async def handle_callback(call):
+    await asyncio.to_thread(sync_bot.process_new_callback_query, [call])
+
+@abot.message_handler(content_types=["left_chat_member"])
+async def handle_left_member(message):
+    await asyncio.to_thread(sync_bot.process_new_messages, [message])
+
+# ================================
+# Новые участники
+# ================================
+@abot.message_handler(content_types=["new_chat_members"])
+async def handle_new_member(message):
+    # Входы во время рейда ограничиваются через очередь governor
+    if process_raid_joins(message):
+        return
+    
+    if not settings.get(message.chat.id, "welcome_enabled"):
+        return
+    
+    welcome_text = settings.get(message.chat.id, "welcome_message")
+    await asyncio.gather(*(
+        abot.send_message(message.chat.id, render_member_text(welcome_text, user, message.chat))
+        for user in message.new_chat_members
+        if not user.is_bot
+    ), return_exceptions=True)
+
+# ================================
+# Обработка сообщений
+# ================================
+@abot.message_handler(func=lambda m: True, content_types=["text"])
+async def handle_message(message):
+    if is_private(message):
+        await abot.send_message(message.chat.id, private_greeting(message.from_user.id))
+        return
+    
+    if not is_group(message) or not message.text:
+        return
+    
+    chat_id = message.chat.id
+    user_id = message.from_user.id
+    text = message.text.strip()
+    
+    if text.lower() == "бот":
+        await abot.send_message(chat_id, "✅ Работаю!")
+        return
+    
+    if bot_admins.is_admin(user_id) or await is_chat_admin(chat_id, user_id):
+        return
+    
+    violation = detect_violation(chat_id, user_id, message.text, message.entities)
+    if not violation:
+        return
+    kind, found_words = violation
+    
+    # Удаление, мут и уведомление выполняются параллельно
+    actions = [abot.delete_message(chat_id, message.message_id)]
+    if kind == "spam":
+        actions.append(abot.restrict_chat_member(
+            chat_id, user_id,
+            until_date=datetime.now() + timedelta(minutes=SPAM_MUTE_MINUTES),
+            permissions=get_mute_permissions()
+        ))
+    actions.append(abot.send_message(chat_id, violation_notice(kind, message.from_user, found_words)))
+    
+    results = await asyncio.gather(*actions, return_exceptions=True)
+    if not isinstance(results[0], Exception):
+        record_violation(message, kind, found_words)
+    
+    errors = [r for r in results if isinstance(r, Exception)]
+    if not errors:
+        return
+    for e in errors:
+        if isinstance(e, ApiTelegramException) and "not enough rights" in str(e).lower():
+            await abot.send_message(chat_id, "⚠️ Нет прав на удаление сообщений!")
+            return
+    print(f"❌ Moderation error ({kind}): {errors[0]}")
+
+# ================================
+# Запуск
+# ================================
+async def run():
+    print("=" * 50)
+    print("🤖 Бот модерации запущен (asyncio)!")
+    print(f"📁 Триггер-слова: {triggers.count()}")
+    print(f"👑 Админов бота: {bot_admins.count()}")
+    print("=" * 50)
+    
+    await abot.infinity_polling(timeout=60, allowed_updates=ALLOWED_UPDATES)
+
+if __name__ == "__main__":
+    asyncio.run(run())